@@ -1,3 +1,5 @@
+import networkx as nx
+import numpy as np
 from scipy import sparse
 from pyformlang.finite_automaton import (
     State,
@@ -8,6 +10,8 @@ from pyformlang.finite_automaton import (
 
 __all__ = ["AutomatonSetOfMatrix"]
 
+from project.graph_utils import reorder_vertices
+from project.label_matrix import FORMATS, bool_kron, bool_matrix, choose_format
 from project.rsm import RSM
 
 
@@ -62,6 +66,80 @@ class AutomatonSetOfMatrix:
 
         return automaton_matrix
 
+    @classmethod
+    def from_graph(
+        cls,
+        graph: nx.MultiDiGraph,
+        start_vertices: set = None,
+        final_vertices: set = None,
+        reordering: str = None,
+        storage: str = None,
+        backward: bool = False,
+    ):
+        """
+        Transform labeled graph to set of labeled boolean matrix.
+        Indices of vertices are chosen by reordering strategy
+        and kept in state_indices
+
+        Parameters
+        ----------
+        graph: nx.MultiDiGraph
+            Labeled graph
+        start_vertices: set
+            Start vertices, all vertices if None
+        final_vertices: set
+            Final vertices, all vertices if None
+        reordering: str
+            Vertex reordering strategy, see graph_utils.reorder_vertices
+        storage: str
+            Storage format of label matrices, see label_matrix.FORMATS.
+            If "adaptive", format of each label is chosen by its density,
+            if None, all labels are stored as csr
+        backward: bool
+            Prefer csc to csr for adaptive storage
+
+        Returns
+        -------
+        AutomatonSetOfMatrix
+            Result of transforming
+        """
+
+        vertices = reorder_vertices(graph, reordering)
+        n = len(vertices)
+
+        automaton_matrix = cls()
+        automaton_matrix.num_states = n
+        automaton_matrix.state_indices = {State(v): i for i, v in enumerate(vertices)}
+
+        for vertex in set(start_vertices or ()) | set(final_vertices or ()):
+            if State(vertex) not in automaton_matrix.state_indices:
+                raise Exception(f"Node {vertex} does not exists in specified graph")
+        automaton_matrix.start_states = {
+            State(v) for v in (vertices if start_vertices is None else start_vertices)
+        }
+        automaton_matrix.final_states = {
+            State(v) for v in (vertices if final_vertices is None else final_vertices)
+        }
+
+        edges = {}
+        for u, v, label in graph.edges(data="label"):
+            edges.setdefault(Symbol(label), []).append(
+                (
+                    automaton_matrix.state_indices[State(u)],
+                    automaton_matrix.state_indices[State(v)],
+                )
+            )
+        if storage is not None and storage != "adaptive" and storage not in FORMATS:
+            raise Exception(f"Unknown matrix format {storage}")
+        for label, pairs in edges.items():
+            rows, cols = np.array(pairs, dtype=np.int64).T
+            fmt = storage
+            if storage == "adaptive":
+                fmt = choose_format(len(set(pairs)), (n, n), backward)
+            automaton_matrix.bool_matrices[label] = bool_matrix(rows, cols, (n, n), fmt)
+
+        return automaton_matrix
+
     @classmethod
     def from_rsm(cls, rsm: RSM):
         """
@@ -142,6 +220,21 @@ class AutomatonSetOfMatrix:
 
         return automaton
 
+    def get_indexed_states(self) -> list:
+        """
+        Get states ordered by their indices in matrices
+
+        Returns
+        -------
+        states: list
+            List where state is placed at its index
+        """
+
+        states = [None] * self.num_states
+        for state, idx in self.state_indices.items():
+            states[idx] = state
+        return states
+
     @property
     def get_states(self):
         return self.state_indices.keys()
@@ -159,7 +252,8 @@ class AutomatonSetOfMatrix:
 
     def get_transitive_closure(self):
         """
-        Get transitive closure of sparse.csr_matrix
+        Get transitive closure of sparse.csr_matrix.
+        Label matrices can be stored in any of label_matrix.FORMATS
 
         Parameters
         ----------
@@ -168,7 +262,7 @@ class AutomatonSetOfMatrix:
 
         Returns
         -------
-            Transitive closure
+            Transitive closure, csr or BitMatrix if some labels are dense
         """
         tc = sparse.csr_matrix((0, 0), dtype=bool)
 
@@ -213,8 +307,8 @@ class AutomatonSetOfMatrix:
                 )
 
         for label in common_labels:
-            res.bool_matrices[label] = sparse.kron(
-                self.bool_matrices[label], other.bool_matrices[label], format="csr"
+            res.bool_matrices[label] = bool_kron(
+                self.bool_matrices[label], other.bool_matrices[label]
             )
 
         for state_first, state_first_idx in self.state_indices.items():
@@ -1,11 +1,25 @@
 from __future__ import annotations
 
+from typing import Dict, Iterable, List, Set, Tuple
+
+import networkx as nx
 import pyformlang.cfg as c
+from pyformlang.finite_automaton import Epsilon, EpsilonNFA, State, Symbol
+
+from project.normal_form import wcnf_table
+
+# limit of states in automaton built from regular grammar
+MAX_REGULAR_STATES = 10000
+
+
+class _AutomatonTooLarge(Exception):
+    pass
 
 
 def cfg_to_wcnf(cfg: str | c.CFG, start: str = None) -> c.CFG:
     """
-    Transform context-free-grammar to weak chomsky normal form
+    Transform context-free-grammar to weak chomsky normal form,
+    see normal_form.wcnf_table
 
     Parameters
     ----------
@@ -23,13 +37,41 @@ def cfg_to_wcnf(cfg: str | c.CFG, start: str = None) -> c.CFG:
     if not isinstance(cfg, c.CFG):
         cfg = read_cfg(cfg, start if start is not None else "S")
 
-    wcnf_cfg = cfg.remove_useless_symbols()
-    wcnf_cfg = wcnf_cfg.eliminate_unit_productions()
-    wcnf_cfg = wcnf_cfg.remove_useless_symbols()
-    wcnf_productions = wcnf_cfg._get_productions_with_only_single_terminals()
-    wcnf_productions = wcnf_cfg._decompose_productions(wcnf_productions)
+    return wcnf_table(cfg).to_cfg()
+
+
+def trim_cfg(cfg: c.CFG, labels: Iterable) -> c.CFG:
+    """
+    Remove productions with terminals absent from labels
+    and non-terminals which become non-generating or unreachable from start symbol
+
+    Parameters
+    ----------
+    cfg: CFG
+        Grammar
+    labels: Iterable
+        Available terminal labels, for example labels of graph edges
+
+    Returns
+    -------
+    grammar: CFG
+        Trimmed grammar with the same start symbol
+    """
 
-    return c.CFG(start_symbol=wcnf_cfg._start_symbol, productions=set(wcnf_productions))
+    terminals = {c.Terminal(label) for label in labels}
+    productions = {
+        p
+        for p in cfg.productions
+        if all(
+            not isinstance(symbol, c.Terminal)
+            or isinstance(symbol, c.Epsilon)
+            or symbol in terminals
+            for symbol in p.body
+        )
+    }
+    return c.CFG(
+        start_symbol=cfg.start_symbol, productions=productions
+    ).remove_useless_symbols()
 
 
 def read_grammar_to_str(path: str):
@@ -69,3 +111,178 @@ def read_cfg(grammar: str, start: str) -> c.CFG:
     """
 
     return c.CFG.from_text(grammar, c.Variable(start))
+
+
+def production_schedule(
+    var_prods: Dict[c.Variable, Set[Tuple[c.Variable, c.Variable]]]
+) -> List[Tuple[Set[c.Variable], List[Tuple[c.Variable, c.Variable, c.Variable]]]]:
+    """
+    Split productions A -> B C by strongly connected components
+    of non-terminal dependency graph B -> A, C -> A in topological order
+
+    Parameters
+    ----------
+    var_prods: dict
+        Bodies (B, C) of productions for each head A
+
+    Returns
+    -------
+    schedule: list
+        Pairs (component non-terminals, productions (A, B, C) with head in component),
+        each component depends only on itself and previous components
+    """
+
+    dependencies = nx.DiGraph()
+    for head, bodies in var_prods.items():
+        dependencies.add_node(head)
+        for body_b, body_c in bodies:
+            dependencies.add_edge(body_b, head)
+            dependencies.add_edge(body_c, head)
+
+    condensation = nx.condensation(dependencies)
+    schedule = []
+    for component in nx.topological_sort(condensation):
+        variables = condensation.nodes[component]["members"]
+        productions = [
+            (head, body_b, body_c)
+            for head in variables
+            for body_b, body_c in var_prods.get(head, ())
+        ]
+        if productions:
+            schedule.append((variables, productions))
+    return schedule
+
+
+def regular_cfg_to_nfa(
+    cfg: c.CFG, max_states: int = MAX_REGULAR_STATES
+) -> EpsilonNFA | None:
+    """
+    Build finite automaton with language of grammar if grammar is strongly regular:
+    every production has at most one non-terminal from the strongly connected component
+    of its head, and in each component all such non-terminals are the first symbols
+    of their bodies or all are the last ones (Mohri-Nederhof construction)
+
+    Parameters
+    ----------
+    cfg: CFG
+        Grammar
+    max_states: int
+        Give up if automaton has more states or more transitions,
+        non-recursive non-terminals are expanded at each occurrence,
+        so transitions bound the work of expansion too
+
+    Returns
+    -------
+    nfa: EpsilonNFA | None
+        Automaton with the same language or None if grammar is not strongly regular
+    """
+
+    productions = {}
+    dependencies = nx.DiGraph()
+    dependencies.add_node(cfg.start_symbol)
+    for production in cfg.productions:
+        body = [
+            symbol for symbol in production.body if not isinstance(symbol, c.Epsilon)
+        ]
+        productions.setdefault(production.head, []).append(body)
+        dependencies.add_node(production.head)
+        for symbol in body:
+            if isinstance(symbol, c.Variable):
+                dependencies.add_edge(production.head, symbol)
+
+    components = {}
+    for members in nx.strongly_connected_components(dependencies):
+        for var in members:
+            components[var] = frozenset(members)
+
+    def is_member(symbol, members):
+        return isinstance(symbol, c.Variable) and symbol in members
+
+    # side of recursion in each component: "left", "right" or None if not recursive
+    recursion = {}
+    for members in set(components.values()):
+        sides = {"left", "right"}
+        recursive = False
+        for head in members:
+            for body in productions.get(head, ()):
+                positions = [i for i, s in enumerate(body) if is_member(s, members)]
+                if not positions:
+                    continue
+                if len(positions) > 1:
+                    return None
+                recursive = True
+                if positions[0] != 0:
+                    sides.discard("left")
+                if positions[0] != len(body) - 1:
+                    sides.discard("right")
+        if recursive and not sides:
+            return None
+        recursion[members] = min(sides) if recursive else None
+
+    nfa = EpsilonNFA()
+    created = []
+    transitions = [0]
+
+    def fresh():
+        if len(created) >= max_states:
+            raise _AutomatonTooLarge()
+        created.append(State(len(created)))
+        return created[-1]
+
+    def transition(state_from, symbol, state_to):
+        # chains of unit productions create transitions but no states
+        transitions[0] += 1
+        if transitions[0] > max_states:
+            raise _AutomatonTooLarge()
+        nfa.add_transition(state_from, symbol, state_to)
+
+    def epsilon(state_from, state_to):
+        transition(state_from, Epsilon(), state_to)
+
+    def make(state_from, body, state_to):
+        if not body:
+            epsilon(state_from, state_to)
+            return
+        if len(body) > 1:
+            middle = fresh()
+            make(state_from, body[:1], middle)
+            make(middle, body[1:], state_to)
+            return
+        symbol = body[0]
+        if not isinstance(symbol, c.Variable):
+            transition(state_from, Symbol(symbol.value), state_to)
+            return
+
+        members = components[symbol]
+        side = recursion[members]
+        if side is None:
+            for body in productions.get(symbol, ()):
+                make(state_from, body, state_to)
+            return
+
+        states = {var: fresh() for var in members}
+        for head in members:
+            for body in productions.get(head, ()):
+                if side == "left":
+                    if body and is_member(body[0], members):
+                        make(states[body[0]], body[1:], states[head])
+                    else:
+                        make(state_from, body, states[head])
+                else:
+                    if body and is_member(body[-1], members):
+                        make(states[head], body[:-1], states[body[-1]])
+                    else:
+                        make(states[head], body, state_to)
+        if side == "left":
+            epsilon(states[symbol], state_to)
+        else:
+            epsilon(state_from, states[symbol])
+
+    try:
+        start, final = fresh(), fresh()
+        nfa.add_start_state(start)
+        nfa.add_final_state(final)
+        make(start, [cfg.start_symbol], final)
+    except _AutomatonTooLarge:
+        return None
+    return nfa
@@ -1,26 +1,72 @@
 from __future__ import annotations
 
+import tempfile
+from collections import deque
 from typing import Set, Tuple
-from scipy.sparse import csr_matrix
+
+import numpy as np
+from scipy import sparse
 from networkx import MultiDiGraph
 from pyformlang.cfg import CFG, Variable, Terminal
+from pyformlang.finite_automaton import State
 
 from project.automaton_matrix import AutomatonSetOfMatrix
-from project.cfg_utils import cfg_to_wcnf, read_grammar_to_str, read_cfg
-from project.ecfg import ECFG
-from project.graph_utils import graph_to_nfa
+from project.cfg_utils import production_schedule, read_grammar_to_str
+from project.cfpq_result import CfpqResult
+from project.checkpoint import load_checkpoint, save_checkpoint
+from project.compiled_grammar import compile_grammar
+from project.cost_model import choose_algorithm
+from project.fa_utils import nfa_to_minimal_dfa
+from project.gll import gll
+from project.graph_utils import reorder_vertices
+from project.label_matrix import (
+    bool_difference,
+    bool_kron,
+    bool_matrix,
+    matrix_format,
+    to_format,
+)
 from project.manager import get_graph
-
-__all__ = ["cfpq_by_hellings", "cfpq_by_matrix", "cfpq_by_tensor", "cfpq"]
-
-from project.rsm import RSM
+from project.parallel import product_pool
+from project.partitioned import COLUMN_BLOCK, LocalWorkers, partitioned_closure
+from project.prefilter import prefilter_graph
+from project.rpq import multiple_source_rpq
+from project.tiled import TILE_SIZE, TileStore, gather_tiles, tiled_closure
+from project.witness import Witnesses
+
+__all__ = [
+    "cfpq_by_hellings",
+    "cfpq_by_matrix",
+    "cfpq_by_tensor",
+    "cfpq_by_rsm",
+    "cfpq",
+]
+
+# multiple-source engine is used if start nodes are at most this part of graph
+MULTIPLE_SOURCE_RATIO = 0.1
+
+# options of requested engine not supported by multiple-source engine
+ENGINE_OPTIONS = (
+    "witnesses",
+    "storage",
+    "workers",
+    "executor",
+    "partitions",
+    "column_block",
+    "memory_budget",
+    "work_dir",
+    "tile_size",
+    "checkpoint",
+    "checkpoint_every",
+    "resume_from",
+)
 
 
 def hellings(
     graph: MultiDiGraph | str,
     cfg: CFG | str,
     **kwargs,
-) -> Set[Tuple]:
+) -> CfpqResult:
     """
     Constrained transitive closure by Hellings algorithm
 
@@ -34,10 +80,12 @@ def hellings(
         Start non-terminal for context-free grammar in case grammar is not CFG object
     grammar_in_file: bool
         Is grammar passed as path to file with grammar
+    grammar_cache_dir: str
+        Directory of compiled grammar artifacts, see compiled_grammar.compile_grammar
 
     Returns
     -------
-    result: set[tuple]
+    result: CfpqResult
         Set of triples (start vertex, non-terminal symbol, final vertex)
     """
 
@@ -48,78 +96,94 @@ def hellings(
     if grammar_in_file:
         cfg = read_grammar_to_str(cfg)
 
-    if isinstance(cfg, str):
-        cfg = read_cfg(cfg, start_symbol)
-
     if isinstance(graph, str):
         graph = get_graph(graph)
 
-    cfg = cfg_to_wcnf(cfg)
-
-    # split productions in 3 groups
-    eps_prods = set()  # A -> epsilon
-    term_prods = {}  # A -> a
-    var_prods = {}  # A -> B C
-    for p in cfg.productions:
-        if not p.body:
-            eps_prods.add(p.head)
-        elif len(p.body) == 1:
-            t = p.body[0]
-            term_prods.setdefault(p.head, set()).add(t)
-        elif len(p.body) == 2:
-            v1, v2 = p.body
-            var_prods.setdefault(p.head, set()).add((v1, v2))
-
-    # prepare result
+    grammar = compile_grammar(
+        cfg,
+        {label for _, _, label in graph.edges(data="label")},
+        start_symbol,
+        kwargs.get("grammar_cache_dir"),
+    )
+    # productions of grammar in WCNF over integer-coded non-terminals
+    table = grammar.wcnf_table
+
+    # integer coding of vertices, non-terminals are indices of table
+    nodes = list(graph.nodes)
+    node_indices = {v: i for i, v in enumerate(nodes)}
+    variables = table.variables
+
+    # inverted production index: B -> [(C, heads)] and C -> [(B, heads)]
+    heads_by_body = {}
+    for head, v1, v2 in table.binary.tolist():
+        heads_by_body.setdefault((v1, v2), []).append(head)
+    by_left, by_right = {}, {}
+    for (v1, v2), heads in heads_by_body.items():
+        by_left.setdefault(v1, []).append((v2, heads))
+        by_right.setdefault(v2, []).append((v1, heads))
+
+    # prepare result with indexes of triples by (start, var) and (final, var)
     result = set()
+    outgoing = {}
+    incoming = {}
+    queue = deque()
+
+    def add(triple):
+        if triple in result:
+            return
+        s, var, f = triple
+        result.add(triple)
+        outgoing.setdefault((s, var), set()).add(f)
+        incoming.setdefault((f, var), set()).add(s)
+        queue.append(triple)
 
-    for v, u, data in graph.edges(data=True):
-        label = data["label"]
-        for var in term_prods:
-            if Terminal(label) in term_prods[var]:
-                result.add((v, var, u))
-
-    for node in graph.nodes:
-        for var in eps_prods:
-            result.add((node, var, node))
+    # A -> terminal
+    heads_by_label = {}
+    for head, terminal in table.unary.tolist():
+        heads_by_label.setdefault(table.terminals[terminal].value, []).append(head)
+    for v, u, label in graph.edges(data="label"):
+        for var in heads_by_label.get(label, ()):
+            add((node_indices[v], var, node_indices[u]))
+
+    # A -> epsilon loops
+    for node in range(len(nodes)):
+        for var in table.epsilon.tolist():
+            add((node, var, node))
 
     # helling
-    queue = result.copy()
-    while len(queue) > 0:
-        s, var, f = queue.pop()
-
-        temp = set()
-
-        for triple in result:
-            if triple[-1] == s:
-                for curr_var in var_prods:
-                    if (triple[1], var) in var_prods[curr_var] and (
-                        triple[0],
-                        curr_var,
-                        f,
-                    ) not in result:
-                        queue.add((triple[0], curr_var, f))
-                        temp.add((triple[0], curr_var, f))
-            if triple[0] == f:
-                for curr_var in var_prods:
-                    if (var, triple[1]) in var_prods[curr_var] and (
-                        s,
-                        curr_var,
-                        triple[-1],
-                    ) not in result:
-                        queue.add((s, curr_var, triple[-1]))
-                        temp.add((s, curr_var, triple[-1]))
-
-        result = result.union(temp)
-
-    return result
+    while queue:
+        s, var, f = queue.popleft()
+
+        # (s, var, f) (f, right, x) -> (s, head, x)
+        for right, heads in by_left.get(var, ()):
+            for x in list(outgoing.get((f, right), ())):
+                for head in heads:
+                    add((s, head, x))
+
+        # (x, left, s) (s, var, f) -> (x, head, f)
+        for left, heads in by_right.get(var, ()):
+            for x in list(incoming.get((s, left), ())):
+                for head in heads:
+                    add((x, head, f))
+
+    triples = np.array(sorted(result), dtype=np.int64).reshape(-1, 3)
+    return CfpqResult.from_pairs(
+        {
+            variables[var]: (
+                triples[triples[:, 1] == var, 0],
+                triples[triples[:, 1] == var, 2],
+            )
+            for var in np.unique(triples[:, 1])
+        },
+        nodes,
+    )
 
 
 def matrix_based(
     graph: MultiDiGraph | str,
     cfg: CFG | str,
     **kwargs,
-) -> Set[Tuple]:
+) -> CfpqResult:
     """
     Transitive closure based on Matrix Multiplication algorithm
 
@@ -133,49 +197,85 @@ def matrix_based(
         Start non-terminal for context-free grammar in case grammar is not CFG object
     grammar_in_file: bool
         Is grammar passed as path to file with grammar
+    grammar_cache_dir: str
+        Directory of compiled grammar artifacts, see compiled_grammar.compile_grammar
+    reordering: str
+        Vertex reordering strategy for graph matrices, see graph_utils.reorder_vertices
+    storage: str
+        Storage format of non-terminal matrices, see label_matrix.bool_matrix
+    workers: int
+        Number of workers evaluating independent products of each round in parallel
+    executor: str
+        Kind of workers, "thread" (default) or "process" with operands
+        in shared memory, see parallel.product_pool
+    partitions: int
+        Number of local worker processes owning row stripes of matrices,
+        if passed, fixpoint is computed by partitioned.partitioned_closure
+        instead of workers
+    column_block: int
+        Width of column blocks broadcast to partitions
+    memory_budget: int
+        Bytes of matrix tiles kept in memory, if passed, fixpoint is computed
+        out of core by tiled.tiled_closure and other tiles are spilled to disk,
+        result contains only matrix of start non-terminal
+    work_dir: str
+        Directory for temporary directory with spilled tiles, system default if None
+    tile_size: int
+        Number of rows and columns in tile
+    checkpoint: str
+        Path to .npz file atomically rewritten with fixpoint state
+        every checkpoint_every rounds, see checkpoint.save_checkpoint
+    checkpoint_every: int
+        Number of rounds between checkpoints, 1 by default
+    resume_from: str
+        Path to checkpoint of the same algorithm and graph to continue from
+    witnesses: bool
+        Annotate every triple by the shortest found path and its split,
+        so that result can rebuild path and derivation, see witness.Witnesses
+    stats: dict
+        If passed, filled with "rounds" --- list of per-round statistics
+        with size of evaluated grammar component, number of matrix multiplications
+        and number of new elements
 
     Returns
     -------
-    result: set[tuple]
+    result: CfpqResult
         Set of triples (start vertex, non-terminal symbol, final vertex)
     """
 
     grammar_in_file = kwargs.get("grammar_in_file", False)
     start_symbol = kwargs.get("start_symbol", "S")
 
+    # splits are recorded only by in-memory fixpoint from the first round
+    if kwargs.get("witnesses", False):
+        for option in ("partitions", "memory_budget", "resume_from"):
+            if kwargs.get(option) not in (None, 1):
+                raise Exception(f"Witnesses are not supported with {option}")
+
     # transform graph and grammar
     if grammar_in_file:
         cfg = read_grammar_to_str(cfg)
 
-    if isinstance(cfg, str):
-        cfg = read_cfg(cfg, start_symbol)
-
     if isinstance(graph, str):
         graph = get_graph(graph)
 
-    cfg = cfg_to_wcnf(cfg)
-
-    # split productions in 3 groups
-    eps_prods = set()  # A -> epsilon
-    term_prods = {}  # A -> a
-    var_prods = {}  # A -> B C
-    for p in cfg.productions:
-        if not p.body:
-            eps_prods.add(p.head)
-        elif len(p.body) == 1:
-            t = p.body[0]
-            term_prods.setdefault(p.head, set()).add(t)
-        elif len(p.body) == 2:
-            v1, v2 = p.body
-            var_prods.setdefault(p.head, set()).add((v1, v2))
+    grammar = compile_grammar(
+        cfg,
+        {label for _, _, label in graph.edges(data="label")},
+        start_symbol,
+        kwargs.get("grammar_cache_dir"),
+    )
+    # productions of grammar in WCNF in 3 groups
+    table = grammar.wcnf_table
+    variables = table.variables
+    start_var = variables[table.start]
+    eps_prods, term_prods, var_prods = table.split()
 
     # prepare adjacency matrix
-    nodes_num = graph.number_of_nodes()
-    nodes = {vertex: i for i, vertex in enumerate(graph.nodes)}
-    nodes_reversed = {i: vertex for i, vertex in enumerate(graph.nodes)}
-    matrices = {
-        v: csr_matrix((nodes_num, nodes_num), dtype=bool) for v in cfg.variables
-    }
+    vertices = reorder_vertices(graph, kwargs.get("reordering"))
+    nodes_num = len(vertices)
+    nodes = {vertex: i for i, vertex in enumerate(vertices)}
+    pairs = {v: [] for v in variables}
 
     # A -> terminal
     for v, u, data in graph.edges(data=True):
@@ -184,36 +284,197 @@ def matrix_based(
         j = nodes[u]
         for var in term_prods:
             if Terminal(label) in term_prods[var]:
-                matrices[var][i, j] = True
+                pairs[var].append((i, j))
 
     # A -> espilon loops
     for var in eps_prods:
-        for i in range(nodes_num):
-            matrices[var][i, i] = True
-
-    # A -> B C
-    changed = True
-    while changed:
-        changed = False
-        for head in var_prods:
-            for body_b, body_c in var_prods[head]:
-                old_nnz = matrices[head].nnz
-                matrices[head] += matrices[body_b] @ matrices[body_c]
-                new_nnz = matrices[head].nnz
-                changed = old_nnz != new_nnz
-
-    return {
-        (nodes_reversed[v], var, nodes_reversed[u])
-        for var, matrix in matrices.items()
-        for v, u in zip(*matrix.nonzero())
+        pairs[var].extend((i, i) for i in range(nodes_num))
+
+    pairs = {
+        var: np.array(var_pairs, dtype=np.int64).reshape(-1, 2).T
+        for var, var_pairs in pairs.items()
     }
 
+    # A -> B C over tiles spilled to working directory beyond memory budget,
+    # neither initial nor result matrices of all non-terminals are held in memory
+    memory_budget = kwargs.get("memory_budget")
+    partitions = kwargs.get("partitions")
+    if memory_budget is not None and (partitions is None or partitions <= 1):
+        tile_size = kwargs.get("tile_size", TILE_SIZE)
+        with tempfile.TemporaryDirectory(dir=kwargs.get("work_dir")) as work_dir:
+            store = TileStore(work_dir, memory_budget)
+            tiles = tiled_closure(
+                pairs,
+                nodes_num,
+                [
+                    (head, body_b, body_c)
+                    for head, bodies in var_prods.items()
+                    for body_b, body_c in bodies
+                ],
+                store,
+                tile_size,
+                kwargs.get("stats"),
+            )
+            # only start non-terminal is read from store
+            closure = gather_tiles(
+                store, tiles[start_var], (nodes_num, nodes_num), tile_size
+            )
+        return CfpqResult(
+            {
+                start_var: bool_matrix(
+                    *closure.nonzero(), closure.shape, kwargs.get("storage")
+                )
+            },
+            vertices,
+        )
+
+    matrices = {}
+    for var, (rows, cols) in pairs.items():
+        matrices[var] = bool_matrix(
+            rows, cols, (nodes_num, nodes_num), kwargs.get("storage")
+        )
+
+    # A -> B C on worker processes owning row stripes of matrices
+    if partitions is not None and partitions > 1:
+        with LocalWorkers(partitions) as workers:
+            closure = partitioned_closure(
+                {var: to_format(matrix, "csr") for var, matrix in matrices.items()},
+                [
+                    (head, body_b, body_c)
+                    for head, bodies in var_prods.items()
+                    for body_b, body_c in bodies
+                ],
+                workers.transports,
+                kwargs.get("column_block", COLUMN_BLOCK),
+                kwargs.get("stats"),
+            )
+        return CfpqResult(
+            {
+                var: to_format(closure[var], matrix_format(matrix))
+                for var, matrix in matrices.items()
+            },
+            vertices,
+        )
+
+    # A -> B C, components of grammar in topological order, semi-naive inside
+    # component: only new elements of B and C give new elements of A
+    stats = kwargs.get("stats")
+    if stats is not None:
+        stats["rounds"] = []
+
+    # resume from saved matrices, completed components are skipped
+    checkpoint = kwargs.get("checkpoint")
+    checkpoint_every = kwargs.get("checkpoint_every", 1)
+    iteration, completed = 0, set()
+    if kwargs.get("resume_from") is not None:
+        saved, state = load_checkpoint(
+            kwargs["resume_from"], "matrix_based", vertices, grammar.key
+        )
+        for var, matrix in matrices.items():
+            if str(var) in saved:
+                fmt = matrix_format(matrix)
+                matrices[var] = to_format(matrix + to_format(saved[str(var)], fmt), fmt)
+        iteration, completed = state["iteration"], set(state["completed"])
+
+    witnesses = None
+    if kwargs.get("witnesses", False):
+        witnesses = Witnesses(
+            vertices,
+            start_var,
+            var_prods,
+            term_prods,
+            eps_prods,
+            [(nodes[u], nodes[v], label) for u, v, label in graph.edges(data="label")],
+        )
+
+    pool = product_pool(kwargs.get("workers"), kwargs.get("executor", "thread"))
+    with pool as multiply:
+        for component, productions in production_schedule(var_prods):
+            if {str(var) for var in component} <= completed:
+                continue
+
+            # productions to evaluate on body non-terminal change
+            dependent = {}
+            for production in productions:
+                for body in production[1:]:
+                    if body in component:
+                        dependent.setdefault(body, []).append(production)
+
+            # first round evaluates every production, then only changed ones
+            deltas = {var: matrices[var] for var in component}
+            worklist = productions
+            while worklist:
+                # products of round are independent and evaluated by pool
+                heads, operands = [], []
+                for head, body_b, body_c in worklist:
+                    delta_b, delta_c = deltas.get(body_b), deltas.get(body_c)
+                    if delta_b is None and delta_c is None:
+                        heads.append(head)
+                        operands.append((matrices[body_b], matrices[body_c]))
+                        continue
+                    if delta_b is not None and delta_b.nnz > 0:
+                        heads.append(head)
+                        operands.append((delta_b, matrices[body_c]))
+                    if delta_c is not None and delta_c.nnz > 0:
+                        heads.append(head)
+                        operands.append((matrices[body_b], delta_c))
+
+                products = {}
+                for head, term in zip(heads, multiply(operands)):
+                    products[head] = (
+                        term if head not in products else products[head] + term
+                    )
+
+                changed = set()
+                before = witnesses.snapshot() if witnesses is not None else None
+                for var in component:
+                    matrix = matrices[var]
+                    fmt = matrix_format(matrix)
+                    if var in products:
+                        deltas[var] = bool_difference(
+                            to_format(products[var], fmt), matrix
+                        )
+                        matrices[var] = to_format(matrix + deltas[var], fmt)
+                        if witnesses is not None:
+                            witnesses.record(var, deltas[var], before)
+                    else:
+                        deltas[var] = bool_matrix([], [], matrix.shape, fmt)
+                    if deltas[var].nnz > 0:
+                        changed.add(var)
+
+                worklist = list(
+                    dict.fromkeys(p for var in changed for p in dependent.get(var, ()))
+                )
+                if stats is not None:
+                    stats["rounds"].append(
+                        {
+                            "component": len(component),
+                            "multiplications": len(operands),
+                            "new": sum(deltas[var].nnz for var in changed),
+                        }
+                    )
+
+                iteration += 1
+                if not worklist:
+                    completed |= {str(var) for var in component}
+                if checkpoint is not None and iteration % checkpoint_every == 0:
+                    save_checkpoint(
+                        checkpoint,
+                        matrices,
+                        "matrix_based",
+                        vertices,
+                        {"iteration": iteration, "completed": sorted(completed)},
+                        grammar.key,
+                    )
+
+    return CfpqResult(matrices, vertices, witnesses)
+
 
 def tensor_based(
     graph: MultiDiGraph | str,
     cfg: CFG | str,
     **kwargs,
-) -> Set[Tuple]:
+) -> CfpqResult:
     """
     Transitive closure based on Tensor algorithm
 
@@ -227,10 +488,26 @@ def tensor_based(
         Start non-terminal for context-free grammar in case grammar is not CFG object
     grammar_in_file: bool
         Is grammar passed as path to file with grammar
+    grammar_cache_dir: str
+        Directory of compiled grammar artifacts, see compiled_grammar.compile_grammar
+    reordering: str
+        Vertex reordering strategy for graph matrices, see graph_utils.reorder_vertices
+    storage: str
+        Storage format of graph label matrices, see AutomatonSetOfMatrix.from_graph
+    checkpoint: str
+        Path to .npz file atomically rewritten with fixpoint state
+        every checkpoint_every rounds, see checkpoint.save_checkpoint
+    checkpoint_every: int
+        Number of rounds between checkpoints, 1 by default
+    resume_from: str
+        Path to checkpoint of the same algorithm and graph to continue from
+    stats: dict
+        If passed, filled with "rounds" --- list of per-round statistics
+        with number of new non-terminal edges
 
     Returns
     -------
-    result: set[tuple]
+    result: CfpqResult
         Set of triples (start vertex, non-terminal symbol, final vertex)
     """
 
@@ -241,59 +518,502 @@ def tensor_based(
     if grammar_in_file:
         cfg = read_grammar_to_str(cfg)
 
-    if isinstance(cfg, str):
-        cfg = read_cfg(cfg, start_symbol)
-
     if isinstance(graph, str):
         graph = get_graph(graph)
 
-    g_matrix = AutomatonSetOfMatrix.from_automaton(graph_to_nfa(graph))
-    rsm = RSM.from_ecfg((ECFG.from_cfg(cfg)))
-    rsm_matrix = AutomatonSetOfMatrix.from_rsm(rsm)
-    rsm_idx_to_state = {i: s for s, i in rsm_matrix.state_indices.items()}
+    grammar = compile_grammar(
+        cfg,
+        {label for _, _, label in graph.edges(data="label")},
+        start_symbol,
+        kwargs.get("grammar_cache_dir"),
+    )
+    cfg = grammar.cfg
+
+    g_matrix = AutomatonSetOfMatrix.from_graph(
+        graph, reordering=kwargs.get("reordering"), storage=kwargs.get("storage")
+    )
+    vertices = [state.value for state in g_matrix.get_indexed_states()]
+    rsm = grammar.rsm
+    rsm_matrix = grammar.rsm_matrix
+
+    n = g_matrix.num_states
+    storage = kwargs.get("storage")
+
+    def add_edges(var, rows, cols):
+        # add non-terminal edges to graph and get really new ones
+        added = bool_matrix(rows, cols, (n, n), storage)
+        if var in g_matrix.bool_matrices:
+            current = g_matrix.bool_matrices[var]
+            added = bool_difference(added, current)
+            g_matrix.bool_matrices[var] = to_format(
+                current + added, matrix_format(current)
+            )
+        else:
+            g_matrix.bool_matrices[var] = added
+        return added
 
     for var in cfg.get_nullable_symbols():
-        if var not in g_matrix.bool_matrices.keys():
-            g_matrix.bool_matrices[var] = csr_matrix(
-                (g_matrix.num_states, g_matrix.num_states), dtype=bool
+        add_edges(var, np.arange(n), np.arange(n))
+
+    # resume from saved non-terminal edges, closure is built over them
+    checkpoint = kwargs.get("checkpoint")
+    checkpoint_every = kwargs.get("checkpoint_every", 1)
+    iteration = 0
+    if kwargs.get("resume_from") is not None:
+        saved, state = load_checkpoint(
+            kwargs["resume_from"], "tensor_based", vertices, grammar.key
+        )
+        for var in rsm.boxes:
+            if str(var) in saved:
+                add_edges(var, *saved[str(var)].nonzero())
+        iteration = state["iteration"]
+
+    # rsm states description for vectorized extraction of box start -> final pairs
+    rsm_states = sorted(rsm_matrix.state_indices, key=rsm_matrix.state_indices.get)
+    boxes = list(dict.fromkeys(state.value[0] for state in rsm_states))
+    box_indices = {box: i for i, box in enumerate(boxes)}
+    box_of = np.array(
+        [box_indices[state.value[0]] for state in rsm_states], dtype=np.int64
+    )
+    is_start = np.array(
+        [state in rsm_matrix.start_states for state in rsm_states], dtype=bool
+    )
+    is_final = np.array(
+        [state in rsm_matrix.final_states for state in rsm_states], dtype=bool
+    )
+
+    stats = kwargs.get("stats")
+    if stats is not None:
+        stats["rounds"] = []
+
+    tc = rsm_matrix.intersect(g_matrix).get_transitive_closure()
+    tc_delta = tc
+    while True:
+        # new non-terminal edges from new closure pairs (box start, box final)
+        rows, cols = tc_delta.nonzero()
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        rsm_rows = rows // max(n, 1)
+        mask = is_start[rsm_rows] & is_final[cols // max(n, 1)]
+        kron_delta = None
+        new_edges = 0
+        for box in np.unique(box_of[rsm_rows[mask]]):
+            selected = mask & (box_of[rsm_rows] == box)
+            var = boxes[box]
+            added = add_edges(var, rows[selected] % n, cols[selected] % n)
+            new_edges += added.nnz
+            if added.nnz > 0 and var in rsm_matrix.bool_matrices:
+                term = bool_kron(rsm_matrix.bool_matrices[var], added)
+                kron_delta = term if kron_delta is None else kron_delta + term
+
+        if stats is not None:
+            stats["rounds"].append({"new": new_edges})
+        iteration += 1
+        if checkpoint is not None and iteration % checkpoint_every == 0:
+            save_checkpoint(
+                checkpoint,
+                g_matrix.bool_matrices,
+                "tensor_based",
+                vertices,
+                {"iteration": iteration},
+                grammar.key,
             )
-        for i in range(g_matrix.num_states):
-            g_matrix.bool_matrices[var][i, i] = True
+        if kron_delta is None:
+            break
+
+        # extend closure by paths through new edges: (I + tc) delta (I + tc)
+        tc_delta = None
+        while kron_delta.nnz > 0:
+            left = kron_delta + tc @ kron_delta
+            kron_delta = bool_difference(left + left @ tc, tc)
+            tc = tc + kron_delta
+            tc_delta = kron_delta if tc_delta is None else tc_delta + kron_delta
+        if tc_delta is None:
+            break
+
+    return CfpqResult(g_matrix.bool_matrices, vertices)
+
+
+def multiple_source(
+    graph: MultiDiGraph | str,
+    cfg: CFG | str,
+    **kwargs,
+) -> CfpqResult:
+    """
+    Multiple-source matrix algorithm: derives only facts A(u, v) for vertices u
+    from which paths of non-terminal A are needed to answer query from start nodes
 
-    intersection = rsm_matrix.intersect(g_matrix)
-    tc = intersection.get_transitive_closure()
+    Parameters
+    ----------
+    graph: MultiDiGraph | str
+        Graph passed as MultiDiGraph object or graph name from cfpq_data dataset
+    cfg: CFG | str
+        Grammar passed as CFG object, string representation or path to file with grammar
+    start_symbol: str
+        Start non-terminal for context-free grammar in case grammar is not CFG object
+    grammar_in_file: bool
+        Is grammar passed as path to file with grammar
+    grammar_cache_dir: str
+        Directory of compiled grammar artifacts, see compiled_grammar.compile_grammar
+    start_nodes: set
+        Source vertices of query, all vertices if not passed
+    reordering: str
+        Vertex reordering strategy for graph matrices, see graph_utils.reorder_vertices
+    stats: dict
+        If passed, filled with "rounds" --- list of per-round statistics
+        with number of evaluated productions and number of new elements
 
-    prev_nnz = tc.nnz
-    new_nnz = 0
+    Returns
+    -------
+    result: CfpqResult
+        Set of triples (start vertex, non-terminal symbol, final vertex),
+        complete for start non-terminal and start nodes
+    """
+
+    grammar_in_file = kwargs.get("grammar_in_file", False)
+    start_symbol = kwargs.get("start_symbol", "S")
 
-    while prev_nnz != new_nnz:
-        for i, j in zip(*tc.nonzero()):
-            rsm_i = i // g_matrix.num_states
-            rsm_j = j // g_matrix.num_states
+    # transform graph and grammar
+    if grammar_in_file:
+        cfg = read_grammar_to_str(cfg)
 
-            graph_i = i % g_matrix.num_states
-            graph_j = j % g_matrix.num_states
+    if isinstance(graph, str):
+        graph = get_graph(graph)
 
-            s, f = rsm_idx_to_state[rsm_i], rsm_idx_to_state[rsm_j]
-            var, _ = s.value
+    grammar = compile_grammar(
+        cfg,
+        {label for _, _, label in graph.edges(data="label")},
+        start_symbol,
+        kwargs.get("grammar_cache_dir"),
+    )
+    # productions of grammar in WCNF in 3 groups
+    table = grammar.wcnf_table
+    variables = table.variables
+    start_var = variables[table.start]
+    eps_prods, term_prods, var_prods = table.split()
 
-            if s in rsm_matrix.start_states and f in rsm_matrix.final_states:
-                if var not in g_matrix.bool_matrices.keys():
-                    g_matrix.bool_matrices[var] = csr_matrix(
-                        (g_matrix.num_states, g_matrix.num_states), dtype=bool
-                    )
-                g_matrix.bool_matrices[var][graph_i, graph_j] = True
+    # prepare adjacency matrix
+    vertices = reorder_vertices(graph, kwargs.get("reordering"))
+    nodes_num = len(vertices)
+    nodes = {vertex: i for i, vertex in enumerate(vertices)}
+    pairs = {v: [] for v in variables}
+
+    # A -> terminal
+    for v, u, data in graph.edges(data=True):
+        label = data["label"]
+        for var in term_prods:
+            if Terminal(label) in term_prods[var]:
+                pairs[var].append((nodes[v], nodes[u]))
+
+    # A -> espilon loops
+    for var in eps_prods:
+        pairs[var].extend((i, i) for i in range(nodes_num))
+
+    shape = (nodes_num, nodes_num)
+    base = {}
+    for var, var_pairs in pairs.items():
+        rows, cols = np.array(var_pairs, dtype=np.int64).reshape(-1, 2).T
+        base[var] = bool_matrix(rows, cols, shape)
+
+    # sources: vertices from which paths of each non-terminal are needed
+    start_nodes = kwargs.get("start_nodes")
+    sources = {var: np.zeros(nodes_num, dtype=bool) for var in variables}
+    if start_var in sources:
+        if start_nodes is None:
+            sources[start_var][:] = True
+        else:
+            sources[start_var][[nodes[v] for v in start_nodes if v in nodes]] = True
+
+    def from_sources(mask, matrix):
+        return sparse.diags(mask, dtype=bool, format="csr") @ matrix
+
+    matrices = {var: from_sources(sources[var], base[var]) for var in variables}
+
+    # semi-naive over new sources and new elements of every non-terminal:
+    # A -> B C is evaluated again only if sources of A or matrices of B, C changed
+    productions = [p for _, prods in production_schedule(var_prods) for p in prods]
+    on_sources, on_matrix = {}, {}
+    for production in productions:
+        head, body_b, body_c = production
+        on_sources.setdefault(head, []).append(production)
+        for body in {body_b, body_c}:
+            on_matrix.setdefault(body, []).append(production)
+
+    stats = kwargs.get("stats")
+    if stats is not None:
+        stats["rounds"] = []
+
+    source_deltas = {var: sources[var].copy() for var in variables}
+    deltas = dict(matrices)
+    worklist = productions
+    while worklist:
+        new_sources = {var: np.zeros(nodes_num, dtype=bool) for var in variables}
+        products = {}
+        for head, body_b, body_c in worklist:
+            # paths of B are needed from sources of A, paths of C from their ends
+            new_sources[body_b] |= source_deltas[head]
+            left = from_sources(sources[head], matrices[body_b])
+            left_delta = from_sources(
+                source_deltas[head], matrices[body_b]
+            ) + from_sources(sources[head], deltas[body_b])
+            new_sources[body_c][left_delta.indices] = True
+
+            term = left_delta @ matrices[body_c] + left @ deltas[body_c]
+            products[head] = term if head not in products else products[head] + term
+
+        triggered = set()
+        for var in variables:
+            source_deltas[var] = new_sources[var] & ~sources[var]
+            sources[var] |= source_deltas[var]
+            new = from_sources(source_deltas[var], base[var])
+            if var in products:
+                new = new + products[var]
+            deltas[var] = bool_difference(new, matrices[var])
+            matrices[var] = matrices[var] + deltas[var]
+            if source_deltas[var].any():
+                triggered.update(on_sources.get(var, ()))
+            if deltas[var].nnz > 0:
+                triggered.update(on_matrix.get(var, ()))
+
+        if stats is not None:
+            stats["rounds"].append(
+                {
+                    "productions": len(worklist),
+                    "new": sum(delta.nnz for delta in deltas.values()),
+                }
+            )
+        worklist = [p for p in productions if p in triggered]
+
+    return CfpqResult(matrices, vertices)
+
+
+def rsm_bfs(
+    graph: MultiDiGraph | str,
+    cfg: CFG | str,
+    **kwargs,
+) -> CfpqResult:
+    """
+    Multiple-source BFS over graph and recursive state machine of grammar.
+    Paths of box from vertex are found by front matrices over (rsm state, vertex),
+    calls of boxes are answered by summaries cached per (box, start vertex)
+
+    Parameters
+    ----------
+    graph: MultiDiGraph | str
+        Graph passed as MultiDiGraph object or graph name from cfpq_data dataset
+    cfg: CFG | str
+        Grammar passed as CFG object, string representation or path to file with grammar
+    start_symbol: str
+        Start non-terminal for context-free grammar in case grammar is not CFG object
+    grammar_in_file: bool
+        Is grammar passed as path to file with grammar
+    grammar_cache_dir: str
+        Directory of compiled grammar artifacts, see compiled_grammar.compile_grammar
+    start_nodes: set
+        Source vertices of query, all vertices if not passed
+    reordering: str
+        Vertex reordering strategy for graph matrices, see graph_utils.reorder_vertices
 
-        tc = rsm_matrix.intersect(g_matrix).get_transitive_closure()
+    Returns
+    -------
+    result: CfpqResult
+        Set of triples (start vertex, non-terminal symbol, final vertex)
+        for every computed summary of box
+    """
 
-        prev_nnz, new_nnz = new_nnz, tc.nnz
+    grammar_in_file = kwargs.get("grammar_in_file", False)
+    start_symbol = kwargs.get("start_symbol", "S")
 
-    return {
-        (u, label, v)
-        for label, bm in g_matrix.bool_matrices.items()
-        for u, v in zip(*bm.nonzero())
+    # transform graph and grammar
+    if grammar_in_file:
+        cfg = read_grammar_to_str(cfg)
+
+    if isinstance(graph, str):
+        graph = get_graph(graph)
+
+    grammar = compile_grammar(
+        cfg,
+        {label for _, _, label in graph.edges(data="label")},
+        start_symbol,
+        kwargs.get("grammar_cache_dir"),
+    )
+    cfg = grammar.cfg
+
+    g_matrix = AutomatonSetOfMatrix.from_graph(
+        graph, reordering=kwargs.get("reordering")
+    )
+    vertices = [state.value for state in g_matrix.get_indexed_states()]
+    indices = {vertex: i for i, vertex in enumerate(vertices)}
+    n = g_matrix.num_states
+
+    rsm = grammar.rsm
+    rsm_matrix = grammar.rsm_matrix
+    k = rsm_matrix.num_states
+    boxes = list(rsm.boxes)
+    box_indices = {box: i for i, box in enumerate(boxes)}
+    box_starts = {
+        state.value[0]: rsm_matrix.state_indices[state]
+        for state in rsm_matrix.start_states
+    }
+    is_final = np.zeros(k, dtype=bool)
+    is_final[[rsm_matrix.state_indices[s] for s in rsm_matrix.final_states]] = True
+    transitions = {
+        label: list(zip(*matrix.nonzero()))
+        for label, matrix in rsm_matrix.bool_matrices.items()
     }
 
+    # front rows are (call, rsm state) where call = box index * n + start vertex,
+    # front elements are encoded as row * n + vertex
+    summaries = {}  # call -> set of vertices reachable by box
+    callers = {}  # call -> set of caller rows with return state
+    visited = set()
+
+    def call(box, vertex, return_row, front):
+        callee = box_indices[box] * n + vertex
+        if callee not in summaries:
+            summaries[callee] = set()
+            callers[callee] = set()
+            front.append((callee * k + box_starts[box]) * n + vertex)
+        if return_row not in callers[callee]:
+            callers[callee].add(return_row)
+            front.extend(return_row * n + end for end in summaries[callee])
+
+    front = []
+    start_nodes = kwargs.get("start_nodes")
+    if start_nodes is None:
+        start_nodes = vertices
+    if rsm.start in box_starts:
+        for vertex in start_nodes:
+            if vertex in indices:
+                call(rsm.start, indices[vertex], None, front)
+
+    while front:
+        codes = np.array([code for code in set(front) if code not in visited])
+        visited.update(codes.tolist())
+        front = []
+        if len(codes) == 0:
+            break
+        rows, cols = codes // n, codes % n
+        calls, states = rows // k, rows % k
+
+        # returns from boxes: new ends of calls go to return states of callers
+        finished = is_final[states]
+        for callee, end in zip(calls[finished].tolist(), cols[finished].tolist()):
+            if end not in summaries[callee]:
+                summaries[callee].add(end)
+                front.extend(
+                    row * n + end for row in callers[callee] if row is not None
+                )
+
+        for label, moves in transitions.items():
+            for state_from, state_to in moves:
+                selected = states == state_from
+                if not selected.any():
+                    continue
+                moved_rows = calls[selected] * k + state_to
+                moved_cols = cols[selected]
+                if label in rsm.boxes:
+                    for row, vertex in zip(moved_rows.tolist(), moved_cols.tolist()):
+                        call(label, vertex, row, front)
+                elif label in g_matrix.bool_matrices:
+                    # step by graph edges over compacted front rows
+                    unique_rows, compact = np.unique(moved_rows, return_inverse=True)
+                    stepped = (
+                        bool_matrix(compact, moved_cols, (len(unique_rows), n))
+                        @ g_matrix.bool_matrices[label]
+                    ).tocoo()
+                    front.extend((unique_rows[stepped.row] * n + stepped.col).tolist())
+
+    pairs = {box: ([], []) for box in boxes}
+    for callee, ends in summaries.items():
+        rows, cols = pairs[boxes[callee // n]]
+        rows.extend([callee % n] * len(ends))
+        cols.extend(ends)
+    return CfpqResult.from_pairs(pairs, vertices)
+
+
+def regular_rpq(
+    graph: MultiDiGraph | str,
+    cfg: CFG | str,
+    **kwargs,
+) -> CfpqResult:
+    """
+    Regular path query with finite automaton of strongly regular grammar,
+    see cfg_utils.regular_cfg_to_nfa
+
+    Parameters
+    ----------
+    graph: MultiDiGraph | str
+        Graph passed as MultiDiGraph object or graph name from cfpq_data dataset
+    cfg: CFG | str
+        Grammar passed as CFG object, string representation or path to file with grammar
+    start_symbol: str
+        Start non-terminal for context-free grammar in case grammar is not CFG object
+    grammar_in_file: bool
+        Is grammar passed as path to file with grammar
+    grammar_cache_dir: str
+        Directory of compiled grammar artifacts, see compiled_grammar.compile_grammar
+    start_nodes: set
+        Source vertices of query, all vertices if not passed
+    reordering: str
+        Vertex reordering strategy for graph matrices, see graph_utils.reorder_vertices
+
+    Returns
+    -------
+    result: CfpqResult
+        Set of triples (start vertex, start non-terminal, final vertex)
+    """
+
+    grammar_in_file = kwargs.get("grammar_in_file", False)
+    start_symbol = kwargs.get("start_symbol", "S")
+
+    # transform graph and grammar
+    if grammar_in_file:
+        cfg = read_grammar_to_str(cfg)
+
+    if isinstance(graph, str):
+        graph = get_graph(graph)
+
+    grammar = compile_grammar(
+        cfg,
+        {label for _, _, label in graph.edges(data="label")},
+        start_symbol,
+        kwargs.get("grammar_cache_dir"),
+    )
+    cfg = grammar.cfg
+
+    nfa = grammar.regular_nfa
+    if nfa is None:
+        raise Exception("Grammar is not strongly regular")
+
+    g_matrix = AutomatonSetOfMatrix.from_graph(
+        graph, reordering=kwargs.get("reordering")
+    )
+    vertices = [state.value for state in g_matrix.get_indexed_states()]
+    start_nodes = kwargs.get("start_nodes")
+    sources = None
+    if start_nodes is not None:
+        sources = [
+            g_matrix.state_indices[State(v)]
+            for v in start_nodes
+            if State(v) in g_matrix.state_indices
+        ]
+
+    reachable = multiple_source_rpq(
+        g_matrix, AutomatonSetOfMatrix.from_automaton(nfa_to_minimal_dfa(nfa)), sources
+    )
+    return CfpqResult({cfg.start_symbol: reachable}, vertices)
+
+
+# engines by names of cost_model.ALGORITHMS
+ENGINES = {
+    "hellings": hellings,
+    "matrix_based": matrix_based,
+    "tensor_based": tensor_based,
+    "multiple_source": multiple_source,
+    "rsm_bfs": rsm_bfs,
+    "gll": gll,
+}
+
 
 def cfpq_by_hellings(
     cfg: CFG,
@@ -349,6 +1069,10 @@ def cfpq_by_matrix(
         Start nodes in graph
     final_nodes: set
         Final nodes in graph
+    workers: int
+        Number of workers multiplying matrices in parallel, see matrix_based
+    witnesses: bool
+        Record derivations, so that answer can rebuild them by CfpqPairs.witness
 
     Returns
     -------
@@ -392,13 +1116,44 @@ def cfpq_by_tensor(
     )
 
 
+def cfpq_by_rsm(
+    cfg: CFG,
+    graph: MultiDiGraph,
+    start_symbol: Variable = Variable("S"),
+    start_nodes: Set[any] = None,
+    final_nodes: Set[any] = None,
+    **kwargs,
+) -> Set[Tuple]:
+    """
+    Performs context-free path querying in graph with given context-free grammar via BFS over recursive state machine
+
+    Parameters
+    ----------
+    cfg: CFG
+        Input grammar
+    graph: MultiDiGraph
+        Graph
+    start_symbol: Varibale
+        Start non-terminal to make query
+    start_nodes: set
+        Start nodes in graph
+    final_nodes: set
+        Final nodes in graph
+
+    Returns
+    -------
+        Tuple with nodes satisfying cfpq
+    """
+    return cfpq(cfg, graph, start_symbol, start_nodes, final_nodes, rsm_bfs, **kwargs)
+
+
 def cfpq(
     cfg: CFG,
     graph: MultiDiGraph,
     start_symbol: Variable = Variable("S"),
     start_nodes: Set[any] = None,
     final_nodes: Set[any] = None,
-    algorithm: callable = hellings,
+    algorithm: callable | str = hellings,
     **kwargs,
 ) -> Set[Tuple]:
     """
@@ -416,12 +1171,34 @@ def cfpq(
         Start nodes in graph
     final_nodes: set
         Final nodes in graph
-    algorithm: callable
-        Algorithm to perform context-free path query
+    algorithm: callable | str
+        Algorithm to perform context-free path query:
+        hellings, matrix_based, tensor_based, multiple_source, rsm_bfs or gll,
+        "auto" to choose it by cost model
+    cost_model: CostModel
+        Cost model for "auto" algorithm, see cost_model.CostModel
+    explain: bool
+        Report features of query and estimated costs for "auto" algorithm
+        to log and stats, see cost_model.choose_algorithm
+    multiple_source: bool
+        Use multiple-source engine instead of algorithm,
+        by default it is used if there are few start nodes
+        and no option of ENGINE_OPTIONS is passed
+    regular: bool
+        Answer query of built-in algorithm or "auto" by regular path query instead
+        if grammar is strongly regular, see cfg_utils.regular_cfg_to_nfa.
+        False by default, so the requested algorithm is used
+    prefilter: bool
+        Run algorithm only on vertices of paths accepted
+        by regular over-approximation of grammar, see prefilter.prefilter_graph
+    stats: dict
+        If passed, filled with statistics of algorithm,
+        "prefilter" --- report of prefilter and "auto" --- chosen algorithm
+        and explain report of "auto" algorithm
 
     Returns
     -------
-        Tuple with nodes satisfying cfpq
+        Pairs of nodes satisfying cfpq, CfpqPairs if algorithm returns CfpqResult
     """
 
     # default config
@@ -433,13 +1210,83 @@ def cfpq(
     for kw in kwargs:
         args[kw] = kwargs[kw]
 
+    prefilter = args.pop("prefilter", False)
+    explain = args.pop("explain", False)
+    cost_model = args.pop("cost_model", None)
+    use_multiple_source = args.pop("multiple_source", None)
+    use_regular = args.pop("regular", False)
+    # engine-specific options are handled by the requested engine only
+    engine_options = [
+        option for option in ENGINE_OPTIONS if args.get(option) not in (None, False)
+    ]
+    if engine_options:
+        if use_multiple_source:
+            raise Exception(
+                f"Multiple-source engine does not support {', '.join(engine_options)}"
+            )
+        use_multiple_source = False
+    if args.get("witnesses", False):
+        use_regular = False
+    if isinstance(cfg, str):
+        cfg = compile_grammar(
+            read_grammar_to_str(cfg) if args["grammar_in_file"] else cfg,
+            start_symbol=args["start_symbol"],
+            cache_dir=args.get("grammar_cache_dir"),
+        ).cfg
+        args["grammar_in_file"] = False
+
+    # restrict graph to vertices of paths accepted by regular over-approximation
+    if prefilter:
+        graph, report = prefilter_graph(graph, cfg, start_nodes, final_nodes)
+        if args.get("stats") is not None:
+            args["stats"]["prefilter"] = report
+
+    # regular grammars are answered by single finite automaton
+    if (
+        use_regular
+        and (algorithm == "auto" or algorithm in ENGINES.values())
+        and compile_grammar(
+            cfg,
+            {label for _, _, label in graph.edges(data="label")},
+            cache_dir=args.get("grammar_cache_dir"),
+        ).regular_nfa
+        is not None
+    ):
+        algorithm = regular_rpq
+        use_multiple_source = False
+
+    # cost model already takes number of sources into account
+    if algorithm == "auto":
+        auto_stats = {}
+        algorithm = ENGINES[
+            choose_algorithm(cfg, graph, start_nodes, cost_model, explain, auto_stats)
+        ]
+        if args.get("stats") is not None:
+            args["stats"]["auto"] = auto_stats
+        if use_multiple_source is None:
+            use_multiple_source = False
+
+    # few sources are answered by multiple-source engine instead of all pairs
+    if use_multiple_source is None:
+        use_multiple_source = (
+            algorithm in (hellings, matrix_based, tensor_based)
+            and start_nodes is not None
+            and len(start_nodes) <= MULTIPLE_SOURCE_RATIO * graph.number_of_nodes()
+        )
+    if use_multiple_source:
+        algorithm = multiple_source
+    args["start_nodes"] = start_nodes
+
+    result = algorithm(graph, cfg, **args)
+    if isinstance(result, CfpqResult):
+        return result.pairs(start_symbol).restrict(start_nodes, final_nodes)
+
     if start_nodes is None:
         start_nodes = set(graph.nodes)
 
     if final_nodes is None:
         final_nodes = set(graph.nodes)
 
-    result = algorithm(graph, cfg, **args)
     ans = set(
         [
             (u, v)
@@ -0,0 +1,416 @@
+from __future__ import annotations
+
+from collections.abc import Set as AbstractSet
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from pyformlang.cfg import Variable
+from pyformlang.cfg.parse_tree import ParseTree
+from scipy import sparse
+
+from project.label_matrix import to_format
+
+__all__ = ["CfpqPairs", "CfpqResult"]
+
+
+def _vertex_array(vertices: List) -> np.ndarray:
+    """
+    Array of vertices, integer if all vertices are integers
+    """
+
+    if all(isinstance(v, (int, np.integer)) for v in vertices):
+        return np.array(vertices, dtype=np.int64).reshape(-1)
+    result = np.empty(len(vertices), dtype=object)
+    for i, vertex in enumerate(vertices):
+        result[i] = vertex
+    return result
+
+
+def _canonical(matrix) -> sparse.csr_matrix:
+    """
+    Boolean csr matrix without duplicates and with sorted indices
+    """
+
+    matrix = sparse.csr_matrix(to_format(matrix, "csr"), dtype=bool)
+    matrix.sum_duplicates()
+    matrix.eliminate_zeros()
+    matrix.sort_indices()
+    return matrix
+
+
+class CfpqPairs(AbstractSet):
+    """
+    Set of vertex pairs (u, v) stored as sparse boolean matrix.
+    Compares equal to plain set with the same pairs
+
+    Attributes
+    ----------
+    matrix: sparse.csr_matrix
+        Boolean matrix with pairs of vertex indices
+    vertices: np.ndarray
+        Vertex of each index
+    """
+
+    def __init__(
+        self,
+        matrix,
+        vertices: np.ndarray | List,
+        indices: Dict = None,
+        witnesses=None,
+        var: Variable = None,
+    ):
+        self.matrix = _canonical(matrix)
+        self.vertices = (
+            vertices if isinstance(vertices, np.ndarray) else _vertex_array(vertices)
+        )
+        self._indices = indices
+        self._witnesses = witnesses
+        self._var = var
+
+    @classmethod
+    def _from_iterable(cls, it: Iterable) -> set:
+        return set(it)
+
+    @property
+    def indices(self) -> Dict:
+        if self._indices is None:
+            self._indices = {v: i for i, v in enumerate(self.vertices.tolist())}
+        return self._indices
+
+    def __len__(self) -> int:
+        return self.matrix.nnz
+
+    def __iter__(self) -> Iterator[Tuple]:
+        vertices = self.vertices.tolist()
+        indptr, columns = self.matrix.indptr, self.matrix.indices
+        for u in np.flatnonzero(np.diff(indptr)):
+            for v in columns[indptr[u] : indptr[u + 1]]:
+                yield vertices[u], vertices[v]
+
+    def __contains__(self, pair) -> bool:
+        try:
+            u, v = pair
+            i, j = self.indices[u], self.indices[v]
+        except (TypeError, ValueError, KeyError):
+            return False
+        row = self.matrix.indices[self.matrix.indptr[i] : self.matrix.indptr[i + 1]]
+        position = np.searchsorted(row, j)
+        return bool(position < len(row) and row[position] == j)
+
+    def __repr__(self) -> str:
+        return f"CfpqPairs({self.count()} pairs)"
+
+    def count(self) -> int:
+        """
+        Get number of pairs
+
+        Returns
+        -------
+        count: int
+            Number of pairs
+        """
+
+        return self.matrix.nnz
+
+    def row(self, vertex) -> np.ndarray:
+        """
+        Get vertices paired with passed one
+
+        Parameters
+        ----------
+        vertex
+            Start vertex
+
+        Returns
+        -------
+        vertices: np.ndarray
+            Final vertices of pairs with start vertex
+        """
+
+        i = self.indices.get(vertex)
+        if i is None:
+            return self.vertices[:0]
+        return self.vertices[
+            self.matrix.indices[self.matrix.indptr[i] : self.matrix.indptr[i + 1]]
+        ]
+
+    def restrict(self, start_nodes=None, final_nodes=None) -> "CfpqPairs":
+        """
+        Get pairs with start and final vertices from passed sets
+
+        Parameters
+        ----------
+        start_nodes: set
+            Allowed start vertices, all if None
+        final_nodes: set
+            Allowed final vertices, all if None
+
+        Returns
+        -------
+        pairs: CfpqPairs
+            Restricted pairs
+        """
+
+        matrix = self.matrix
+        if start_nodes is not None:
+            matrix = self._mask(start_nodes) @ matrix
+        if final_nodes is not None:
+            matrix = matrix @ self._mask(final_nodes)
+        return CfpqPairs(
+            matrix, self.vertices, self._indices, self._witnesses, self._var
+        )
+
+    def _mask(self, nodes) -> sparse.csr_matrix:
+        mask = np.zeros(len(self.vertices), dtype=bool)
+        mask[[self.indices[v] for v in nodes if v in self.indices]] = True
+        return sparse.diags(mask, dtype=bool, format="csr")
+
+    def witness(self, u, v) -> Tuple[List[Tuple], ParseTree]:
+        """
+        Rebuild path from u to v and its derivation,
+        available if algorithm was run with witnesses
+
+        Parameters
+        ----------
+        u
+            Start vertex
+        v
+            Final vertex
+
+        Returns
+        -------
+        path: list[tuple]
+            Edges (from, label, to) of path
+        tree: ParseTree
+            Derivation of path labels in WCNF grammar
+        """
+
+        if self._witnesses is None:
+            raise Exception("Witnesses are not computed")
+        if (u, v) not in self:
+            raise Exception(f"No pair ({u}, {v})")
+        return self._witnesses.witness(u, v, self._var)
+
+    def to_numpy(self) -> np.ndarray:
+        """
+        Convert to array of pairs
+
+        Returns
+        -------
+        pairs: np.ndarray
+            Array with shape (count, 2) of start and final vertices
+        """
+
+        rows, cols = self.matrix.nonzero()
+        return np.stack([self.vertices[rows], self.vertices[cols]], axis=1)
+
+    def to_set(self) -> set:
+        """
+        Convert to plain set of pairs
+
+        Returns
+        -------
+        pairs: set[tuple]
+            Set of pairs (start vertex, final vertex)
+        """
+
+        return set(self)
+
+
+class CfpqResult(AbstractSet):
+    """
+    Set of triples (u, non-terminal, v) stored as sparse boolean matrix
+    for each non-terminal. Compares equal to plain set with the same triples
+
+    Attributes
+    ----------
+    matrices: dict
+        Boolean matrix with pairs of vertex indices for each non-terminal
+    vertices: np.ndarray
+        Vertex of each index
+    witnesses: Witnesses
+        Path lengths and split points of triples if computed, see witness.Witnesses
+    """
+
+    def __init__(self, matrices: Dict, vertices: np.ndarray | List, witnesses=None):
+        self.vertices = (
+            vertices if isinstance(vertices, np.ndarray) else _vertex_array(vertices)
+        )
+        self._indices = None
+        self.witnesses = witnesses
+        self.matrices = {
+            var: _canonical(matrix)
+            for var, matrix in matrices.items()
+            if matrix.nnz > 0
+        }
+
+    @classmethod
+    def from_pairs(
+        cls, pairs: Dict[Variable, Tuple[np.ndarray, np.ndarray]], vertices: List
+    ) -> "CfpqResult":
+        """
+        Build result from pairs of vertex indices
+
+        Parameters
+        ----------
+        pairs: dict
+            Start and final vertex indices for each non-terminal
+        vertices: list
+            Vertex of each index
+
+        Returns
+        -------
+        result: CfpqResult
+            Built result
+        """
+
+        shape = (len(vertices), len(vertices))
+        return cls(
+            {
+                var: sparse.csr_matrix(
+                    (np.ones(len(rows), dtype=bool), (rows, cols)), shape=shape
+                )
+                for var, (rows, cols) in pairs.items()
+            },
+            vertices,
+        )
+
+    @classmethod
+    def _from_iterable(cls, it: Iterable) -> set:
+        return set(it)
+
+    @property
+    def indices(self) -> Dict:
+        if self._indices is None:
+            self._indices = {v: i for i, v in enumerate(self.vertices.tolist())}
+        return self._indices
+
+    def pairs(self, var) -> CfpqPairs:
+        """
+        Get pairs of vertices connected by paths of non-terminal
+
+        Parameters
+        ----------
+        var: Variable
+            Non-terminal
+
+        Returns
+        -------
+        pairs: CfpqPairs
+            Pairs of non-terminal
+        """
+
+        matrix = self.matrices.get(var)
+        if matrix is None:
+            n = len(self.vertices)
+            matrix = sparse.csr_matrix((n, n), dtype=bool)
+        return CfpqPairs(matrix, self.vertices, self.indices, self.witnesses, var)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __iter__(self) -> Iterator[Tuple]:
+        for var in self.matrices:
+            for u, v in self.pairs(var):
+                yield u, var, v
+
+    def __contains__(self, triple) -> bool:
+        try:
+            u, var, v = triple
+            return var in self.matrices and (u, v) in self.pairs(var)
+        except (TypeError, ValueError):
+            return False
+
+    def __repr__(self) -> str:
+        return f"CfpqResult({self.count()} triples)"
+
+    def count(self, var=None) -> int:
+        """
+        Get number of triples
+
+        Parameters
+        ----------
+        var: Variable
+            Count only triples of this non-terminal if passed
+
+        Returns
+        -------
+        count: int
+            Number of triples
+        """
+
+        if var is not None:
+            return self.pairs(var).count()
+        return sum(matrix.nnz for matrix in self.matrices.values())
+
+    def row(self, vertex, var) -> np.ndarray:
+        """
+        Get vertices reachable from passed one by paths of non-terminal
+
+        Parameters
+        ----------
+        vertex
+            Start vertex
+        var: Variable
+            Non-terminal
+
+        Returns
+        -------
+        vertices: np.ndarray
+            Final vertices
+        """
+
+        return self.pairs(var).row(vertex)
+
+    def witness(self, u, v, var) -> Tuple[List[Tuple], ParseTree]:
+        """
+        Rebuild path from u to v of non-terminal and its derivation,
+        available if algorithm was run with witnesses
+
+        Parameters
+        ----------
+        u
+            Start vertex
+        v
+            Final vertex
+        var: Variable
+            Non-terminal
+
+        Returns
+        -------
+        path: list[tuple]
+            Edges (from, label, to) of path
+        tree: ParseTree
+            Derivation of path labels in WCNF grammar
+        """
+
+        return self.pairs(var).witness(u, v)
+
+    def to_numpy(self, var) -> np.ndarray:
+        """
+        Convert pairs of non-terminal to array
+
+        Parameters
+        ----------
+        var: Variable
+            Non-terminal
+
+        Returns
+        -------
+        pairs: np.ndarray
+            Array with shape (count, 2) of start and final vertices
+        """
+
+        return self.pairs(var).to_numpy()
+
+    def to_set(self) -> set:
+        """
+        Convert to plain set of triples
+
+        Returns
+        -------
+        triples: set[tuple]
+            Set of triples (start vertex, non-terminal symbol, final vertex)
+        """
+
+        return set(self)
@@ -0,0 +1,127 @@
+"""
+Checkpoints of CFPQ fixpoint state.
+
+Checkpoint is compressed .npz file with indptr and indices of every matrix
+and json description: names of matrices, their shapes, algorithm, vertices,
+key of grammar and iteration counter. File is written to temporary file in the same directory
+and then atomically replaces previous checkpoint.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from project.label_matrix import to_format
+
+__all__ = ["save_checkpoint", "load_checkpoint"]
+
+
+def save_checkpoint(
+    path: str,
+    matrices: Dict,
+    algorithm: str,
+    vertices: List,
+    state: Dict,
+    grammar_key: str = None,
+) -> None:
+    """
+    Atomically save matrices and description of fixpoint state
+
+    Parameters
+    ----------
+    path: str
+        Path to checkpoint file
+    matrices: dict
+        Boolean matrix in one of label_matrix.FORMATS for each key,
+        keys are saved as their string representations
+    algorithm: str
+        Name of algorithm which saves state
+    vertices: list
+        Vertex of each matrix index
+    state: dict
+        Json serializable counters of algorithm, for example "iteration"
+    grammar_key: str
+        Canonical hash of grammar, see compiled_grammar.grammar_key
+    """
+
+    arrays, names, shapes = {}, [], []
+    for i, (key, matrix) in enumerate(matrices.items()):
+        matrix = sparse.csr_matrix(to_format(matrix, "csr"), dtype=bool)
+        arrays[f"indptr_{i}"] = matrix.indptr
+        arrays[f"indices_{i}"] = matrix.indices
+        names.append(str(key))
+        shapes.append(list(matrix.shape))
+    meta = dict(
+        state,
+        algorithm=algorithm,
+        grammar=grammar_key,
+        vertices=[repr(v) for v in vertices],
+        names=names,
+        shapes=shapes,
+    )
+    arrays["meta"] = np.array(json.dumps(meta))
+
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            np.savez_compressed(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def load_checkpoint(
+    path: str, algorithm: str, vertices: List, grammar_key: str = None
+) -> Tuple[Dict[str, sparse.csr_matrix], Dict]:
+    """
+    Load fixpoint state saved by save_checkpoint
+
+    Parameters
+    ----------
+    path: str
+        Path to checkpoint file
+    algorithm: str
+        Name of algorithm which resumes, it must be the one which saved state
+    vertices: list
+        Vertex of each matrix index, it must be the same as in saved state
+    grammar_key: str
+        Canonical hash of grammar, it must be the same as in saved state
+
+    Returns
+    -------
+    matrices: dict[str, sparse.csr_matrix]
+        Matrices by string representations of their keys
+    meta: dict
+        Counters of algorithm passed to save_checkpoint
+    """
+
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("algorithm") != algorithm:
+            raise Exception(
+                f"Checkpoint of {meta.get('algorithm')} can not be resumed by {algorithm}"
+            )
+        if meta.get("vertices") != [repr(v) for v in vertices]:
+            raise Exception("Checkpoint is made for another graph")
+        if meta.get("grammar") != grammar_key:
+            raise Exception("Checkpoint is made for another grammar")
+        matrices = {}
+        for i, (name, shape) in enumerate(zip(meta["names"], meta["shapes"])):
+            indices = data[f"indices_{i}"]
+            matrices[name] = sparse.csr_matrix(
+                (np.ones(len(indices), dtype=bool), indices, data[f"indptr_{i}"]),
+                shape=tuple(shape),
+            )
+    return matrices, meta
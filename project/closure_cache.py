@@ -0,0 +1,139 @@
+"""
+Cache of materialized closures of starred regular subexpressions.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Hashable
+
+import networkx as nx
+from scipy import sparse
+
+from project.label_index import graph_fingerprint
+
+__all__ = ["ClosureCache", "get_closure_cache"]
+
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+MAX_CACHES = 8
+
+_cache_pool: OrderedDict[str, "ClosureCache"] = OrderedDict()
+
+
+def _matrix_size(matrix: sparse.csr_matrix) -> int:
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+class ClosureCache:
+    """
+    LRU cache of closure matrices of one graph.
+    Matrices are indexed by graph vertices in graph.nodes order.
+
+    Attributes
+    ----------
+    memory_budget: int
+        Maximal total size of cached matrices in bytes
+    memory_used: int
+        Current total size of cached matrices in bytes
+    hits: int
+        Number of successful lookups
+    misses: int
+        Number of failed lookups
+    """
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._matrices: OrderedDict[Hashable, sparse.csr_matrix] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._matrices)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._matrices
+
+    def get(self, key: Hashable) -> sparse.csr_matrix | None:
+        """
+        Get closure matrix and mark it as recently used
+
+        Parameters
+        ----------
+        key: Hashable
+            Canonical key of starred subexpression
+
+        Returns
+        -------
+        matrix: sparse.csr_matrix | None
+            Cached matrix or None if there is no such matrix
+        """
+
+        matrix = self._matrices.get(key)
+        if matrix is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._matrices.move_to_end(key)
+        return matrix
+
+    def put(self, key: Hashable, matrix: sparse.csr_matrix) -> None:
+        """
+        Put closure matrix to cache evicting least recently used matrices.
+        Matrices larger than memory budget are not cached
+
+        Parameters
+        ----------
+        key: Hashable
+            Canonical key of starred subexpression
+        matrix: sparse.csr_matrix
+            Closure matrix
+        """
+
+        if key in self._matrices:
+            self.memory_used -= _matrix_size(self._matrices.pop(key))
+
+        size = _matrix_size(matrix)
+        if size > self.memory_budget:
+            return
+
+        while self.memory_used + size > self.memory_budget:
+            _, evicted = self._matrices.popitem(last=False)
+            self.memory_used -= _matrix_size(evicted)
+
+        self._matrices[key] = matrix
+        self.memory_used += size
+
+
+def get_closure_cache(
+    graph: nx.MultiDiGraph, memory_budget: int = DEFAULT_MEMORY_BUDGET
+) -> ClosureCache:
+    """
+    Get closure cache of graph, creating it on first access.
+    At most MAX_CACHES recently used caches are kept; least recently used
+    caches of other graphs are dropped while their total size exceeds
+    memory budget
+
+    Parameters
+    ----------
+    graph: nx.MultiDiGraph
+        Labeled graph
+    memory_budget: int
+        Memory budget for new cache and for all cached graphs in bytes
+
+    Returns
+    -------
+    cache: ClosureCache
+        Cache of passed graph
+    """
+
+    fingerprint = graph_fingerprint(graph)
+    if fingerprint not in _cache_pool:
+        _cache_pool[fingerprint] = ClosureCache(memory_budget)
+    _cache_pool.move_to_end(fingerprint)
+    while len(_cache_pool) > MAX_CACHES or (
+        len(_cache_pool) > 1
+        and sum(cache.memory_used for cache in _cache_pool.values()) > memory_budget
+    ):
+        _cache_pool.popitem(last=False)
+    return _cache_pool[fingerprint]
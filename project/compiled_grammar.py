@@ -0,0 +1,332 @@
+"""
+Grammar compiled once into forms used by query algorithms.
+
+CompiledGrammar computes production tables and grammars in WCNF and CNF, ECFG, recursive state machine, its matrices
+and finite automaton of regular grammar lazily on first access.
+Compiled grammars are kept by canonical hash of productions in bounded
+in-process LRU cache, forms can also be stored as pickled artifacts
+in cache directory and reused by other processes.
+Cache directory is passed per call: grammars in process cache are not bound
+to any directory, compile_grammar returns their copies bound to passed one.
+Forms are shared by all users of compiled grammar and must not be modified.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+from pyformlang.cfg import CFG
+
+from project.automaton_matrix import AutomatonSetOfMatrix
+from project.cfg_utils import read_cfg, regular_cfg_to_nfa, trim_cfg
+from project.ecfg import ECFG
+from project.normal_form import (
+    ProductionTable,
+    canonical_text,
+    cnf_table,
+    wcnf_table,
+)
+from project.rsm import RSM
+
+__all__ = [
+    "CompiledGrammar",
+    "grammar_key",
+    "compile_grammar",
+    "clear_compiled_grammars",
+]
+
+# number of compiled grammars and of grammar texts kept in process
+MAX_COMPILED = 128
+# number of trimmed grammars remembered by each compiled grammar
+MAX_RESTRICTED = 32
+
+_compiled: OrderedDict[str, "CompiledGrammar"] = OrderedDict()
+_texts: OrderedDict[tuple, str] = OrderedDict()  # (text, start) -> key
+
+# numbers of compiled grammars found in process cache and created
+cache_info = {"hits": 0, "misses": 0}
+
+
+def grammar_key(cfg: CFG) -> str:
+    """
+    Canonical hash of grammar, independent of order of productions
+
+    Parameters
+    ----------
+    cfg: CFG
+        Grammar
+
+    Returns
+    -------
+    key: str
+        Hex digest of start symbol and sorted productions
+    """
+
+    productions = sorted(canonical_text(p) for p in cfg.productions)
+    start = cfg.start_symbol
+    text = "\n".join([f"{type(start).__name__}:{start.value!r}"] + productions)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _lookup(key: str) -> CompiledGrammar | None:
+    grammar = _compiled.get(key)
+    if grammar is not None:
+        _compiled.move_to_end(key)
+    return grammar
+
+
+def _remember(grammar: CompiledGrammar) -> CompiledGrammar:
+    _compiled[grammar.key] = grammar
+    _compiled.move_to_end(grammar.key)
+    while len(_compiled) > MAX_COMPILED:
+        _compiled.popitem(last=False)
+    return grammar
+
+
+class CompiledGrammar:
+    """
+    Grammar with lazily computed forms
+
+    Attributes
+    ----------
+    cfg: CFG
+        Grammar
+    key: str
+        Canonical hash of grammar, see grammar_key
+    cache_dir: str
+        Directory of pickled forms, forms are kept only in memory if None.
+        Copies bound to other directories share forms and stats, see bind
+    stats: dict
+        Numbers of forms "built" and "loaded" from cache directory
+    """
+
+    def __init__(self, cfg: CFG, cache_dir: str = None, key: str = None):
+        self.cfg = cfg
+        self.key = key if key is not None else grammar_key(cfg)
+        self.cache_dir = cache_dir
+        self.stats = {"built": 0, "loaded": 0}
+        self._forms = {}
+        # frozenset of labels -> compiled trimmed grammar
+        self._restricted: OrderedDict[frozenset, CompiledGrammar] = OrderedDict()
+
+    def bind(self, cache_dir: str) -> CompiledGrammar:
+        """
+        Get copy of compiled grammar which stores forms in cache directory,
+        copy shares forms, stats and trimmed grammars with this one
+
+        Parameters
+        ----------
+        cache_dir: str
+            Directory of pickled forms, forms are kept only in memory if None
+
+        Returns
+        -------
+        grammar: CompiledGrammar
+            This grammar if it is already bound to directory, otherwise its copy
+        """
+
+        if cache_dir == self.cache_dir:
+            return self
+        grammar = copy.copy(self)
+        grammar.cache_dir = cache_dir
+        return grammar
+
+    def _form(self, name: str, build: Callable):
+        if name in self._forms:
+            return self._forms[name]
+
+        path = None
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, f"{self.key}.{name}.pickle")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    self._forms[name] = pickle.load(f)
+                self.stats["loaded"] += 1
+                return self._forms[name]
+
+        form = build()
+        self.stats["built"] += 1
+        self._forms[name] = form
+        if path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(descriptor, "wb") as f:
+                    pickle.dump(form, f)
+                os.replace(temporary, path)
+            except BaseException:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                raise
+        return form
+
+    @property
+    def wcnf_table(self) -> ProductionTable:
+        """
+        Productions in weak Chomsky normal form, see normal_form.wcnf_table
+        """
+
+        return self._form("wcnf_table", lambda: wcnf_table(self.cfg))
+
+    @property
+    def wcnf(self) -> CFG:
+        """
+        Grammar in weak Chomsky normal form
+        """
+
+        return self._form("wcnf", lambda: self.wcnf_table.to_cfg())
+
+    @property
+    def cnf_table(self) -> ProductionTable:
+        """
+        Productions in Chomsky normal form, see normal_form.cnf_table
+        """
+
+        return self._form("cnf_table", lambda: cnf_table(self.cfg))
+
+    @property
+    def cnf(self) -> CFG:
+        """
+        Grammar in Chomsky normal form, it does not generate empty word
+        """
+
+        return self._form("cnf", lambda: self.cnf_table.to_cfg())
+
+    @property
+    def ecfg(self) -> ECFG:
+        """
+        Extended context-free grammar
+        """
+
+        return self._form("ecfg", lambda: ECFG.from_cfg(self.cfg))
+
+    @property
+    def rsm(self) -> RSM:
+        """
+        Recursive state machine of extended grammar
+        """
+
+        return self._form("rsm", lambda: RSM.from_ecfg(self.ecfg))
+
+    @property
+    def rsm_matrix(self) -> AutomatonSetOfMatrix:
+        """
+        Boolean matrices of recursive state machine
+        """
+
+        return self._form("rsm_matrix", lambda: AutomatonSetOfMatrix.from_rsm(self.rsm))
+
+    @property
+    def regular_nfa(self):
+        """
+        Finite automaton of grammar or None if it is not strongly regular,
+        see cfg_utils.regular_cfg_to_nfa
+        """
+
+        return self._form("regular_nfa", lambda: regular_cfg_to_nfa(self.cfg))
+
+    def restrict(self, labels: Iterable) -> CompiledGrammar:
+        """
+        Get compiled grammar trimmed to labels, see cfg_utils.trim_cfg.
+        Trimmed grammars are remembered by labels used in grammar,
+        so graphs with different other labels share them.
+        Trimmed grammar is bound to cache directory of this one
+
+        Parameters
+        ----------
+        labels: Iterable
+            Available terminal labels, for example labels of graph edges
+
+        Returns
+        -------
+        grammar: CompiledGrammar
+            Compiled trimmed grammar
+        """
+
+        terminals = {symbol.value for symbol in self.cfg.terminals}
+        used = frozenset(label for label in labels if label in terminals)
+        if used in self._restricted:
+            self._restricted.move_to_end(used)
+        else:
+            trimmed = trim_cfg(self.cfg, used)
+            key = grammar_key(trimmed)
+            grammar = _lookup(key)
+            if grammar is None:
+                grammar = CompiledGrammar(trimmed, key=key)
+            self._restricted[used] = _remember(grammar)
+            while len(self._restricted) > MAX_RESTRICTED:
+                self._restricted.popitem(last=False)
+        return self._restricted[used].bind(self.cache_dir)
+
+
+def compile_grammar(
+    cfg: CompiledGrammar | CFG | str,
+    labels: Iterable = None,
+    start_symbol: str = "S",
+    cache_dir: str = None,
+) -> CompiledGrammar:
+    """
+    Get compiled grammar from process cache or compile it
+
+    Parameters
+    ----------
+    cfg: CompiledGrammar | CFG | str
+        Grammar passed as compiled grammar, CFG object or string representation
+    labels: Iterable
+        If passed, grammar is trimmed to these terminal labels
+    start_symbol: str
+        Start non-terminal for grammar in case grammar is string
+    cache_dir: str
+        Directory of pickled forms shared between processes,
+        it is used only by returned grammar
+
+    Returns
+    -------
+    grammar: CompiledGrammar
+        Compiled grammar, forms are computed on first access
+    """
+
+    if isinstance(cfg, CompiledGrammar):
+        grammar = cfg
+    else:
+        # grammar text is parsed only if it is not remembered
+        text = cfg if isinstance(cfg, str) else None
+        grammar = None
+        if text is not None and (text, start_symbol) in _texts:
+            grammar = _lookup(_texts[(text, start_symbol)])
+        if grammar is None:
+            if text is not None:
+                cfg = read_cfg(text, start_symbol)
+            grammar = _lookup(grammar_key(cfg))
+        if grammar is None:
+            cache_info["misses"] += 1
+            grammar = _remember(CompiledGrammar(cfg))
+        else:
+            cache_info["hits"] += 1
+        if text is not None:
+            _texts[(text, start_symbol)] = grammar.key
+            _texts.move_to_end((text, start_symbol))
+            while len(_texts) > MAX_COMPILED:
+                _texts.popitem(last=False)
+
+    if cache_dir is not None:
+        grammar = grammar.bind(cache_dir)
+    if labels is not None:
+        grammar = grammar.restrict(labels)
+    return grammar
+
+
+def clear_compiled_grammars() -> None:
+    """
+    Forget compiled grammars of process, artifacts in cache directories are kept
+    """
+
+    _compiled.clear()
+    _texts.clear()
+    cache_info["hits"] = cache_info["misses"] = 0
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import json
+import logging
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+
+from project.compiled_grammar import compile_grammar
+
+__all__ = ["ALGORITHMS", "CostModel", "query_features", "choose_algorithm"]
+
+ALGORITHMS = (
+    "hellings",
+    "matrix_based",
+    "tensor_based",
+    "multiple_source",
+    "rsm_bfs",
+    "gll",
+)
+
+logger = logging.getLogger(__name__)
+
+# (intercept, slope) of estimated time in seconds for work term of each algorithm,
+# fitted by "scripts/benchmark.py calibrate" on barabasi-albert graphs
+DEFAULT_COEFFICIENTS = {
+    "hellings": (0.0, 2.6e-4),
+    "matrix_based": (1.3e-3, 3.8e-6),
+    "tensor_based": (5.5e-2, 3.8e-7),
+    "multiple_source": (4.1e-2, 5.5e-6),
+    "rsm_bfs": (2.5e-1, 1.6e-5),
+    "gll": (4.9e-1, 2.0e-5),
+}
+
+
+def query_features(
+    cfg: CFG, graph: MultiDiGraph, start_nodes: set = None
+) -> Dict[str, float]:
+    """
+    Get features of query used by cost model
+
+    Parameters
+    ----------
+    cfg: CFG
+        Grammar
+    graph: MultiDiGraph
+        Graph
+    start_nodes: set
+        Start nodes in graph, all nodes if None
+
+    Returns
+    -------
+    features: dict
+        Sizes of graph, of grammar in WCNF and of its recursive state machine
+    """
+
+    labels = {label for _, _, label in graph.edges(data="label")}
+    grammar = compile_grammar(cfg, labels)
+    wcnf = grammar.wcnf
+    rsm_matrix = grammar.rsm_matrix
+
+    vertices = max(graph.number_of_nodes(), 1)
+    edges = graph.number_of_edges()
+    sources = vertices if start_nodes is None else len(start_nodes)
+    return {
+        "vertices": vertices,
+        "edges": edges,
+        "labels": len(labels),
+        "nnz_per_label": edges / max(len(labels), 1),
+        "mean_degree": edges / vertices,
+        "source_fraction": min(sources / vertices, 1.0),
+        "productions": len(wcnf.productions),
+        "binary_productions": sum(len(p.body) == 2 for p in wcnf.productions),
+        "nonterminals": len(wcnf.variables),
+        "rsm_states": rsm_matrix.num_states,
+    }
+
+
+def _work(algorithm: str, f: Dict[str, float]) -> float:
+    """
+    Work term of algorithm, estimated time is linear in it
+    """
+
+    # number of joins of adjacent facts: productions by edges by branching
+    joins = max(f["binary_productions"], 1) * f["edges"] * max(f["mean_degree"], 1)
+    # graph traversals of recursive state machine
+    traversal = f["rsm_states"] * f["edges"] * max(f["mean_degree"], 1)
+    if algorithm == "hellings":
+        return joins
+    if algorithm == "matrix_based":
+        return joins + f["nonterminals"] * f["vertices"]
+    if algorithm == "tensor_based":
+        return traversal * f["rsm_states"] + f["nnz_per_label"] * f["labels"]
+    if algorithm == "multiple_source":
+        return joins * f["source_fraction"] + f["nonterminals"] * f["vertices"]
+    if algorithm in ("rsm_bfs", "gll"):
+        return traversal * f["source_fraction"]
+    raise Exception(f"Unknown algorithm {algorithm}")
+
+
+class CostModel:
+    """
+    Linear model of CFPQ algorithms running time
+
+    Attributes
+    ----------
+    coefficients: dict[str, tuple[float, float]]
+        Intercept and slope of estimated time by work term of each algorithm
+    """
+
+    def __init__(self, coefficients: Dict[str, Tuple[float, float]] = None):
+        self.coefficients = dict(
+            DEFAULT_COEFFICIENTS if coefficients is None else coefficients
+        )
+
+    def estimate(self, features: Dict[str, float]) -> Dict[str, float]:
+        """
+        Estimate running time of each algorithm
+
+        Parameters
+        ----------
+        features: dict
+            Query features, see query_features
+
+        Returns
+        -------
+        costs: dict[str, float]
+            Estimated time in seconds of each algorithm
+        """
+
+        return {
+            algorithm: intercept + slope * _work(algorithm, features)
+            for algorithm, (intercept, slope) in self.coefficients.items()
+        }
+
+    def choose(self, features: Dict[str, float]) -> str:
+        """
+        Choose algorithm with the least estimated time
+
+        Parameters
+        ----------
+        features: dict
+            Query features, see query_features
+
+        Returns
+        -------
+        algorithm: str
+            Name of algorithm
+        """
+
+        costs = self.estimate(features)
+        return min(costs, key=costs.get)
+
+    def explain(self, features: Dict[str, float]) -> str:
+        """
+        Describe query features, estimated costs and chosen algorithm
+
+        Parameters
+        ----------
+        features: dict
+            Query features, see query_features
+
+        Returns
+        -------
+        report: str
+            Lines of features, algorithms by estimated time and chosen algorithm
+        """
+
+        costs = self.estimate(features)
+        algorithm = min(costs, key=costs.get)
+        lines = [
+            "Query features: "
+            + ", ".join(f"{name}={value:g}" for name, value in features.items())
+        ]
+        for name, cost in sorted(costs.items(), key=lambda item: item[1]):
+            mark = "*" if name == algorithm else " "
+            lines.append(f"{mark} {name:>16}: {cost:.4g} s")
+        lines.append(f"Chosen algorithm: {algorithm}")
+        return "\n".join(lines)
+
+    def calibrate(self, runs: Iterable[Tuple[str, Dict[str, float], float]]) -> None:
+        """
+        Fit coefficients by least squares on measured running times
+
+        Parameters
+        ----------
+        runs: Iterable[tuple]
+            Triples (algorithm, query features, measured time in seconds),
+            algorithms without at least two runs keep their coefficients
+        """
+
+        measurements = {}
+        for algorithm, features, time in runs:
+            measurements.setdefault(algorithm, []).append(
+                (_work(algorithm, features), time)
+            )
+        for algorithm, points in measurements.items():
+            if len(points) < 2:
+                continue
+            work, times = np.array(points, dtype=float).T
+            (intercept, slope), *_ = np.linalg.lstsq(
+                np.stack([np.ones_like(work), work], axis=1), times, rcond=None
+            )
+            self.coefficients[algorithm] = (max(intercept, 0.0), max(slope, 1e-12))
+
+    def save(self, path: str) -> None:
+        """
+        Save coefficients to json file
+
+        Parameters
+        ----------
+        path: str
+            Path to file
+        """
+
+        with open(path, "w") as f:
+            json.dump(self.coefficients, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "CostModel":
+        """
+        Load model from json file with coefficients
+
+        Parameters
+        ----------
+        path: str
+            Path to file
+
+        Returns
+        -------
+        model: CostModel
+            Loaded model
+        """
+
+        with open(path, "r") as f:
+            return cls({alg: tuple(c) for alg, c in json.load(f).items()})
+
+
+def choose_algorithm(
+    cfg: CFG,
+    graph: MultiDiGraph,
+    start_nodes: set = None,
+    model: CostModel = None,
+    explain: bool = False,
+    stats: dict = None,
+) -> str:
+    """
+    Choose CFPQ algorithm by cost model
+
+    Parameters
+    ----------
+    cfg: CFG
+        Grammar
+    graph: MultiDiGraph
+        Graph
+    start_nodes: set
+        Start nodes in graph, all nodes if None
+    model: CostModel
+        Cost model, model with default coefficients if None
+    explain: bool
+        Log query features and estimated costs at INFO level, see CostModel.explain
+    stats: dict
+        If passed, filled with "chosen" --- name of chosen algorithm
+        and "report" --- report of CostModel.explain if explain is set, None otherwise
+
+    Returns
+    -------
+    algorithm: str
+        Name of chosen algorithm, one of ALGORITHMS
+    """
+
+    model = CostModel() if model is None else model
+    features = query_features(cfg, graph, start_nodes)
+    report = model.explain(features) if explain else None
+    if report is not None:
+        logger.info(report)
+    chosen = model.choose(features)
+    if stats is not None:
+        stats["chosen"] = chosen
+        stats["report"] = report
+    return chosen
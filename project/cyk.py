@@ -1,5 +1,7 @@
 from pyformlang.cfg import CFG
 
+from project.compiled_grammar import compile_grammar
+
 __all__ = [
     "cyk",
 ]
@@ -27,27 +29,26 @@ def cyk(word: str, cfg: CFG) -> bool:
         return cfg.generate_epsilon()
 
     n = len(word)
-    cnf = cfg.to_normal_form()
+    cnf = compile_grammar(cfg).cnf_table
     dp = [[set() for _ in range(n)] for _ in range(n)]
 
-    prods_terminal = [p for p in cnf.productions if len(p.body) == 1]
-    prods_non_terminals = [p for p in cnf.productions if len(p.body) == 2]
+    # non-terminals are indices of production table
+    heads_by_terminal = {}
+    for head, terminal in cnf.unary.tolist():
+        heads_by_terminal.setdefault(cnf.terminals[terminal].value, set()).add(head)
+    prods_non_terminals = cnf.binary.tolist()
 
     for i, term in enumerate(word):
-        dp[i][i].update(
-            production.head.value
-            for production in prods_terminal
-            if word[i] == production.body[0].value
-        )
+        dp[i][i].update(heads_by_terminal.get(term, ()))
 
     for step in range(1, n):
         for i in range(n - step):
             j = i + step
             for k in range(i, j):
                 dp[i][j].update(
-                    p.head
-                    for p in prods_non_terminals
-                    if p.body[0] in dp[i][k] and p.body[1] in dp[k + 1][j]
+                    head
+                    for head, left, right in prods_non_terminals
+                    if left in dp[i][k] and right in dp[k + 1][j]
                 )
 
-    return cfg.start_symbol in dp[0][n - 1]
+    return cnf.start in dp[0][n - 1]
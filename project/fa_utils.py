@@ -102,3 +102,40 @@ def add_nfa_states(
         new_nfa.add_final_state(state)
 
     return new_nfa
+
+
+def canonical_dfa_key(dfa: DeterministicFiniteAutomaton) -> tuple:
+    """
+    Build representation of dfa which does not depend on names of its states.
+    Equal minimal dfa have equal keys.
+
+    Parameters
+    ----------
+    dfa: DeterministicFiniteAutomaton
+        Deterministic Finite Automaton.
+
+    Returns
+    -------
+    key: tuple
+        Triple of (number of states, numbers of final states, transitions)
+    """
+
+    if not dfa.start_states:
+        return 0, (), ()
+
+    transitions = dfa.to_dict()
+    start = next(iter(dfa.start_states))
+    numbers = {start: 0}
+    queue = [start]
+    edges = []
+    for state in queue:
+        for symbol, state_to in sorted(
+            transitions.get(state, {}).items(), key=lambda t: repr(t[0].value)
+        ):
+            if state_to not in numbers:
+                numbers[state_to] = len(numbers)
+                queue.append(state_to)
+            edges.append((numbers[state], symbol.value, numbers[state_to]))
+
+    finals = tuple(sorted(numbers[s] for s in dfa.final_states if s in numbers))
+    return len(numbers), finals, tuple(edges)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Iterator, Tuple
+
+import numpy as np
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+
+from project.automaton_matrix import AutomatonSetOfMatrix
+from project.cfg_utils import read_grammar_to_str
+from project.cfpq_result import CfpqResult
+from project.compiled_grammar import compile_grammar
+from project.manager import get_graph
+
+__all__ = ["gll", "gll_stream"]
+
+
+def _gll_summaries(
+    graph: MultiDiGraph | str, cfg: CFG | str, **kwargs
+) -> Tuple[list, list, int, Iterator[Tuple]]:
+    """
+    Generalized LL over graph and recursive state machine of grammar.
+    Descriptors (rsm state, call, vertex) are processed from worklist,
+    call = box index * |V| + start vertex is node of graph structured stack
+    with return rows (caller call * |rsm states| + return state)
+
+    Parameters
+    ----------
+    graph: MultiDiGraph | str
+        Graph passed as MultiDiGraph object or graph name from cfpq_data dataset
+    cfg: CFG | str
+        Grammar passed as CFG object, string representation or path to file with grammar
+    start_symbol: str
+        Start non-terminal for context-free grammar in case grammar is not CFG object
+    grammar_in_file: bool
+        Is grammar passed as path to file with grammar
+    grammar_cache_dir: str
+        Directory of compiled grammar artifacts, see compiled_grammar.compile_grammar
+    start_nodes: set
+        Source vertices of query, all vertices if not passed
+
+    Returns
+    -------
+    vertices: list
+        Graph vertices by ids
+    boxes: list
+        Boxes of recursive state machine by ids
+    start_box: int
+        Id of box of start non-terminal or None if it has no box
+    summaries: Iterator[tuple]
+        Triples (start vertex id, box id, final vertex id)
+        yielded as soon as box path is found
+    """
+
+    grammar_in_file = kwargs.get("grammar_in_file", False)
+    start_symbol = kwargs.get("start_symbol", "S")
+
+    # transform graph and grammar
+    if grammar_in_file:
+        cfg = read_grammar_to_str(cfg)
+
+    if isinstance(graph, str):
+        graph = get_graph(graph)
+
+    grammar = compile_grammar(
+        cfg,
+        {label for _, _, label in graph.edges(data="label")},
+        start_symbol,
+        kwargs.get("grammar_cache_dir"),
+    )
+    cfg = grammar.cfg
+
+    g_matrix = AutomatonSetOfMatrix.from_graph(graph)
+    vertices = [state.value for state in g_matrix.get_indexed_states()]
+    indices = {vertex: i for i, vertex in enumerate(vertices)}
+    n = g_matrix.num_states
+    adjacency = {
+        label: (matrix.indptr, matrix.indices)
+        for label, matrix in g_matrix.bool_matrices.items()
+    }
+
+    rsm = grammar.rsm
+    rsm_matrix = grammar.rsm_matrix
+    k = rsm_matrix.num_states
+    boxes = list(rsm.boxes)
+    box_indices = {box: i for i, box in enumerate(boxes)}
+    box_starts = [None] * len(boxes)
+    for state in rsm_matrix.start_states:
+        box_starts[box_indices[state.value[0]]] = rsm_matrix.state_indices[state]
+    is_final = np.zeros(k, dtype=bool)
+    is_final[[rsm_matrix.state_indices[s] for s in rsm_matrix.final_states]] = True
+
+    # outgoing transitions of rsm states: (state to, called box or None, graph label)
+    moves = [[] for _ in range(k)]
+    for label, matrix in rsm_matrix.bool_matrices.items():
+        for state_from, state_to in zip(*matrix.nonzero()):
+            if label in box_indices:
+                moves[state_from].append((int(state_to), box_indices[label], None))
+            elif label in adjacency:
+                moves[state_from].append((int(state_to), None, adjacency[label]))
+
+    popped = {}  # call -> ends of box paths
+    returns = {}  # call -> return rows of callers
+    seen = set()
+    descriptors = deque()
+
+    def add(state, call, vertex):
+        code = (call * k + state) * n + vertex
+        if code not in seen:
+            seen.add(code)
+            descriptors.append((state, call, vertex))
+
+    def create(box, vertex, return_row):
+        callee = box * n + vertex
+        if callee not in returns:
+            returns[callee] = set()
+            popped[callee] = set()
+            add(box_starts[box], callee, vertex)
+        if return_row is not None and return_row not in returns[callee]:
+            returns[callee].add(return_row)
+            for end in popped[callee]:
+                add(return_row % k, return_row // k, end)
+
+    start_nodes = kwargs.get("start_nodes")
+    if start_nodes is None:
+        start_nodes = vertices
+    if rsm.start in box_indices:
+        for vertex in start_nodes:
+            if vertex in indices:
+                create(box_indices[rsm.start], indices[vertex], None)
+
+    def search():
+        while descriptors:
+            state, call, vertex = descriptors.popleft()
+
+            if is_final[state] and vertex not in popped[call]:
+                popped[call].add(vertex)
+                yield call % n, call // n, vertex
+                for return_row in returns[call]:
+                    add(return_row % k, return_row // k, vertex)
+
+            for state_to, box, edges in moves[state]:
+                if box is not None:
+                    create(box, vertex, call * k + state_to)
+                else:
+                    indptr, targets = edges
+                    for target in targets[indptr[vertex] : indptr[vertex + 1]]:
+                        add(state_to, call, int(target))
+
+    return vertices, boxes, box_indices.get(rsm.start), search()
+
+
+def gll_stream(graph: MultiDiGraph | str, cfg: CFG | str, **kwargs) -> Iterator[Tuple]:
+    """
+    Stream pairs of vertices connected by paths of start non-terminal
+    as soon as they are found by generalized LL
+
+    Parameters
+    ----------
+    graph: MultiDiGraph | str
+        Graph passed as MultiDiGraph object or graph name from cfpq_data dataset
+    cfg: CFG | str
+        Grammar passed as CFG object, string representation or path to file with grammar
+    start_symbol: str
+        Start non-terminal for context-free grammar in case grammar is not CFG object
+    grammar_in_file: bool
+        Is grammar passed as path to file with grammar
+    grammar_cache_dir: str
+        Directory of compiled grammar artifacts, see compiled_grammar.compile_grammar
+    start_nodes: set
+        Source vertices of query, all vertices if not passed
+    final_nodes: set
+        Destination vertices of query, all vertices if not passed
+
+    Returns
+    -------
+    pairs: Iterator[tuple]
+        Pairs (start vertex, final vertex)
+    """
+
+    vertices, _, start_box, summaries = _gll_summaries(graph, cfg, **kwargs)
+    start_nodes = kwargs.get("start_nodes")
+    final_nodes = kwargs.get("final_nodes")
+    for start, box, final in summaries:
+        if (
+            box == start_box
+            and (start_nodes is None or vertices[start] in start_nodes)
+            and (final_nodes is None or vertices[final] in final_nodes)
+        ):
+            yield vertices[start], vertices[final]
+
+
+def gll(
+    graph: MultiDiGraph | str,
+    cfg: CFG | str,
+    **kwargs,
+) -> CfpqResult:
+    """
+    Generalized LL algorithm over recursive state machine of grammar
+
+    Parameters
+    ----------
+    graph: MultiDiGraph | str
+        Graph passed as MultiDiGraph object or graph name from cfpq_data dataset
+    cfg: CFG | str
+        Grammar passed as CFG object, string representation or path to file with grammar
+    start_symbol: str
+        Start non-terminal for context-free grammar in case grammar is not CFG object
+    grammar_in_file: bool
+        Is grammar passed as path to file with grammar
+    grammar_cache_dir: str
+        Directory of compiled grammar artifacts, see compiled_grammar.compile_grammar
+    start_nodes: set
+        Source vertices of query, all vertices if not passed
+
+    Returns
+    -------
+    result: CfpqResult
+        Set of triples (start vertex, non-terminal symbol, final vertex)
+        for every call of box made by query
+    """
+
+    vertices, boxes, _, summaries = _gll_summaries(graph, cfg, **kwargs)
+    pairs = {box: ([], []) for box in boxes}
+    for start, box, final in summaries:
+        pairs[boxes[box]][0].append(start)
+        pairs[boxes[box]][1].append(final)
+    return CfpqResult.from_pairs(pairs, vertices)
@@ -2,11 +2,14 @@
 A set of methods for working with a graph.
 """
 
-from typing import Tuple
+from typing import List, Tuple
 from collections import namedtuple
 from pathlib import Path
 import cfpq_data
 import networkx as nx
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
 from pyformlang.finite_automaton import (
     NondeterministicFiniteAutomaton,
     State,
@@ -14,6 +17,8 @@ from pyformlang.finite_automaton import (
 
 GraphInfo = namedtuple("GraphInfo", "nodes edges labels")
 
+REORDERINGS = ("rcm", "degree", "bfs")
+
 
 def get_graph_info(graph: nx.MultiDiGraph) -> GraphInfo:
     """
@@ -148,3 +153,60 @@ def graph_to_nfa(
             nfa.add_final_state(State(t))
 
     return nfa
+
+
+def reorder_vertices(graph: nx.MultiDiGraph, reordering: str = None) -> List:
+    """
+    Order graph vertices to improve locality of its adjacency matrices.
+
+    Parameters
+    ----------
+    graph: nx.MultiDiGraph
+        Labeled graph
+    reordering: str
+        Reordering strategy:
+        None --- insertion order,
+        "rcm" --- reverse Cuthill-McKee order of symmetrized graph,
+        "degree" --- descending total degree,
+        "bfs" --- breadth-first order from the vertex of maximal degree of each component
+
+    Returns
+    -------
+    vertices: list
+        Graph vertices, position of vertex is its index in matrices
+    """
+
+    vertices = list(graph.nodes)
+    if reordering is None or len(vertices) == 0:
+        return vertices
+    if reordering not in REORDERINGS:
+        raise Exception(f"Unknown vertex reordering {reordering}")
+
+    indices = {v: i for i, v in enumerate(vertices)}
+    n = len(vertices)
+    edges = np.array(
+        [(indices[u], indices[v]) for u, v in graph.edges()], dtype=np.int64
+    ).reshape(-1, 2)
+    adj = sparse.csr_matrix(
+        (np.ones(len(edges), dtype=bool), (edges[:, 0], edges[:, 1])), shape=(n, n)
+    )
+    sym = (adj + adj.T).tocsr()
+    degrees = np.diff(sym.indptr)
+
+    if reordering == "rcm":
+        order = csgraph.reverse_cuthill_mckee(sym, symmetric_mode=True)
+    elif reordering == "degree":
+        order = np.argsort(-degrees, kind="stable")
+    else:
+        visited = np.zeros(n, dtype=bool)
+        order = []
+        for root in np.argsort(-degrees, kind="stable"):
+            if visited[root]:
+                continue
+            component = csgraph.breadth_first_order(
+                sym, root, directed=False, return_predecessors=False
+            )
+            visited[component] = True
+            order.extend(component)
+
+    return [vertices[i] for i in order]
@@ -0,0 +1,248 @@
+"""
+Context-free path query maintained under graph edge updates.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, Tuple
+
+import networkx as nx
+import numpy as np
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG, Terminal, Variable
+from scipy import sparse
+
+from project.cfpq_result import CfpqPairs, CfpqResult
+from project.compiled_grammar import compile_grammar
+from project.label_matrix import bool_difference
+from project.manager import get_graph
+
+__all__ = ["MaintainedCfpq"]
+
+
+def _pairs_matrix(rows, cols, n: int) -> sparse.csr_matrix:
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(n, n)
+    )
+    matrix.sum_duplicates()
+    return matrix
+
+
+def _resize(matrix: sparse.csr_matrix, n: int) -> sparse.csr_matrix:
+    rows, cols = matrix.nonzero()
+    return _pairs_matrix(rows, cols, n)
+
+
+class MaintainedCfpq:
+    """
+    Non-terminal matrices of grammar in WCNF over graph,
+    kept up to date when edges are added or deleted.
+    Added edges seed deltas of productions A -> a over their labels
+    and semi-naive fixpoint continues from them.
+    Deleted edge (x, y) can only invalidate facts A(u, v) of vertices u
+    from which x is reachable, only these rows are recomputed
+
+    Attributes
+    ----------
+    graph: MultiDiGraph
+        Current graph, copy of passed one
+    cfg: CFG
+        Grammar in WCNF
+    vertices: list
+        Vertex of each matrix index
+    matrices: dict
+        Boolean csr matrix of each non-terminal
+    stats: dict
+        Statistics of the last update: "rounds" of fixpoint,
+        "new" --- number of derived facts and "recomputed_rows" on deletion
+    """
+
+    def __init__(
+        self,
+        graph: MultiDiGraph | str,
+        cfg: CFG | str,
+        start_symbol: Variable = Variable("S"),
+    ):
+        grammar = compile_grammar(cfg, start_symbol=start_symbol.value)
+        if isinstance(graph, str):
+            graph = get_graph(graph)
+
+        self.graph = MultiDiGraph(graph)
+        self.start_symbol = grammar.cfg.start_symbol
+        self.cfg = grammar.wcnf
+        self.stats = {}
+
+        self._eps_heads = set()  # A -> epsilon
+        self._term_heads = {}  # a -> heads of A -> a
+        self._productions = []  # A -> B C
+        for p in self.cfg.productions:
+            if not p.body:
+                self._eps_heads.add(p.head)
+            elif len(p.body) == 1:
+                self._term_heads.setdefault(p.body[0], set()).add(p.head)
+            else:
+                self._productions.append((p.head, p.body[0], p.body[1]))
+        self._variables = set(self.cfg.variables)
+
+        self.vertices = list(self.graph.nodes)
+        self._indices = {v: i for i, v in enumerate(self.vertices)}
+        n = len(self.vertices)
+        self.matrices = {var: _pairs_matrix([], [], n) for var in self._variables}
+        self._propagate(self._base_facts(range(n), self.graph.edges(data="label")))
+
+    def _base_facts(self, rows: Iterable[int], edges: Iterable[Tuple]) -> Dict:
+        """
+        Facts of productions A -> epsilon in rows and A -> a over edges
+        """
+
+        n = len(self.vertices)
+        rows = list(rows)
+        pairs = {var: ([], []) for var in self._variables}
+        for var in self._eps_heads:
+            pairs[var][0].extend(rows)
+            pairs[var][1].extend(rows)
+        for u, v, label in edges:
+            for var in self._term_heads.get(Terminal(label), ()):
+                pairs[var][0].append(self._indices[u])
+                pairs[var][1].append(self._indices[v])
+        return {var: _pairs_matrix(r, c, n) for var, (r, c) in pairs.items()}
+
+    def _propagate(self, seeds: Dict) -> None:
+        """
+        Add seed facts and run semi-naive fixpoint:
+        new facts of round are delta B @ C + B @ delta C
+        """
+
+        deltas = {}
+        for var, seed in seeds.items():
+            deltas[var] = bool_difference(seed, self.matrices[var])
+            self.matrices[var] = self.matrices[var] + deltas[var]
+
+        rounds, new = 0, sum(delta.nnz for delta in deltas.values())
+        total = new
+        while new > 0:
+            products = {}
+            for head, body_b, body_c in self._productions:
+                for left, right in (
+                    (deltas[body_b], self.matrices[body_c]),
+                    (self.matrices[body_b], deltas[body_c]),
+                ):
+                    if left.nnz > 0 and right.nnz > 0:
+                        term = left @ right
+                        products[head] = (
+                            term if head not in products else products[head] + term
+                        )
+            for var in self._variables:
+                deltas[var] = (
+                    bool_difference(products[var], self.matrices[var])
+                    if var in products
+                    else _pairs_matrix([], [], len(self.vertices))
+                )
+                self.matrices[var] = self.matrices[var] + deltas[var]
+            rounds += 1
+            new = sum(delta.nnz for delta in deltas.values())
+            total += new
+
+        self.stats["rounds"] = rounds
+        self.stats["new"] = total
+
+    def add_edges(self, edges: Iterable[Tuple]) -> None:
+        """
+        Add edges to graph and derive new facts
+
+        Parameters
+        ----------
+        edges: Iterable[tuple]
+            Edges (u, v, label), new vertices are added to graph
+        """
+
+        edges = list(edges)
+        old_n = len(self.vertices)
+        for u, v, label in edges:
+            for vertex in (u, v):
+                if vertex not in self._indices:
+                    self._indices[vertex] = len(self.vertices)
+                    self.vertices.append(vertex)
+            self.graph.add_edge(u, v, label=label)
+
+        n = len(self.vertices)
+        if n != old_n:
+            self.matrices = {
+                var: _resize(matrix, n) for var, matrix in self.matrices.items()
+            }
+        self.stats = {}
+        self._propagate(self._base_facts(range(old_n, n), edges))
+
+    def remove_edges(self, edges: Iterable[Tuple]) -> None:
+        """
+        Remove edges from graph and recompute facts A(u, v)
+        of vertices u from which tails of edges are reachable
+
+        Parameters
+        ----------
+        edges: Iterable[tuple]
+            Edges (u, v, label), each removes one edge of graph
+        """
+
+        tails = set()
+        for u, v, label in edges:
+            for key, data in self.graph.get_edge_data(u, v, default={}).items():
+                if data.get("label") == label:
+                    self.graph.remove_edge(u, v, key)
+                    tails.add(u)
+                    break
+            else:
+                raise Exception(f"Edge ({u}, {v}, {label}) does not exist in graph")
+
+        affected = set()
+        for tail in tails:
+            if tail not in affected:
+                affected |= nx.ancestors(self.graph, tail) | {tail}
+        rows = np.array(sorted(self._indices[v] for v in affected), dtype=np.int64)
+
+        # rows of other vertices do not depend on affected rows
+        keep = np.ones(len(self.vertices), dtype=bool)
+        keep[rows] = False
+        mask = sparse.diags(keep, dtype=bool, format="csr")
+        self.matrices = {var: mask @ matrix for var, matrix in self.matrices.items()}
+
+        self.stats = {"recomputed_rows": len(rows)}
+        affected_edges = [
+            (u, v, label)
+            for u, v, label in self.graph.edges(data="label")
+            if u in affected
+        ]
+        self._propagate(self._base_facts(rows, affected_edges))
+
+    def result(self) -> CfpqResult:
+        """
+        Get current triples of all non-terminals
+
+        Returns
+        -------
+        result: CfpqResult
+            Set of triples (start vertex, non-terminal symbol, final vertex)
+        """
+
+        return CfpqResult(self.matrices, self.vertices)
+
+    def pairs(self, start_nodes: set = None, final_nodes: set = None) -> CfpqPairs:
+        """
+        Get current pairs of vertices connected by paths of start non-terminal
+
+        Parameters
+        ----------
+        start_nodes: set
+            Start nodes in graph, all nodes if None
+        final_nodes: set
+            Final nodes in graph, all nodes if None
+
+        Returns
+        -------
+        pairs: CfpqPairs
+            Pairs of start non-terminal
+        """
+
+        return self.result().pairs(self.start_symbol).restrict(start_nodes, final_nodes)
@@ -0,0 +1,352 @@
+"""
+Reachability index for queries constrained by a set of edge labels.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import FrozenSet, Hashable, Set, Tuple
+
+import networkx as nx
+import numpy as np
+from pyformlang.finite_automaton import DeterministicFiniteAutomaton
+from scipy import sparse
+from scipy.sparse import csgraph
+
+__all__ = [
+    "LabelReachabilityIndex",
+    "get_label_index",
+    "label_closure_labels",
+    "graph_fingerprint",
+]
+
+# number of indices kept in process, least recently used ones are evicted
+MAX_INDICES = 32
+
+_index_pool: OrderedDict[
+    Tuple[str, FrozenSet], "LabelReachabilityIndex"
+] = OrderedDict()
+
+
+def graph_fingerprint(graph: nx.MultiDiGraph) -> str:
+    """
+    Build hash of graph vertices and labeled edges in iteration order.
+    Hash is computed from graph content on every call in linear time,
+    so graph edited in place with the same numbers of vertices and edges
+    gets another hash. Indices and closures depend on vertex order,
+    so the same graph built in another order gets another hash too
+
+    Parameters
+    ----------
+    graph: nx.MultiDiGraph
+        Labeled graph
+
+    Returns
+    -------
+    fingerprint: str
+        Hex digest which changes whenever vertices or edges of the graph change
+    """
+
+    h = hashlib.sha1()
+    h.update("\n".join(map(repr, graph.nodes)).encode())
+    h.update(b"\0")
+    h.update("\n".join(map(repr, graph.edges(data="label"))).encode())
+    return h.hexdigest()
+
+
+def label_closure_labels(dfa: DeterministicFiniteAutomaton) -> FrozenSet | None:
+    """
+    Check whether minimal dfa accepts language of the form (l1 | l2 | ... | ln)*
+
+    Parameters
+    ----------
+    dfa: DeterministicFiniteAutomaton
+        Minimal deterministic automaton
+
+    Returns
+    -------
+    labels: frozenset | None
+        Set of labels l1, ..., ln or None if dfa has another shape
+    """
+
+    if len(dfa.states) != 1:
+        return None
+    state = next(iter(dfa.states))
+    if state not in dfa.start_states or state not in dfa.final_states:
+        return None
+
+    labels = set()
+    for s_from, trans in dfa.to_dict().items():
+        for label, s_to in trans.items():
+            if s_to != s_from:
+                return None
+            labels.add(label.value)
+    return frozenset(labels)
+
+
+class LabelReachabilityIndex:
+    """
+    Precomputed reachability over subgraph with edges of given labels.
+    Pair (u, v) is reachable if there is non-empty path from u to v
+    which uses only edges with labels from the set.
+
+    Attributes
+    ----------
+    labels: frozenset
+        Labels of edges in indexed subgraph
+    nodes: np.ndarray
+        Graph vertices in index order
+    components: np.ndarray
+        Strongly connected component of each vertex
+    cyclic: np.ndarray
+        Does component contain non-empty cycle
+    closure: sparse.csr_matrix
+        Reachability between different components
+    """
+
+    def __init__(
+        self,
+        labels: FrozenSet,
+        nodes: np.ndarray,
+        components: np.ndarray,
+        cyclic: np.ndarray,
+        closure: sparse.csr_matrix,
+    ):
+        self.labels = labels
+        self.nodes = nodes
+        self.components = components
+        self.cyclic = cyclic
+        self.closure = closure
+
+        self._node_indices = {node: i for i, node in enumerate(nodes.tolist())}
+        self._members = np.argsort(components, kind="stable")
+        self._members_ptr = np.searchsorted(
+            components[self._members], np.arange(len(cyclic) + 1)
+        )
+
+    @classmethod
+    def build(cls, graph: nx.MultiDiGraph, labels: Set) -> "LabelReachabilityIndex":
+        """
+        Build index for graph and set of labels
+
+        Parameters
+        ----------
+        graph: nx.MultiDiGraph
+            Labeled graph
+        labels: set
+            Labels of edges which can be used by paths
+
+        Returns
+        -------
+        index: LabelReachabilityIndex
+            Built index
+        """
+
+        labels = frozenset(labels)
+        nodes = list(graph.nodes)
+        node_indices = {node: i for i, node in enumerate(nodes)}
+        n = len(nodes)
+
+        rows, cols = [], []
+        for u, v, label in graph.edges(data="label"):
+            if label in labels:
+                rows.append(node_indices[u])
+                cols.append(node_indices[v])
+        adj = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(n, n), dtype=bool
+        )
+
+        num_components, components = csgraph.connected_components(
+            adj, directed=True, connection="strong"
+        )
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        comp_rows, comp_cols = components[rows], components[cols]
+
+        # component is cyclic if it has more than one vertex or a self-loop
+        sizes = np.bincount(components, minlength=num_components)
+        cyclic = sizes > 1
+        cyclic[comp_rows[comp_rows == comp_cols]] = True
+
+        inner = comp_rows != comp_cols
+        tc = sparse.csr_matrix(
+            (np.ones(inner.sum(), dtype=bool), (comp_rows[inner], comp_cols[inner])),
+            shape=(num_components, num_components),
+            dtype=bool,
+        )
+        prev_nnz, new_nnz = tc.nnz, None
+        while prev_nnz != new_nnz:
+            tc += tc @ tc
+            prev_nnz, new_nnz = new_nnz, tc.nnz
+
+        nodes_array = np.empty(n, dtype=object)
+        nodes_array[:] = nodes
+        return cls(labels, nodes_array, components, cyclic, tc)
+
+    def reachable_from(self, vertex: Hashable) -> np.ndarray:
+        """
+        Get vertices reachable from passed vertex
+
+        Parameters
+        ----------
+        vertex: Hashable
+            Start vertex
+
+        Returns
+        -------
+        reachable: np.ndarray
+            Indices of reachable vertices
+        """
+
+        comp = self.components[self._node_indices[vertex]]
+        comps = self.closure.indices[
+            self.closure.indptr[comp] : self.closure.indptr[comp + 1]
+        ]
+        if self.cyclic[comp]:
+            comps = np.append(comps, comp)
+        if len(comps) == 0:
+            return comps
+        return np.concatenate(
+            [
+                self._members[self._members_ptr[c] : self._members_ptr[c + 1]]
+                for c in comps
+            ]
+        )
+
+    def query(
+        self, start_vertices: set = None, final_vertices: set = None
+    ) -> Set[Tuple]:
+        """
+        Get reachable pairs of vertices
+
+        Parameters
+        ----------
+        start_vertices: set
+            Start vertices, all vertices if None
+        final_vertices: set
+            Final vertices, all vertices if None
+
+        Returns
+        -------
+        result: set[tuple]
+            Set of reachable pairs of graph vertices
+        """
+
+        if start_vertices is None:
+            start_vertices = self._node_indices.keys()
+
+        final_mask = np.ones(len(self.nodes), dtype=bool)
+        if final_vertices is not None:
+            final_mask[:] = False
+            final_mask[[self._node_indices[v] for v in final_vertices]] = True
+
+        result = set()
+        for u in start_vertices:
+            reachable = self.reachable_from(u)
+            reachable = reachable[final_mask[reachable]]
+            result.update((u, v) for v in self.nodes[reachable].tolist())
+        return result
+
+    def save(self, path: str | Path) -> None:
+        """
+        Save index to .npz file
+
+        Parameters
+        ----------
+        path: str | Path
+            Path to file
+        """
+
+        np.savez_compressed(
+            path,
+            labels=np.array(sorted(self.labels, key=repr), dtype=object),
+            nodes=self.nodes,
+            components=self.components,
+            cyclic=self.cyclic,
+            closure_indptr=self.closure.indptr,
+            closure_indices=self.closure.indices,
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "LabelReachabilityIndex":
+        """
+        Load index from .npz file
+
+        Parameters
+        ----------
+        path: str | Path
+            Path to file
+
+        Returns
+        -------
+        index: LabelReachabilityIndex
+            Loaded index
+        """
+
+        with np.load(path, allow_pickle=True) as data:
+            num_components = len(data["cyclic"])
+            closure = sparse.csr_matrix(
+                (
+                    np.ones(len(data["closure_indices"]), dtype=bool),
+                    data["closure_indices"],
+                    data["closure_indptr"],
+                ),
+                shape=(num_components, num_components),
+            )
+            return cls(
+                frozenset(data["labels"].tolist()),
+                data["nodes"],
+                data["components"],
+                data["cyclic"],
+                closure,
+            )
+
+
+def get_label_index(
+    graph: nx.MultiDiGraph, labels: Set, index_dir: str | Path = None
+) -> LabelReachabilityIndex:
+    """
+    Get reachability index for graph and labels, building it only once.
+    Built indices are kept in memory, at most MAX_INDICES recently used ones,
+    and, if directory is passed, on disk.
+
+    Parameters
+    ----------
+    graph: nx.MultiDiGraph
+        Labeled graph
+    labels: set
+        Labels of edges which can be used by paths
+    index_dir: str | Path
+        Directory for persisted indices
+
+    Returns
+    -------
+    index: LabelReachabilityIndex
+        Index for graph and labels
+    """
+
+    labels = frozenset(labels)
+    fingerprint = graph_fingerprint(graph)
+    path = None
+    if index_dir is not None:
+        labels_hash = hashlib.sha1(repr(sorted(map(repr, labels))).encode())
+        path = Path(index_dir) / f"{fingerprint}-{labels_hash.hexdigest()}.npz"
+
+    key = (fingerprint, labels)
+    if key in _index_pool:
+        index = _index_pool[key]
+    elif path is not None and path.is_file():
+        index = LabelReachabilityIndex.load(path)
+    else:
+        index = LabelReachabilityIndex.build(graph, labels)
+
+    if path is not None and not path.is_file():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        index.save(path)
+
+    _index_pool[key] = index
+    _index_pool.move_to_end(key)
+    while len(_index_pool) > MAX_INDICES:
+        _index_pool.popitem(last=False)
+    return index
@@ -0,0 +1,417 @@
+"""
+Storage formats of boolean label matrices.
+
+Label matrix can be stored as:
+    "pairs" --- list of (row, col) pairs (sparse.coo_matrix), for near-empty labels
+    "csr" --- compressed sparse rows (sparse.csr_matrix)
+    "csc" --- compressed sparse columns (sparse.csc_matrix), for backward traversal
+    "bitpacked" --- dense rows packed to bits (BitMatrix), for dense labels
+    "pattern" --- compressed sparse rows without data array (PatternMatrix)
+"""
+
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+from scipy import sparse
+
+from project.pattern_matrix import PatternMatrix
+
+__all__ = [
+    "FORMATS",
+    "BitMatrix",
+    "choose_format",
+    "matrix_format",
+    "to_format",
+    "bool_matrix",
+    "bool_kron",
+    "bool_difference",
+]
+
+FORMATS = ("pairs", "csr", "csc", "bitpacked", "pattern")
+
+# label is stored as pairs if it has less than one edge per PAIRS_RATIO vertices
+PAIRS_RATIO = 4
+# label is bit-packed if its density is at least BITPACKED_DENSITY
+BITPACKED_DENSITY = 1 / 32
+# size of rows gathered at once by row-wise bit operations
+_CHUNK_BYTES = 64 * 2**20
+
+
+def choose_format(nnz: int, shape: Tuple[int, int], backward: bool = False) -> str:
+    """
+    Choose storage format of boolean matrix by its density
+
+    Parameters
+    ----------
+    nnz: int
+        Number of non-zero elements
+    shape: tuple[int, int]
+        Matrix shape
+    backward: bool
+        Is matrix mostly traversed by columns
+
+    Returns
+    -------
+    format: str
+        One of FORMATS
+    """
+
+    rows, cols = shape
+    if nnz * PAIRS_RATIO < max(rows, cols):
+        return "pairs"
+    if nnz >= BITPACKED_DENSITY * rows * cols:
+        return "bitpacked"
+    return "csc" if backward else "csr"
+
+
+def matrix_format(matrix) -> str:
+    """
+    Get storage format of boolean matrix
+
+    Parameters
+    ----------
+    matrix
+        Boolean matrix in one of FORMATS
+
+    Returns
+    -------
+    format: str
+        One of FORMATS
+    """
+
+    if isinstance(matrix, BitMatrix):
+        return "bitpacked"
+    if isinstance(matrix, PatternMatrix):
+        return "pattern"
+    if sparse.isspmatrix_coo(matrix):
+        return "pairs"
+    return matrix.format
+
+
+def to_format(matrix, fmt: str):
+    """
+    Convert boolean matrix to storage format
+
+    Parameters
+    ----------
+    matrix
+        Boolean matrix in one of FORMATS
+    fmt: str
+        One of FORMATS
+
+    Returns
+    -------
+    matrix
+        Converted matrix, the same object if it is already in required format
+    """
+
+    if matrix_format(matrix) == fmt:
+        return matrix
+    if fmt == "bitpacked":
+        return BitMatrix.from_sparse(matrix)
+    if fmt == "pattern":
+        return PatternMatrix.from_sparse(matrix)
+    if isinstance(matrix, (BitMatrix, PatternMatrix)):
+        matrix = matrix.tocsr()
+    if fmt == "pairs":
+        coo = sparse.coo_matrix(matrix, dtype=bool)
+        coo.sum_duplicates()
+        return coo
+    if fmt == "csr":
+        return sparse.csr_matrix(matrix, dtype=bool)
+    if fmt == "csc":
+        return sparse.csc_matrix(matrix, dtype=bool)
+    raise Exception(f"Unknown matrix format {fmt}")
+
+
+def bool_matrix(
+    rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int], fmt: str = None
+):
+    """
+    Build boolean matrix from positions of non-zero elements
+
+    Parameters
+    ----------
+    rows: np.ndarray
+        Rows of non-zero elements
+    cols: np.ndarray
+        Columns of non-zero elements
+    shape: tuple[int, int]
+        Matrix shape
+    fmt: str
+        One of FORMATS, "adaptive" to choose format by density or None for csr
+
+    Returns
+    -------
+    matrix
+        Built matrix
+    """
+
+    if fmt == "adaptive":
+        fmt = choose_format(len(rows), shape)
+    if fmt == "bitpacked":
+        return BitMatrix.from_pairs(rows, cols, shape)
+    if fmt == "pattern":
+        return PatternMatrix.from_pairs(rows, cols, shape)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=shape, dtype=bool
+    )
+    return matrix if fmt is None else to_format(matrix, fmt)
+
+
+def _from_pairs(rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int]):
+    """
+    Build boolean matrix from non-zero pairs in format chosen by density
+    """
+
+    fmt = choose_format(len(rows), shape)
+    if fmt == "bitpacked":
+        return BitMatrix.from_pairs(rows, cols, shape)
+    matrix = sparse.coo_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=shape, dtype=bool
+    )
+    return to_format(matrix, "csr" if fmt == "csc" else fmt)
+
+
+def bool_kron(first, second):
+    """
+    Kronecker product of boolean matrices in any of FORMATS
+
+    Parameters
+    ----------
+    first
+        Left boolean matrix
+    second
+        Right boolean matrix
+
+    Returns
+    -------
+    kron
+        Kronecker product, csr if both matrices are scipy matrices,
+        PatternMatrix if some of them is PatternMatrix
+        and in format chosen by density if some of them is BitMatrix
+    """
+
+    if not isinstance(first, BitMatrix) and not isinstance(second, BitMatrix):
+        if isinstance(first, PatternMatrix) or isinstance(second, PatternMatrix):
+            return PatternMatrix.from_sparse(first).kron(second)
+        return sparse.kron(first, second, format="csr")
+
+    first_rows, first_cols = first.nonzero()
+    second_rows, second_cols = second.nonzero()
+    rows = np.add.outer(
+        np.asarray(first_rows, dtype=np.int64) * second.shape[0], second_rows
+    ).ravel()
+    cols = np.add.outer(
+        np.asarray(first_cols, dtype=np.int64) * second.shape[1], second_cols
+    ).ravel()
+    return _from_pairs(
+        rows,
+        cols,
+        (first.shape[0] * second.shape[0], first.shape[1] * second.shape[1]),
+    )
+
+
+def bool_difference(first, second):
+    """
+    Elements of boolean matrix which are absent in other one
+
+    Parameters
+    ----------
+    first
+        Boolean matrix in one of FORMATS
+    second
+        Boolean matrix in one of FORMATS with the same shape
+
+    Returns
+    -------
+    difference
+        Matrix in format of the first one with elements of first which are not in second
+    """
+
+    fmt = matrix_format(first)
+    if sparse.issparse(first) and sparse.issparse(second):
+        return to_format(first.tocsr() > second.tocsr(), fmt)
+
+    shape = first.shape
+    first_rows, first_cols = first.nonzero()
+    second_rows, second_cols = second.nonzero()
+    keys = np.setdiff1d(
+        np.asarray(first_rows, dtype=np.int64) * shape[1] + first_cols,
+        np.asarray(second_rows, dtype=np.int64) * shape[1] + second_cols,
+    )
+    return bool_matrix(keys // max(shape[1], 1), keys % max(shape[1], 1), shape, fmt)
+
+
+# number of set bits of each byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _or_rows(
+    indptr: np.ndarray, indices: np.ndarray, packed: np.ndarray, num_rows: int
+) -> np.ndarray:
+    """
+    For each row i of sparse pattern get bitwise or of packed rows from indices of row i
+    """
+
+    result = np.zeros((num_rows, packed.shape[1]), dtype=np.uint8)
+    if len(indices) == 0 or packed.shape[1] == 0:
+        return result
+
+    rows_per_chunk = max(1, _CHUNK_BYTES // packed.shape[1])
+    start = 0
+    while start < num_rows:
+        # take rows [start, end) with no more than rows_per_chunk gathered rows
+        end = np.searchsorted(indptr, indptr[start] + rows_per_chunk, side="right")
+        end = min(max(end - 1, start + 1), num_rows)
+        lo, hi = indptr[start], indptr[end]
+        if lo != hi:
+            offsets = indptr[start : end + 1] - lo
+            non_empty = offsets[:-1] < offsets[1:]
+            result[start:end][non_empty] = np.bitwise_or.reduceat(
+                packed[indices[lo:hi]], offsets[:-1][non_empty], axis=0
+            )
+        start = end
+    return result
+
+
+class BitMatrix:
+    """
+    Boolean matrix with dense rows packed to bits
+
+    Attributes
+    ----------
+    shape: tuple[int, int]
+        Matrix shape
+    packed: np.ndarray
+        Array of uint8 with shape (rows, ceil(cols / 8))
+    """
+
+    format = "bitpacked"
+
+    def __init__(self, packed: np.ndarray, shape: Tuple[int, int]):
+        self.packed = packed
+        self.shape = shape
+
+    @classmethod
+    def from_pairs(
+        cls, rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int]
+    ) -> "BitMatrix":
+        """
+        Build matrix from non-zero pairs
+
+        Parameters
+        ----------
+        rows: np.ndarray
+            Rows of non-zero elements
+        cols: np.ndarray
+            Columns of non-zero elements
+        shape: tuple[int, int]
+            Matrix shape
+
+        Returns
+        -------
+        matrix: BitMatrix
+            Built matrix
+        """
+
+        packed = np.zeros((shape[0], (shape[1] + 7) // 8), dtype=np.uint8)
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        np.bitwise_or.at(
+            packed, (rows, cols // 8), (128 >> (cols % 8)).astype(np.uint8)
+        )
+        return cls(packed, shape)
+
+    @classmethod
+    def from_sparse(cls, matrix) -> "BitMatrix":
+        """
+        Build matrix from scipy sparse matrix
+
+        Parameters
+        ----------
+        matrix: sparse.spmatrix
+            Boolean sparse matrix
+
+        Returns
+        -------
+        matrix: BitMatrix
+            Built matrix
+        """
+
+        rows, cols = matrix.nonzero()
+        return cls.from_pairs(rows, cols, matrix.shape)
+
+    @property
+    def nnz(self) -> int:
+        return int(_POPCOUNT[self.packed].sum(dtype=np.int64))
+
+    def toarray(self) -> np.ndarray:
+        return np.unpackbits(self.packed, axis=1, count=self.shape[1]).astype(bool)
+
+    def nonzero(self) -> Tuple[np.ndarray, np.ndarray]:
+        # only non-zero bytes are unpacked
+        rows, blocks = np.nonzero(self.packed)
+        bits = np.unpackbits(self.packed[rows, blocks][:, None], axis=1)
+        selected, offsets = np.nonzero(bits)
+        return rows[selected], blocks[selected] * 8 + offsets
+
+    def tocsr(self) -> sparse.csr_matrix:
+        rows, cols = self.nonzero()
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=bool), (rows, cols)), shape=self.shape
+        )
+
+    def copy(self) -> "BitMatrix":
+        return BitMatrix(self.packed.copy(), self.shape)
+
+    def __setitem__(self, key: Tuple[int, int], value: bool):
+        i, j = key
+        if value:
+            self.packed[i, j // 8] |= np.uint8(128 >> (j % 8))
+        else:
+            self.packed[i, j // 8] &= np.uint8(~(128 >> (j % 8)) & 0xFF)
+
+    def __getitem__(self, key: Tuple[int, int]) -> bool:
+        i, j = key
+        return bool(self.packed[i, j // 8] & (128 >> (j % 8)))
+
+    def __add__(self, other) -> "BitMatrix":
+        if isinstance(other, (int, float)) and other == 0:
+            return self.copy()
+        if isinstance(other, BitMatrix):
+            return BitMatrix(self.packed | other.packed, self.shape)
+        rows, cols = other.nonzero()
+        result = BitMatrix.from_pairs(rows, cols, self.shape)
+        result.packed |= self.packed
+        return result
+
+    __radd__ = __add__
+
+    def __matmul__(self, other) -> "BitMatrix":
+        if not isinstance(other, BitMatrix):
+            other = BitMatrix.from_sparse(other)
+        rows, cols = self.nonzero()
+        indptr = np.searchsorted(rows, np.arange(self.shape[0] + 1))
+        return BitMatrix(
+            _or_rows(indptr, cols, other.packed, self.shape[0]),
+            (self.shape[0], other.shape[1]),
+        )
+
+    def __rmatmul__(self, other) -> "BitMatrix":
+        if not isinstance(other, PatternMatrix):
+            other = sparse.csr_matrix(other, dtype=bool)
+            other.sum_duplicates()
+        return BitMatrix(
+            _or_rows(
+                other.indptr.astype(np.int64),
+                other.indices.astype(np.int64),
+                self.packed,
+                other.shape[0],
+            ),
+            (other.shape[0], self.shape[1]),
+        )
+
+    def dot(self, other) -> "BitMatrix":
+        return self @ other
@@ -0,0 +1,453 @@
+"""
+Normal forms of context-free grammar over integer-coded symbols.
+
+Variables are coded by non-negative indices and terminals t by -(t + 1),
+productions are kept as list of heads and list of body tuples.
+Every transformation is a pass over productions with worklists,
+so normalization does not hash grammar objects and scales to large grammars.
+Productions are coded in order of their canonical texts, so names of new
+variables do not depend on order of productions in grammar or on hash seed.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+from pyformlang.cfg import CFG, Epsilon, Production, Terminal, Variable
+
+__all__ = ["ProductionTable", "canonical_text", "wcnf_table", "cnf_table"]
+
+
+def _symbol(symbol) -> str:
+    return f"{type(symbol).__name__}:{symbol.value!r}"
+
+
+def canonical_text(production: Production) -> str:
+    """
+    Text of production independent of hash seed
+
+    Parameters
+    ----------
+    production: Production
+        Production of grammar
+
+    Returns
+    -------
+    text: str
+        Typed representations of head and body symbols
+    """
+
+    return " ".join(
+        [_symbol(production.head), "->"] + [_symbol(s) for s in production.body]
+    )
+
+
+class ProductionTable:
+    """
+    Productions of grammar in weak Chomsky normal form as integer arrays
+
+    Attributes
+    ----------
+    variables: list
+        Variable of each index
+    terminals: list
+        Terminal of each index
+    start: int
+        Index of start variable
+    epsilon: np.ndarray
+        Heads A of productions A -> epsilon
+    unary: np.ndarray
+        Rows (A, a) of productions A -> a, a is terminal index
+    binary: np.ndarray
+        Rows (A, B, C) of productions A -> B C
+    """
+
+    def __init__(
+        self,
+        variables: List[Variable],
+        terminals: List[Terminal],
+        start: int,
+        epsilon: np.ndarray,
+        unary: np.ndarray,
+        binary: np.ndarray,
+    ):
+        self.variables = variables
+        self.terminals = terminals
+        self.start = start
+        self.epsilon = epsilon
+        self.unary = unary
+        self.binary = binary
+
+    def __len__(self) -> int:
+        return len(self.epsilon) + len(self.unary) + len(self.binary)
+
+    def split(self) -> Tuple[Set, Dict, Dict]:
+        """
+        Get productions grouped as CFPQ engines use them
+
+        Returns
+        -------
+        eps_prods: set
+            Heads of productions A -> epsilon
+        term_prods: dict
+            Terminals of productions A -> a for each head
+        var_prods: dict
+            Bodies (B, C) of productions A -> B C for each head
+        """
+
+        variables, terminals = self.variables, self.terminals
+        eps_prods = {variables[head] for head in self.epsilon.tolist()}
+        term_prods, var_prods = {}, {}
+        for head, terminal in self.unary.tolist():
+            term_prods.setdefault(variables[head], set()).add(terminals[terminal])
+        for head, body_b, body_c in self.binary.tolist():
+            var_prods.setdefault(variables[head], set()).add(
+                (variables[body_b], variables[body_c])
+            )
+        return eps_prods, term_prods, var_prods
+
+    def to_cfg(self) -> CFG:
+        """
+        Convert to pyformlang grammar
+
+        Returns
+        -------
+        grammar: CFG
+            Grammar with the same productions
+        """
+
+        variables, terminals = self.variables, self.terminals
+        productions = {Production(variables[head], []) for head in self.epsilon}
+        productions.update(
+            Production(variables[head], [terminals[terminal]])
+            for head, terminal in self.unary.tolist()
+        )
+        productions.update(
+            Production(variables[head], [variables[body_b], variables[body_c]])
+            for head, body_b, body_c in self.binary.tolist()
+        )
+        return CFG(start_symbol=variables[self.start], productions=productions)
+
+
+class _Grammar:
+    """
+    Mutable integer-coded grammar passed through normalization steps
+    """
+
+    def __init__(self, cfg: CFG):
+        self.variables = [cfg.start_symbol]
+        self.terminals = []
+        self._variable_indices = {cfg.start_symbol: 0}
+        self._terminal_indices = {}
+        self.start = 0
+        self.heads, self.bodies = [], []
+        for p in sorted(cfg.productions, key=canonical_text):
+            body = tuple(
+                self._code(symbol)
+                for symbol in p.body
+                if not isinstance(symbol, Epsilon)
+            )
+            self.heads.append(self._code(p.head))
+            self.bodies.append(body)
+        self._dedup()
+
+    def _code(self, symbol) -> int:
+        if isinstance(symbol, Terminal):
+            if symbol not in self._terminal_indices:
+                self._terminal_indices[symbol] = len(self.terminals)
+                self.terminals.append(symbol)
+            return -self._terminal_indices[symbol] - 1
+        if symbol not in self._variable_indices:
+            self._variable_indices[symbol] = len(self.variables)
+            self.variables.append(symbol)
+        return self._variable_indices[symbol]
+
+    def new_variable(self, name: str) -> int:
+        return self._code(Variable(name))
+
+    def has_variable(self, name: str) -> bool:
+        return Variable(name) in self._variable_indices
+
+    def set_productions(self, heads: List[int], bodies: List[Tuple]) -> None:
+        self.heads, self.bodies = heads, bodies
+        self._dedup()
+
+    def _dedup(self) -> None:
+        productions = dict.fromkeys(zip(self.heads, self.bodies))
+        self.heads = [head for head, _ in productions]
+        self.bodies = [body for _, body in productions]
+
+
+def _by_head(grammar: _Grammar) -> List[List[int]]:
+    productions = [[] for _ in grammar.variables]
+    for i, head in enumerate(grammar.heads):
+        productions[head].append(i)
+    return productions
+
+
+def _remove_useless(grammar: _Grammar) -> None:
+    """
+    Remove productions with non-generating symbols,
+    then productions of variables unreachable from start
+    """
+
+    n = len(grammar.variables)
+    # productions wait for the number of their non-generating body variables
+    waiting = [sum(symbol >= 0 for symbol in body) for body in grammar.bodies]
+    occurrences = [[] for _ in range(n)]
+    for i, body in enumerate(grammar.bodies):
+        for symbol in body:
+            if symbol >= 0:
+                occurrences[symbol].append(i)
+    generating = [False] * n
+    queue = deque(grammar.heads[i] for i, count in enumerate(waiting) if count == 0)
+    while queue:
+        var = queue.popleft()
+        if generating[var]:
+            continue
+        generating[var] = True
+        for i in occurrences[var]:
+            waiting[i] -= 1
+            if waiting[i] == 0:
+                queue.append(grammar.heads[i])
+
+    by_head = _by_head(grammar)
+    reachable = [False] * n
+    reachable[grammar.start] = True
+    queue = deque([grammar.start])
+    while queue:
+        var = queue.popleft()
+        for i in by_head[var]:
+            if waiting[i] > 0:
+                continue
+            for symbol in grammar.bodies[i]:
+                if symbol >= 0 and not reachable[symbol]:
+                    reachable[symbol] = True
+                    queue.append(symbol)
+
+    kept = [
+        i for i, head in enumerate(grammar.heads) if reachable[head] and waiting[i] == 0
+    ]
+    grammar.set_productions(
+        [grammar.heads[i] for i in kept], [grammar.bodies[i] for i in kept]
+    )
+
+
+def _eliminate_units(grammar: _Grammar) -> None:
+    """
+    Replace unit productions A -> B by productions of every B
+    reachable from A by unit productions
+    """
+
+    units = [[] for _ in grammar.variables]
+    heads, bodies = [], []
+    for head, body in zip(grammar.heads, grammar.bodies):
+        if len(body) == 1 and body[0] >= 0:
+            units[head].append(body[0])
+        else:
+            heads.append(head)
+            bodies.append(body)
+    by_head = [[] for _ in grammar.variables]
+    for i, head in enumerate(heads):
+        by_head[head].append(i)
+
+    new_heads, new_bodies = list(heads), list(bodies)
+    for var, targets in enumerate(units):
+        if not targets:
+            continue
+        seen = {var}
+        stack = list(targets)
+        while stack:
+            target = stack.pop()
+            if target in seen:
+                continue
+            seen.add(target)
+            stack.extend(units[target])
+            for i in by_head[target]:
+                new_heads.append(var)
+                new_bodies.append(bodies[i])
+    grammar.set_productions(new_heads, new_bodies)
+
+
+def _single_terminals(grammar: _Grammar) -> None:
+    """
+    Replace terminals a in bodies of length at least two by variables a#CNF#
+    """
+
+    term_variables = {}
+    bodies = []
+    for body in grammar.bodies:
+        if len(body) > 1 and any(symbol < 0 for symbol in body):
+            new_body = []
+            for symbol in body:
+                if symbol < 0:
+                    if symbol not in term_variables:
+                        terminal = grammar.terminals[-symbol - 1]
+                        term_variables[symbol] = grammar.new_variable(
+                            f"{terminal.value}#CNF#"
+                        )
+                    symbol = term_variables[symbol]
+                new_body.append(symbol)
+            body = tuple(new_body)
+        bodies.append(body)
+    heads = list(grammar.heads)
+    for terminal, var in term_variables.items():
+        heads.append(var)
+        bodies.append((terminal,))
+    grammar.set_productions(heads, bodies)
+
+
+def _decompose(grammar: _Grammar) -> None:
+    """
+    Split bodies longer than two by chains of variables C#CNF#i,
+    equal body suffixes share variables
+    """
+
+    index = 0
+    suffixes = {}  # body suffix -> variable deriving it
+    heads, bodies = [], []
+    for head, body in zip(grammar.heads, grammar.bodies):
+        for i in range(len(body) - 2):
+            suffix = body[i + 1 :]
+            if suffix in suffixes:
+                heads.append(head)
+                bodies.append((body[i], suffixes[suffix]))
+                break
+            while grammar.has_variable(f"C#CNF#{index}"):
+                index += 1
+            var = grammar.new_variable(f"C#CNF#{index}")
+            suffixes[suffix] = var
+            heads.append(head)
+            bodies.append((body[i], var))
+            head = var
+        else:
+            heads.append(head)
+            bodies.append(body[-2:] if len(body) > 2 else body)
+    grammar.set_productions(heads, bodies)
+
+
+def _remove_epsilon(grammar: _Grammar) -> None:
+    """
+    Remove productions A -> epsilon from grammar with bodies of length at most two,
+    nullable body variables are dropped in all combinations
+    """
+
+    n = len(grammar.variables)
+    waiting = [
+        len(body) if all(symbol >= 0 for symbol in body) else -1
+        for body in grammar.bodies
+    ]
+    occurrences = [[] for _ in range(n)]
+    for i, body in enumerate(grammar.bodies):
+        if waiting[i] > 0:
+            for symbol in body:
+                occurrences[symbol].append(i)
+    nullable = [False] * n
+    queue = deque(grammar.heads[i] for i, count in enumerate(waiting) if count == 0)
+    while queue:
+        var = queue.popleft()
+        if nullable[var]:
+            continue
+        nullable[var] = True
+        for i in occurrences[var]:
+            waiting[i] -= 1
+            if waiting[i] == 0:
+                queue.append(grammar.heads[i])
+
+    heads, bodies = [], []
+    for head, body in zip(grammar.heads, grammar.bodies):
+        variants = [body]
+        if len(body) == 2:
+            if body[0] >= 0 and nullable[body[0]]:
+                variants.append(body[1:])
+            if body[1] >= 0 and nullable[body[1]]:
+                variants.append(body[:1])
+        for variant in variants:
+            if variant:
+                heads.append(head)
+                bodies.append(variant)
+    grammar.set_productions(heads, bodies)
+
+
+def _table(grammar: _Grammar) -> ProductionTable:
+    """
+    Production table of grammar with bodies of length at most two,
+    variables without productions except start are dropped
+    """
+
+    used = sorted(set(grammar.heads) | {grammar.start})
+    used_terminals = sorted({-body[0] - 1 for body in grammar.bodies if len(body) == 1})
+    var_map = {var: i for i, var in enumerate(used)}
+    term_map = {terminal: i for i, terminal in enumerate(used_terminals)}
+
+    epsilon, unary, binary = [], [], []
+    for head, body in zip(grammar.heads, grammar.bodies):
+        if not body:
+            epsilon.append(var_map[head])
+        elif len(body) == 1:
+            unary.append((var_map[head], term_map[-body[0] - 1]))
+        else:
+            binary.append((var_map[head], var_map[body[0]], var_map[body[1]]))
+    return ProductionTable(
+        [grammar.variables[var] for var in used],
+        [grammar.terminals[terminal] for terminal in used_terminals],
+        var_map[grammar.start],
+        np.array(epsilon, dtype=np.int64),
+        np.array(unary, dtype=np.int64).reshape(-1, 2),
+        np.array(binary, dtype=np.int64).reshape(-1, 3),
+    )
+
+
+def wcnf_table(cfg: CFG) -> ProductionTable:
+    """
+    Transform grammar to weak Chomsky normal form: productions A -> B C,
+    A -> a and A -> epsilon, useless symbols are removed
+
+    Parameters
+    ----------
+    cfg: CFG
+        Grammar
+
+    Returns
+    -------
+    table: ProductionTable
+        Productions of grammar in weak Chomsky normal form
+    """
+
+    grammar = _Grammar(cfg)
+    _remove_useless(grammar)
+    _eliminate_units(grammar)
+    _remove_useless(grammar)
+    _single_terminals(grammar)
+    _decompose(grammar)
+    return _table(grammar)
+
+
+def cnf_table(cfg: CFG) -> ProductionTable:
+    """
+    Transform grammar to Chomsky normal form: productions A -> B C and A -> a.
+    Grammar generates the same words except empty one
+
+    Parameters
+    ----------
+    cfg: CFG
+        Grammar
+
+    Returns
+    -------
+    table: ProductionTable
+        Productions of grammar in Chomsky normal form, there are no epsilon ones
+    """
+
+    grammar = _Grammar(cfg)
+    _remove_useless(grammar)
+    # bodies are binarized first, so epsilon removal adds at most two variants
+    _single_terminals(grammar)
+    _decompose(grammar)
+    _remove_epsilon(grammar)
+    _remove_useless(grammar)
+    _eliminate_units(grammar)
+    _remove_useless(grammar)
+    return _table(grammar)
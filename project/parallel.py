@@ -0,0 +1,163 @@
+"""
+Parallel evaluation of independent boolean matrix products.
+
+Products are evaluated on pool of workers:
+    "thread" --- threads of this process, scipy multiplies sparse matrices without GIL
+    "process" --- separate processes, operands are passed through shared memory
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from project.label_matrix import to_format
+
+__all__ = ["EXECUTORS", "product_pool"]
+
+EXECUTORS = ("thread", "process")
+
+
+def _multiply(operands: Tuple) -> sparse.csr_matrix:
+    left, right = operands
+    return left @ right
+
+
+def _share(matrix, segments: Dict[int, Tuple]) -> Tuple:
+    """
+    Copy indptr and indices of matrix to shared memory segment once per matrix
+
+    Parameters
+    ----------
+    matrix
+        Boolean matrix in one of label_matrix.FORMATS
+    segments: dict
+        Segment and descriptor of already shared matrices by their ids
+
+    Returns
+    -------
+    descriptor: tuple
+        Segment name, matrix shape and number of non-zero elements
+    """
+
+    if id(matrix) not in segments:
+        csr = to_format(matrix, "csr")
+        indptr = np.asarray(csr.indptr, dtype=np.int64)
+        indices = np.asarray(csr.indices, dtype=np.int64)
+        segment = shared_memory.SharedMemory(
+            create=True, size=max((len(indptr) + len(indices)) * 8, 1)
+        )
+        buffer = np.ndarray(len(indptr) + len(indices), np.int64, segment.buf)
+        buffer[: len(indptr)] = indptr
+        buffer[len(indptr) :] = indices
+        # matrix is kept alive so that its id is not reused while segment exists
+        segments[id(matrix)] = (
+            segment,
+            (segment.name, csr.shape, len(indices)),
+            matrix,
+        )
+    return segments[id(matrix)][1]
+
+
+def _attach(descriptor: Tuple) -> Tuple[shared_memory.SharedMemory, sparse.csr_matrix]:
+    """
+    Build matrix over indptr and indices in shared memory segment
+    """
+
+    name, shape, nnz = descriptor
+    segment = shared_memory.SharedMemory(name=name)
+    buffer = np.ndarray(shape[0] + 1 + nnz, np.int64, segment.buf)
+    matrix = sparse.csr_matrix(
+        (np.ones(nnz, dtype=bool), buffer[shape[0] + 1 :], buffer[: shape[0] + 1]),
+        shape=shape,
+        copy=False,
+    )
+    return segment, matrix
+
+
+def _multiply_shared(descriptors: Tuple) -> Tuple:
+    """
+    Multiply matrices from shared memory in worker process
+
+    Returns
+    -------
+    product: tuple
+        Shape, indptr and indices of csr product
+    """
+
+    segments, operands = [], []
+    try:
+        for descriptor in descriptors:
+            segment, matrix = _attach(descriptor)
+            segments.append(segment)
+            operands.append(matrix)
+        product = sparse.csr_matrix(operands[0] @ operands[1], dtype=bool)
+        return product.shape, product.indptr.copy(), product.indices.copy()
+    finally:
+        # views of segments must be released before closing them
+        matrix = None
+        operands.clear()
+        for segment in segments:
+            segment.close()
+
+
+@contextmanager
+def product_pool(
+    workers: int = None, executor: str = "thread"
+) -> Iterator[Callable[[List[Tuple]], List]]:
+    """
+    Pool of workers multiplying independent pairs of boolean matrices
+
+    Parameters
+    ----------
+    workers: int
+        Number of workers, products are evaluated in calling thread if None or 1
+    executor: str
+        Kind of workers, one of EXECUTORS
+
+    Returns
+    -------
+    multiply: Callable
+        Function getting list of pairs (left, right) and returning list of products,
+        products of process workers are csr matrices
+    """
+
+    if executor not in EXECUTORS:
+        raise Exception(f"Unknown executor {executor}")
+
+    if workers is None or workers <= 1:
+        yield lambda operands: [_multiply(pair) for pair in operands]
+        return
+
+    if executor == "thread":
+        with ThreadPoolExecutor(workers) as pool:
+            yield lambda operands: list(pool.map(_multiply, operands))
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+
+        def multiply(operands):
+            segments = {}
+            try:
+                descriptors = [
+                    (_share(left, segments), _share(right, segments))
+                    for left, right in operands
+                ]
+                products = list(pool.map(_multiply_shared, descriptors))
+            finally:
+                for segment, _, _ in segments.values():
+                    segment.close()
+                    segment.unlink()
+            return [
+                sparse.csr_matrix(
+                    (np.ones(len(indices), dtype=bool), indices, indptr), shape=shape
+                )
+                for shape, indptr, indices in products
+            ]
+
+        yield multiply
@@ -0,0 +1,273 @@
+"""
+Row-block partitioned fixpoint of matrix CFPQ.
+
+Each worker owns horizontal stripe of every non-terminal matrix and computes
+its stripe of products B @ C. Right operands are assembled by coordinator
+column block by column block from stripes of all workers and broadcast,
+so neither coordinator nor workers hold whole matrices during fixpoint.
+
+Workers are reached through Transport, messages are tuples (command, *payload)
+of picklable objects. LocalWorkers runs workers as local processes connected
+by pipes, other transports, for example sockets between machines,
+only need to implement send, recv and close.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+__all__ = ["Transport", "PipeTransport", "LocalWorkers", "partitioned_closure"]
+
+# width of column blocks broadcast to workers
+COLUMN_BLOCK = 4096
+
+
+class Transport(ABC):
+    """
+    Ordered two-way channel of picklable messages between coordinator and worker
+    """
+
+    @abstractmethod
+    def send(self, message) -> None:
+        """
+        Send message to other end
+        """
+
+    @abstractmethod
+    def recv(self):
+        """
+        Receive next message from other end, blocks until it arrives
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """
+        Close channel
+        """
+
+
+class PipeTransport(Transport):
+    """
+    Transport over multiprocessing pipe connection
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def send(self, message) -> None:
+        self.connection.send(message)
+
+    def recv(self):
+        return self.connection.recv()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def serve(transport: Transport) -> None:
+    """
+    Worker loop: process commands from coordinator until "stop".
+    Every command is answered, errors are sent back as exceptions
+
+    Parameters
+    ----------
+    transport: Transport
+        Channel to coordinator
+    """
+
+    matrices, deltas, productions = {}, {}, []
+    products = {}  # head -> (rows, cols) of products in current round
+    while True:
+        command, *payload = transport.recv()
+        try:
+            if command == "stop":
+                transport.send(None)
+                return
+            if command == "init":
+                matrices, productions = payload
+                deltas = dict(matrices)
+                reply = None
+            elif command == "columns":
+                variables, lo, hi = payload
+                reply = {
+                    var: (matrices[var][:, lo:hi], deltas[var][:, lo:hi])
+                    for var in variables
+                }
+            elif command == "multiply":
+                lo, blocks = payload
+                reply = 0
+                for head, body_b, body_c in productions:
+                    block, delta_block = blocks[body_c]
+                    terms = []
+                    if deltas[body_b].nnz > 0:
+                        terms.append(deltas[body_b] @ block)
+                    if delta_block.nnz > 0:
+                        terms.append(matrices[body_b] @ delta_block)
+                    reply += len(terms)
+                    for term in terms:
+                        rows, cols = term.nonzero()
+                        products.setdefault(head, []).append((rows, cols + lo))
+            elif command == "update":
+                reply = 0
+                for var, matrix in matrices.items():
+                    parts = products.get(var, [])
+                    rows = np.concatenate([r for r, _ in parts] + [np.zeros(0, int)])
+                    cols = np.concatenate([c for _, c in parts] + [np.zeros(0, int)])
+                    product = sparse.csr_matrix(
+                        (np.ones(len(rows), dtype=bool), (rows, cols)),
+                        shape=matrix.shape,
+                    )
+                    deltas[var] = product > matrix
+                    matrices[var] = matrix + deltas[var]
+                    reply += deltas[var].nnz
+                products = {}
+            elif command == "collect":
+                reply = matrices
+            else:
+                raise Exception(f"Unknown command {command}")
+        except Exception as e:
+            reply = e
+        transport.send(reply)
+
+
+def _serve_pipe(connection) -> None:
+    serve(PipeTransport(connection))
+
+
+class LocalWorkers:
+    """
+    Workers in local processes connected by pipes, used as context manager
+
+    Attributes
+    ----------
+    transports: list[Transport]
+        Channels to workers
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+        self.transports = []
+        self._processes = []
+
+    def __enter__(self) -> "LocalWorkers":
+        for _ in range(self.count):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_serve_pipe, args=(child,), daemon=True
+            )
+            process.start()
+            child.close()
+            self.transports.append(PipeTransport(parent))
+            self._processes.append(process)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for transport, process in zip(self.transports, self._processes):
+            try:
+                transport.send(("stop",))
+                transport.recv()
+            except (EOFError, OSError):
+                pass
+            transport.close()
+            process.join()
+        self.transports, self._processes = [], []
+
+
+def _request(transports: List[Transport], messages: List[Tuple]) -> List:
+    """
+    Send message to each worker and wait for all replies
+    """
+
+    for transport, message in zip(transports, messages):
+        transport.send(message)
+    replies = [transport.recv() for transport in transports]
+    for reply in replies:
+        if isinstance(reply, Exception):
+            raise reply
+    return replies
+
+
+def partitioned_closure(
+    matrices: Dict,
+    productions: List[Tuple],
+    transports: List[Transport],
+    column_block: int = COLUMN_BLOCK,
+    stats: Dict = None,
+) -> Dict:
+    """
+    Compute fixpoint of A |= B @ C for productions A -> B C on workers,
+    each worker owns row stripe of every matrix. Round is semi-naive:
+    new elements of stripe are delta B @ C + B @ delta C
+
+    Parameters
+    ----------
+    matrices: dict
+        Square boolean sparse matrix of each non-terminal
+    productions: list
+        Triples (A, B, C) of productions A -> B C
+    transports: list[Transport]
+        Channels to workers
+    column_block: int
+        Width of column blocks of right operands broadcast to workers
+    stats: dict
+        If passed, filled with "rounds" --- list of per-round statistics
+        with number of non-terminals, matrix multiplications and new elements
+
+    Returns
+    -------
+    matrices: dict
+        Csr matrix of each non-terminal after fixpoint
+    """
+
+    n = next(iter(matrices.values())).shape[0] if matrices else 0
+    bounds = np.linspace(0, n, len(transports) + 1).astype(int)
+    stripes = [
+        {
+            var: sparse.csr_matrix(matrix, dtype=bool)[lo:hi]
+            for var, matrix in matrices.items()
+        }
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
+    _request(transports, [("init", stripe, productions) for stripe in stripes])
+
+    right = sorted({body_c for _, _, body_c in productions}, key=str)
+    block = max(column_block, 1)
+    if stats is not None:
+        stats["rounds"] = []
+    new = 1 if productions else 0
+    while new > 0:
+        multiplications = 0
+        for lo in range(0, n, block):
+            hi = min(lo + block, n)
+            parts = _request(transports, [("columns", right, lo, hi)] * len(transports))
+            blocks = {
+                var: (
+                    sparse.vstack([part[var][0] for part in parts], format="csr"),
+                    sparse.vstack([part[var][1] for part in parts], format="csr"),
+                )
+                for var in right
+            }
+            multiplications += sum(
+                _request(transports, [("multiply", lo, blocks)] * len(transports))
+            )
+        # global fixpoint test
+        new = sum(_request(transports, [("update",)] * len(transports)))
+        if stats is not None:
+            stats["rounds"].append(
+                {
+                    "component": len(matrices),
+                    "multiplications": multiplications,
+                    "new": new,
+                }
+            )
+
+    stripes = _request(transports, [("collect",)] * len(transports))
+    return {
+        var: sparse.vstack([stripe[var] for stripe in stripes], format="csr")
+        for var in matrices
+    }
@@ -0,0 +1,236 @@
+"""
+Sparse boolean matrix which keeps only positions of its non-zero elements.
+"""
+
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+from scipy import sparse
+
+__all__ = ["PatternMatrix", "index_dtype"]
+
+# maximal number of intermediate products expanded at once by multiplication
+_CHUNK_PRODUCTS = 2**23
+
+
+def index_dtype(max_value: int) -> np.dtype:
+    """
+    Get smallest unsigned integer type for indices
+
+    Parameters
+    ----------
+    max_value: int
+        Maximal stored value
+
+    Returns
+    -------
+    dtype: np.dtype
+        One of uint16, uint32, uint64
+    """
+
+    for dtype in (np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def _compress(keys: np.ndarray, shape: Tuple[int, int]) -> "PatternMatrix":
+    """
+    Build matrix from sorted unique keys row * cols + col
+    """
+
+    rows = keys // max(shape[1], 1)
+    indptr = np.searchsorted(rows, np.arange(shape[0] + 1))
+    return PatternMatrix(
+        indptr.astype(index_dtype(len(keys))),
+        (keys - rows * shape[1]).astype(index_dtype(max(shape[1] - 1, 0))),
+        shape,
+    )
+
+
+class PatternMatrix:
+    """
+    Boolean matrix in compressed sparse row format without data array.
+    Indices are stored in the smallest unsigned type which fits them
+
+    Attributes
+    ----------
+    indptr: np.ndarray
+        Offsets of rows in indices
+    indices: np.ndarray
+        Sorted columns of non-zero elements of each row
+    shape: tuple[int, int]
+        Matrix shape
+    """
+
+    format = "pattern"
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, shape: Tuple[int, int]):
+        self.indptr = indptr
+        self.indices = indices
+        self.shape = shape
+
+    @classmethod
+    def from_pairs(
+        cls, rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int]
+    ) -> "PatternMatrix":
+        """
+        Build matrix from positions of non-zero elements
+
+        Parameters
+        ----------
+        rows: np.ndarray
+            Rows of non-zero elements
+        cols: np.ndarray
+            Columns of non-zero elements
+        shape: tuple[int, int]
+            Matrix shape
+
+        Returns
+        -------
+        matrix: PatternMatrix
+            Built matrix
+        """
+
+        keys = np.asarray(rows, dtype=np.int64) * shape[1] + np.asarray(
+            cols, dtype=np.int64
+        )
+        return _compress(np.unique(keys), shape)
+
+    @classmethod
+    def from_sparse(cls, matrix) -> "PatternMatrix":
+        """
+        Build matrix from scipy sparse matrix
+
+        Parameters
+        ----------
+        matrix: sparse.spmatrix
+            Boolean sparse matrix
+
+        Returns
+        -------
+        matrix: PatternMatrix
+            Built matrix
+        """
+
+        if isinstance(matrix, PatternMatrix):
+            return matrix
+        rows, cols = matrix.nonzero()
+        return cls.from_pairs(rows, cols, matrix.shape)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def _rows(self) -> np.ndarray:
+        return np.repeat(np.arange(self.shape[0], dtype=np.int64), np.diff(self.indptr))
+
+    def _keys(self) -> np.ndarray:
+        return self._rows() * self.shape[1] + self.indices.astype(np.int64)
+
+    def nonzero(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self._rows(), self.indices.astype(np.int64)
+
+    def tocsr(self) -> sparse.csr_matrix:
+        return sparse.csr_matrix(
+            (np.ones(self.nnz, dtype=bool), self.indices, self.indptr),
+            shape=self.shape,
+            dtype=bool,
+        )
+
+    def toarray(self) -> np.ndarray:
+        result = np.zeros(self.shape, dtype=bool)
+        result[self.nonzero()] = True
+        return result
+
+    def copy(self) -> "PatternMatrix":
+        return PatternMatrix(self.indptr.copy(), self.indices.copy(), self.shape)
+
+    def getrow(self, i: int) -> np.ndarray:
+        return self.indices[self.indptr[i] : self.indptr[i + 1]]
+
+    def kron(self, other: "PatternMatrix") -> "PatternMatrix":
+        """
+        Kronecker product of boolean matrices
+
+        Parameters
+        ----------
+        other: PatternMatrix
+            Right matrix
+
+        Returns
+        -------
+        kron: PatternMatrix
+            Kronecker product
+        """
+
+        other = PatternMatrix.from_sparse(other)
+        first_rows, first_cols = self.nonzero()
+        second_rows, second_cols = other.nonzero()
+        shape = (self.shape[0] * other.shape[0], self.shape[1] * other.shape[1])
+        rows = np.add.outer(first_rows * other.shape[0], second_rows).ravel()
+        cols = np.add.outer(first_cols * other.shape[1], second_cols).ravel()
+        return PatternMatrix.from_pairs(rows, cols, shape)
+
+    def __add__(self, other) -> "PatternMatrix":
+        if isinstance(other, (int, float)) and other == 0:
+            return self.copy()
+        if not (isinstance(other, PatternMatrix) or sparse.issparse(other)):
+            return NotImplemented
+        other = PatternMatrix.from_sparse(other)
+        keys = np.union1d(self._keys(), other._keys())
+        return _compress(keys, self.shape)
+
+    __radd__ = __add__
+
+    def __matmul__(self, other) -> "PatternMatrix":
+        if not (isinstance(other, PatternMatrix) or sparse.issparse(other)):
+            return NotImplemented
+        other = PatternMatrix.from_sparse(other)
+        shape = (self.shape[0], other.shape[1])
+
+        # expand all products a[i, k] * b[k, j], then sort and compress them
+        lengths = np.diff(other.indptr.astype(np.int64))[self.indices]
+        ends = np.cumsum(lengths)
+        chunks = []
+        row, num_rows = 0, self.shape[0]
+        while row < num_rows:
+            lo = int(self.indptr[row])
+            done = ends[lo - 1] if lo > 0 else 0
+            last = np.searchsorted(ends, done + _CHUNK_PRODUCTS, side="right")
+            next_row = np.searchsorted(self.indptr, last, side="right") - 1
+            next_row = min(max(next_row, row + 1), num_rows)
+            hi = int(self.indptr[next_row])
+
+            counts = lengths[lo:hi]
+            total = int(counts.sum())
+            if total > 0:
+                rows = np.repeat(
+                    np.repeat(
+                        np.arange(row, next_row, dtype=np.int64),
+                        np.diff(self.indptr[row : next_row + 1].astype(np.int64)),
+                    ),
+                    counts,
+                )
+                offsets = np.arange(total, dtype=np.int64) - np.repeat(
+                    np.cumsum(counts) - counts, counts
+                )
+                starts = other.indptr[self.indices[lo:hi]].astype(np.int64)
+                cols = other.indices[np.repeat(starts, counts) + offsets].astype(
+                    np.int64
+                )
+                chunks.append(np.unique(rows * shape[1] + cols))
+            row = next_row
+
+        keys = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+        return _compress(keys, shape)
+
+    def __rmatmul__(self, other) -> "PatternMatrix":
+        if not sparse.issparse(other):
+            return NotImplemented
+        return PatternMatrix.from_sparse(other) @ self
+
+    def dot(self, other) -> "PatternMatrix":
+        return self @ other
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+import numpy as np
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+from pyformlang.finite_automaton import State
+from scipy import sparse
+
+from project.automaton_matrix import AutomatonSetOfMatrix
+from project.compiled_grammar import compile_grammar
+from project.rpq import product_adjacency, reachable_states
+
+__all__ = ["regular_approximation", "prefilter_graph"]
+
+
+def regular_approximation(cfg: CFG) -> AutomatonSetOfMatrix:
+    """
+    Build finite automaton accepting superset of language of grammar.
+    Calls of boxes in recursive state machine are replaced by epsilon transitions
+    to box start and from box finals to all return states, so the stack is forgotten
+
+    Parameters
+    ----------
+    cfg: CFG
+        Grammar
+
+    Returns
+    -------
+    AutomatonSetOfMatrix
+        Automaton over states of recursive state machine with terminal labels only
+    """
+
+    grammar = compile_grammar(cfg)
+    rsm, rsm_matrix = grammar.rsm, grammar.rsm_matrix
+    k = rsm_matrix.num_states
+    starts, finals = {}, {}
+    for state in rsm_matrix.start_states:
+        starts[state.value[0]] = rsm_matrix.state_indices[state]
+    for state in rsm_matrix.final_states:
+        finals.setdefault(state.value[0], []).append(rsm_matrix.state_indices[state])
+
+    # epsilon transitions of calls and returns
+    rows, cols = [], []
+    for label, matrix in rsm_matrix.bool_matrices.items():
+        if label not in rsm.boxes:
+            continue
+        for state_from, state_to in zip(*matrix.nonzero()):
+            rows.append(state_from)
+            cols.append(starts[label])
+            for final in finals.get(label, ()):
+                rows.append(final)
+                cols.append(state_to)
+    closure = sparse.identity(k, dtype=bool, format="csr") + sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(k, k)
+    )
+    prev_nnz = 0
+    while prev_nnz != closure.nnz:
+        prev_nnz = closure.nnz
+        closure = closure + closure @ closure
+
+    approximation = AutomatonSetOfMatrix()
+    approximation.num_states = k
+    approximation.state_indices = {State(i): i for i in range(k)}
+    approximation.bool_matrices = {
+        label: sparse.csr_matrix(closure @ matrix @ closure, dtype=bool)
+        for label, matrix in rsm_matrix.bool_matrices.items()
+        if label not in rsm.boxes
+    }
+    if rsm.start in starts:
+        start_vector = np.zeros(k, dtype=bool)
+        start_vector[starts[rsm.start]] = True
+        final_vector = np.zeros(k, dtype=bool)
+        final_vector[finals.get(rsm.start, [])] = True
+        approximation.start_states = {
+            State(i) for i in np.flatnonzero(closure.T @ start_vector)
+        }
+        approximation.final_states = {
+            State(i) for i in np.flatnonzero(closure @ final_vector)
+        }
+    return approximation
+
+
+def prefilter_graph(
+    graph: MultiDiGraph,
+    cfg: CFG,
+    start_nodes: set = None,
+    final_nodes: set = None,
+) -> Tuple[MultiDiGraph, Dict]:
+    """
+    Restrict graph to vertices which lie on some path from start to final nodes
+    accepted by regular over-approximation of grammar
+
+    Parameters
+    ----------
+    graph: MultiDiGraph
+        Graph
+    cfg: CFG
+        Grammar
+    start_nodes: set
+        Start nodes in graph, all nodes if None
+    final_nodes: set
+        Final nodes in graph, all nodes if None
+
+    Returns
+    -------
+    subgraph: MultiDiGraph
+        Subgraph induced by candidate vertices
+    report: dict
+        Numbers of vertices and edges before and after filtering
+        and pruned part of vertices
+    """
+
+    labels = {label for _, _, label in graph.edges(data="label")}
+    approximation = regular_approximation(compile_grammar(cfg, labels).cfg)
+    g_matrix = AutomatonSetOfMatrix.from_graph(graph)
+    vertices = [state.value for state in g_matrix.get_indexed_states()]
+    n, k = g_matrix.num_states, approximation.num_states
+
+    product = product_adjacency(g_matrix, approximation)
+
+    # states of product are graph vertex * |approximation states| + state
+    def product_states(states, nodes):
+        is_node = np.ones(n, dtype=bool)
+        if nodes is not None:
+            is_node[:] = False
+            is_node[
+                [
+                    g_matrix.state_indices[State(v)]
+                    for v in nodes
+                    if State(v) in g_matrix.state_indices
+                ]
+            ] = True
+        is_state = np.zeros(k, dtype=bool)
+        is_state[[approximation.state_indices[s] for s in states]] = True
+        return np.flatnonzero(np.outer(is_node, is_state).ravel())
+
+    forward = reachable_states(
+        product, product_states(approximation.start_states, start_nodes)
+    )
+    backward = reachable_states(
+        sparse.csr_matrix(product.T),
+        product_states(approximation.final_states, final_nodes),
+    )
+    kept = np.unique(np.flatnonzero(forward & backward) // max(k, 1))
+
+    subgraph = graph.subgraph([vertices[i] for i in kept])
+    report = {
+        "vertices": n,
+        "kept_vertices": len(kept),
+        "edges": graph.number_of_edges(),
+        "kept_edges": subgraph.number_of_edges(),
+        "pruned": 1 - len(kept) / n if n else 0.0,
+    }
+    return subgraph, report
@@ -2,16 +2,33 @@ from __future__ import annotations
 
 from typing import List, Set, Tuple, Dict
 import networkx as nx
+import numpy as np
 
 from project.automaton_matrix import AutomatonSetOfMatrix
-from project.fa_utils import regex_to_dfa
-from project.graph_utils import graph_to_nfa
-
-from pyformlang.finite_automaton import DeterministicFiniteAutomaton
+from project.closure_cache import ClosureCache, get_closure_cache
+from project.fa_utils import canonical_dfa_key, regex_to_dfa
+from project.label_index import get_label_index, label_closure_labels
+from project.label_matrix import bool_difference
+
+from pyformlang.finite_automaton import DeterministicFiniteAutomaton, State, Symbol
+from pyformlang.regular_expression import Regex
+from pyformlang.regular_expression.regex_objects import (
+    Concatenation,
+    Epsilon,
+    KleeneStar,
+    Union,
+)
 from scipy import sparse
 from project.rsm import RSM
 
-__all__ = ["get_reachable", "rpq", "bfs_rpq"]
+__all__ = [
+    "get_reachable",
+    "rpq",
+    "bfs_rpq",
+    "multiple_source_rpq",
+    "product_adjacency",
+    "reachable_states",
+]
 
 
 def get_reachable(
@@ -50,9 +67,15 @@ def rpq(
     regex: str,
     start_vertices: set = None,
     final_vertices: set = None,
+    index_dir: str = None,
+    use_closure_cache: bool = True,
+    reordering: str = None,
+    storage: str = None,
 ) -> set:
     """
-    Get set of reachable pairs of graph vertices
+    Get set of reachable pairs of graph vertices.
+    Queries of the form (l1 | l2 | ... | ln)* are answered by label reachability index.
+    Closures of starred subexpressions are taken from the graph closure cache
 
     Parameters
     ----------
@@ -64,21 +87,330 @@ def rpq(
         Start vertices for graph
     final_vertices
         Final vertices for graph
+    index_dir
+        Directory to persist label reachability indices
+    use_closure_cache
+        Replace starred subexpressions with cached closures
+    reordering
+        Vertex reordering strategy for graph matrices, see graph_utils.reorder_vertices
+    storage
+        Storage format of graph label matrices, see AutomatonSetOfMatrix.from_graph
 
     Returns
     -------
     set
         Set of reachable pairs of graph vertices
     """
-    regex_automaton_matrix = AutomatonSetOfMatrix.from_automaton(regex_to_dfa(regex))
-    graph_automaton_matrix = AutomatonSetOfMatrix.from_automaton(
-        graph_to_nfa(graph, start_vertices, final_vertices)
+    regex_dfa = regex_to_dfa(regex)
+
+    labels = label_closure_labels(regex_dfa)
+    if labels is not None:
+        for vertex in (start_vertices or set()) | (final_vertices or set()):
+            if vertex not in graph.nodes:
+                raise Exception(f"Node {vertex} does not exists in specified graph")
+        index = get_label_index(graph, labels, index_dir)
+        return index.query(start_vertices, final_vertices)
+
+    graph_automaton_matrix = AutomatonSetOfMatrix.from_graph(
+        graph, start_vertices, final_vertices, reordering, storage
     )
+    if use_closure_cache:
+        order = np.array(
+            [graph_automaton_matrix.state_indices[State(v)] for v in graph.nodes],
+            dtype=np.int64,
+        )
+        spliced = _splice_closures(
+            Regex(regex), graph_automaton_matrix, get_closure_cache(graph), order, {}
+        )
+        if spliced is not None:
+            regex_dfa = regex_to_dfa(spliced)
+
+    regex_automaton_matrix = AutomatonSetOfMatrix.from_automaton(regex_dfa)
     intersected_automaton = graph_automaton_matrix.intersect(regex_automaton_matrix)
 
-    return get_reachable(
-        graph_bm=intersected_automaton, query_bm=regex_automaton_matrix
+    vertices = [state.value for state in graph_automaton_matrix.get_indexed_states()]
+    return {
+        (vertices[u], vertices[v])
+        for u, v in get_reachable(
+            graph_bm=intersected_automaton, query_bm=regex_automaton_matrix
+        )
+    }
+
+
+def product_adjacency(
+    graph_bm: AutomatonSetOfMatrix, query_bm: AutomatonSetOfMatrix
+) -> sparse.csr_matrix:
+    """
+    Get adjacency matrix of intersection of graph and query automata over all labels,
+    intersection state is graph state * |query states| + query state
+
+    Parameters
+    ----------
+    graph_bm: AutomatonSetOfMatrix
+        Graph boolean matrix
+    query_bm: AutomatonSetOfMatrix
+        Query boolean matrix without epsilon transitions
+
+    Returns
+    -------
+    adjacency: sparse.csr_matrix
+        Boolean adjacency matrix of intersection states
+    """
+
+    n, k = graph_bm.num_states, query_bm.num_states
+    adjacency = sparse.csr_matrix((n * k, n * k), dtype=bool)
+    for matrix in graph_bm.intersect(query_bm).bool_matrices.values():
+        adjacency = adjacency + sparse.csr_matrix(matrix, dtype=bool)
+    return adjacency
+
+
+def reachable_states(adjacency: sparse.csr_matrix, initial: np.ndarray) -> np.ndarray:
+    """
+    Get states reachable from any of initial states via breadth-first search
+
+    Parameters
+    ----------
+    adjacency: sparse.csr_matrix
+        Boolean adjacency matrix, see product_adjacency
+    initial: np.ndarray
+        Indices of initial states
+
+    Returns
+    -------
+    visited: np.ndarray
+        Boolean vector of reachable states, initial states included
+    """
+
+    size = adjacency.shape[0]
+    initial = np.asarray(initial, dtype=np.int64)
+    front = sparse.csr_matrix(
+        (np.ones(len(initial), dtype=bool), (np.zeros(len(initial)), initial)),
+        shape=(1, size),
     )
+    visited = front
+    while front.nnz > 0:
+        front = bool_difference(front @ adjacency, visited)
+        visited = visited + front
+
+    reachable = np.zeros(size, dtype=bool)
+    reachable[visited.indices] = True
+    return reachable
+
+
+def multiple_source_rpq(
+    graph_bm: AutomatonSetOfMatrix,
+    query_bm: AutomatonSetOfMatrix,
+    sources: List[int] = None,
+) -> sparse.csr_matrix:
+    """
+    Get pairs of graph states connected by path accepted by query automaton
+    via breadth-first search from all sources at once.
+    Row i of front holds states (graph state * |query states| + query state)
+    of intersection reached from i-th source
+
+    Parameters
+    ----------
+    graph_bm: AutomatonSetOfMatrix
+        Graph boolean matrix
+    query_bm: AutomatonSetOfMatrix
+        Query boolean matrix without epsilon transitions
+    sources: list[int]
+        Indices of source graph states, all states if None
+
+    Returns
+    -------
+    reachable: sparse.csr_matrix
+        Reachability matrix indexed by graph states, rows of other states are empty
+    """
+
+    n, k = graph_bm.num_states, query_bm.num_states
+    sources = np.arange(n) if sources is None else np.asarray(sources, dtype=np.int64)
+    starts = np.array(
+        [query_bm.state_indices[s] for s in query_bm.start_states], dtype=np.int64
+    )
+    is_final = np.zeros(k, dtype=bool)
+    is_final[[query_bm.state_indices[s] for s in query_bm.final_states]] = True
+
+    adjacency = product_adjacency(graph_bm, query_bm)
+
+    rows = np.repeat(np.arange(len(sources)), len(starts))
+    cols = (sources[:, None] * k + starts[None, :]).ravel()
+    front = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)),
+        shape=(len(sources), n * k),
+    )
+    visited = front
+    while front.nnz > 0:
+        front = bool_difference(front @ adjacency, visited)
+        visited = visited + front
+
+    rows, cols = visited.nonzero()
+    mask = is_final[cols % max(k, 1)]
+    return sparse.csr_matrix(
+        (np.ones(mask.sum(), dtype=bool), (sources[rows[mask]], cols[mask] // k)),
+        shape=(n, n),
+    )
+
+
+def _compose_regex_text(regex: Regex, sons: List[str | None]) -> str | None:
+    """
+    Build string representation of regular expression node from its sons
+
+    Parameters
+    ----------
+    regex: Regex
+        Parsed regular expression
+    sons: list[str | None]
+        String representations of node sons
+
+    Returns
+    -------
+    text: str | None
+        String representation or None if expression contains unsupported nodes
+    """
+
+    head = regex.head
+    if any(son is None for son in sons):
+        return None
+    if isinstance(head, KleeneStar):
+        return f"({sons[0]})*"
+    if isinstance(head, Concatenation):
+        return f"({sons[0]} {sons[1]})"
+    if isinstance(head, Union):
+        return f"({sons[0]} | {sons[1]})"
+    if isinstance(head, Epsilon):
+        return "$"
+    if not sons and hasattr(head, "value"):
+        return str(head.value)
+    return None
+
+
+def _regex_to_text(regex: Regex) -> str | None:
+    """
+    Transform parsed regular expression back to string
+
+    Parameters
+    ----------
+    regex: Regex
+        Parsed regular expression
+
+    Returns
+    -------
+    text: str | None
+        String representation or None if expression contains unsupported nodes
+    """
+
+    return _compose_regex_text(regex, [_regex_to_text(son) for son in regex.sons])
+
+
+def _product_closure(
+    graph_bm: AutomatonSetOfMatrix, dfa: DeterministicFiniteAutomaton
+) -> sparse.csr_matrix:
+    """
+    Get all pairs of graph states connected by non-empty path accepted by dfa
+
+    Parameters
+    ----------
+    graph_bm: AutomatonSetOfMatrix
+        Graph boolean matrix
+    dfa: DeterministicFiniteAutomaton
+        Query automaton
+
+    Returns
+    -------
+    closure: sparse.csr_matrix
+        Reachability matrix indexed by graph states
+    """
+
+    n = graph_bm.num_states
+    dfa_bm = AutomatonSetOfMatrix.from_automaton(dfa)
+    k = dfa_bm.num_states
+    tc = graph_bm.intersect(dfa_bm).get_transitive_closure()
+
+    starts = np.zeros(k, dtype=bool)
+    starts[[dfa_bm.state_indices[s] for s in dfa_bm.start_states]] = True
+    finals = np.zeros(k, dtype=bool)
+    finals[[dfa_bm.state_indices[s] for s in dfa_bm.final_states]] = True
+
+    rows, cols = tc.nonzero()
+    mask = starts[rows % k] & finals[cols % k]
+    return sparse.csr_matrix(
+        (np.ones(mask.sum(), dtype=bool), (rows[mask] // k, cols[mask] // k)),
+        shape=(n, n),
+        dtype=bool,
+    )
+
+
+def _permute(matrix: sparse.csr_matrix, order: np.ndarray) -> sparse.csr_matrix:
+    """
+    Move element (i, j) of matrix to (order[i], order[j])
+    """
+
+    coo = matrix.tocoo()
+    return sparse.csr_matrix(
+        (coo.data, (order[coo.row], order[coo.col])), shape=matrix.shape, dtype=bool
+    )
+
+
+def _splice_closures(
+    regex: Regex,
+    graph_bm: AutomatonSetOfMatrix,
+    cache: ClosureCache,
+    order: np.ndarray,
+    labels: Dict[tuple, str],
+) -> str | None:
+    """
+    Replace each starred subexpression E* with virtual label V*,
+    where V is precomputed closure of E over the graph.
+    Closures are taken from cache or computed and put there,
+    matrices of virtual labels are added to graph boolean matrix
+
+    Parameters
+    ----------
+    regex: Regex
+        Parsed regular expression
+    graph_bm: AutomatonSetOfMatrix
+        Graph boolean matrix
+    cache: ClosureCache
+        Closure cache of the graph
+    order: np.ndarray
+        Graph state index of each vertex in graph.nodes order
+    labels: dict[tuple, str]
+        Virtual labels already spliced into query
+
+    Returns
+    -------
+    text: str | None
+        Rewritten expression or None if it can not be rewritten
+    """
+
+    if not isinstance(regex.head, KleeneStar):
+        sons = [
+            _splice_closures(son, graph_bm, cache, order, labels) for son in regex.sons
+        ]
+        return _compose_regex_text(regex, sons)
+
+    original = _regex_to_text(regex)
+    if original is None:
+        return None
+
+    key = canonical_dfa_key(regex_to_dfa(original))
+    if key not in labels:
+        closure = cache.get(key)
+        if closure is None:
+            body = _splice_closures(regex.sons[0], graph_bm, cache, order, labels)
+            if body is None:
+                return None
+            closure = _product_closure(graph_bm, regex_to_dfa(f"({body})*"))
+            inverse = np.empty_like(order)
+            inverse[order] = np.arange(len(order))
+            closure = _permute(closure, inverse)
+            cache.put(key, closure)
+
+        labels[key] = f"__closure{len(labels)}"
+        graph_bm.bool_matrices[Symbol(labels[key])] = _permute(closure, order)
+
+    return f"{labels[key]}*"
 
 
 def _build_adj_empty_matrix(g: nx.MultiDiGraph) -> sparse.csr_matrix:
@@ -103,60 +435,61 @@ def _build_adj_empty_matrix(g: nx.MultiDiGraph) -> sparse.csr_matrix:
 
 
 def _build_direct_sum(
-    r: DeterministicFiniteAutomaton, g: nx.MultiDiGraph
-) -> Dict[sparse.csr_matrix]:
+    r: DeterministicFiniteAutomaton, g_matrix: AutomatonSetOfMatrix
+) -> Dict[Symbol, Tuple]:
     """
-    Build direct sum of boolean matrix decomposition dfa and graph
+    Build direct sum of boolean matrix decomposition dfa and graph.
+    Direct sum is kept as pair of its diagonal blocks,
+    so graph matrices stay in their storage formats
 
     Parameters
     ----------
     r: DeterministicFiniteAutomaton
         Input dfa
-    g: nx.MultiDiGraph
-        Input graph
+    g_matrix: AutomatonSetOfMatrix
+        Boolean matrix decomposition of input graph
 
     Returns
     -------
-    d: dict[sparse.csr_matrix]
-        Result of direct sum
+    d: dict[Symbol, tuple]
+        Pairs of dfa and graph blocks of direct sum for each label
     """
 
-    d = {}
-
     r_matrix = AutomatonSetOfMatrix.from_automaton(r)
-    g_matrix = AutomatonSetOfMatrix.from_automaton(graph_to_nfa(g))
 
     r_labels = set(r_matrix.bool_matrices.keys())
     g_labels = set(g_matrix.bool_matrices.keys())
     labels = r_labels.intersection(g_labels)
 
-    r_size = r_matrix.num_states
-    g_size = g_matrix.num_states
-    for label in labels:
-        left_up_matrix = r_matrix.bool_matrices[label]
-        right_up_matrix = sparse.csr_matrix(
-            (r_size, g_size),
-            dtype=bool,
-        )
-        left_down_matrix = sparse.csr_matrix(
-            (g_size, r_size),
-            dtype=bool,
-        )
-        right_down_matrix = g_matrix.bool_matrices[label]
-        d[label] = sparse.vstack(
-            [
-                sparse.hstack(
-                    [left_up_matrix, right_up_matrix], dtype=bool, format="csr"
-                ),
-                sparse.hstack(
-                    [left_down_matrix, right_down_matrix], dtype=bool, format="csr"
-                ),
-            ],
-            dtype=bool,
-            format="csr",
-        )
+    return {
+        label: (r_matrix.bool_matrices[label], g_matrix.bool_matrices[label])
+        for label in labels
+    }
 
-    return d
+
+def _multiply_by_direct_sum(m: sparse.csr_matrix, blocks: Tuple) -> sparse.csr_matrix:
+    """
+    Multiply M matrix by direct sum
+
+    Parameters
+    ----------
+    m: sparse.csr_matrix
+        M matrix
+    blocks: tuple
+        Dfa and graph blocks of direct sum
+
+    Returns
+    -------
+    m_new: sparse.csr_matrix
+        Product of M matrix and direct sum
+    """
+
+    r_block, g_block = blocks
+    left = _extract_left_submatrix(m) @ r_block
+    right = _extract_right_submatrix(m) @ g_block
+    if not sparse.issparse(right):
+        right = right.tocsr()
+    return sparse.hstack([left, right], dtype=bool, format="csr")
 
 
 def _create_masks(
@@ -331,7 +664,11 @@ def _reduce_to_vector(m: sparse.csr_matrix) -> sparse.csr_matrix:
 
 
 def _bfs_based_rpq(
-    r: DeterministicFiniteAutomaton, g: nx.MultiDiGraph, v_src: set, separated=False
+    r: DeterministicFiniteAutomaton,
+    g: nx.MultiDiGraph,
+    v_src: list,
+    separated=False,
+    g_matrix: AutomatonSetOfMatrix = None,
 ) -> List[sparse.csr_matrix]:
     """
 
@@ -341,20 +678,25 @@ def _bfs_based_rpq(
         Input dfa
     g: nx.MultiDiGraph
         Input graph
-    v_src: set
-        Start vertices set
+    v_src: list
+        Indices of start vertices in graph matrices
 
     separated: bool
         Process for each start vertex or for set of start vertices
+    g_matrix: AutomatonSetOfMatrix
+        Boolean matrix decomposition of input graph, built in insertion order if None
 
     Returns
     -------
     visited: List[sparse.csr_matrix]
         List of matrices in two parts. In the first part of the square matrix with the state of the automata,
         in the second part of the matrix with ones in the columns,
-        the vertices of which can be found from the state of the automaton of this row
+        the vertices of which can be found from the state of the automaton of this row.
+        If separated, matrices are in the order of start vertices
     """
-    d = _build_direct_sum(r, g)
+    if g_matrix is None:
+        g_matrix = AutomatonSetOfMatrix.from_graph(g)
+    d = _build_direct_sum(r, g_matrix)
     if separated:
         init_m = [
             _set_start_verts(_create_masks(r, g), {start_vertex})
@@ -387,7 +729,7 @@ def _bfs_based_rpq(
             )
             for label in labels:
                 # multiply D matrix and current front
-                temp = init_m[num_front_matrix].dot(d[label])
+                temp = _multiply_by_direct_sum(init_m[num_front_matrix], d[label])
                 # transform to right form
                 new_front += _transform_front_part(temp)
                 visited[num_front_matrix] += new_front  # update visited vertices
@@ -410,6 +752,8 @@ def bfs_rpq(
     start_vertices: set = None,
     final_vertices: set = None,
     separated: bool = False,
+    reordering: str = None,
+    storage: str = None,
 ) -> Set[Tuple[int, frozenset] | frozenset]:
     """
     Get set of reachable pairs of graph vertices
@@ -426,6 +770,10 @@ def bfs_rpq(
         Final vertices for graph
     separated
         Process for each start vertex or for set of start vertices
+    reordering
+        Vertex reordering strategy for graph matrices, see graph_utils.reorder_vertices
+    storage
+        Storage format of graph label matrices, see AutomatonSetOfMatrix.from_graph
 
     Returns
     -------
@@ -444,22 +792,31 @@ def bfs_rpq(
             final_vertices.add(node)
 
     regex_automaton = regex_to_dfa(regex)
+    g_matrix = AutomatonSetOfMatrix.from_graph(
+        graph, reordering=reordering, storage=storage
+    )
+    vertices = [state.value for state in g_matrix.get_indexed_states()]
+    start_vertices = list(start_vertices)
     rpq_result = _bfs_based_rpq(
-        regex_automaton, graph, v_src=start_vertices, separated=separated
+        regex_automaton,
+        graph,
+        v_src=[g_matrix.state_indices[State(v)] for v in start_vertices],
+        separated=separated,
+        g_matrix=g_matrix,
     )
 
     res = set()
     if separated:
-        for s_v in start_vertices:
-            visited_per_start = _extract_right_submatrix(rpq_result[s_v])
+        for s_v, visited in zip(start_vertices, rpq_result):
+            visited_per_start = _extract_right_submatrix(visited)
             temp = list()
             for i, automaton_state in enumerate(regex_automaton.states):
                 if not (automaton_state in regex_automaton.final_states):
                     continue
                 row = visited_per_start.getrow(i)
                 for vertex in row.indices:
-                    if vertex in final_vertices:
-                        temp.append(vertex)
+                    if vertices[vertex] in final_vertices:
+                        temp.append(vertices[vertex])
             res.add((s_v, frozenset(temp)))
     else:
         reachable_vertices = list()
@@ -470,8 +827,8 @@ def bfs_rpq(
             row = visited_per_start.getrow(i)
 
             for vertex in row.indices:
-                if vertex in final_vertices:
-                    reachable_vertices.append(vertex)
+                if vertices[vertex] in final_vertices:
+                    reachable_vertices.append(vertices[vertex])
         res.add(frozenset(reachable_vertices))
 
     return res
@@ -0,0 +1,316 @@
+"""
+Out-of-core fixpoint of matrix CFPQ.
+
+Every non-terminal matrix is split to square tiles kept in TileStore:
+tiles are held in memory by LRU cache and spilled to memory-mapped NumPy files
+in working directory when cache exceeds memory budget.
+Products are computed tile by tile, so only few tiles are needed at once.
+Result tiles stay in store, gather_tiles assembles matrix of them when it is needed.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+__all__ = ["TileStore", "tiled_closure", "gather_tiles"]
+
+# rows and columns in tile
+TILE_SIZE = 4096
+
+# kinds of tiles
+_MATRIX, _DELTA, _NEXT = 0, 1, 2
+
+
+def _nbytes(tile: sparse.csr_matrix) -> int:
+    return tile.indptr.nbytes + tile.indices.nbytes + tile.data.nbytes
+
+
+class TileStore:
+    """
+    Storage of boolean csr tiles by keys with bounded in-memory LRU cache.
+    Empty tiles are not stored
+
+    Attributes
+    ----------
+    directory: str
+        Directory for spilled tiles
+    memory_budget: int
+        Size of cached tiles in bytes, tiles are never spilled if None
+    stats: dict
+        Numbers of "spilled" and "loaded" tiles
+    """
+
+    def __init__(self, directory: str, memory_budget: int = None):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.stats = {"spilled": 0, "loaded": 0}
+        self._cache = OrderedDict()  # key -> (tile, is changed since loaded)
+        self._bytes = 0
+        self._shapes = {}  # key -> shape of spilled tile
+
+    def _paths(self, key: Tuple) -> Tuple[str, str]:
+        name = os.path.join(self.directory, "_".join(map(str, key)))
+        return f"{name}.indptr.npy", f"{name}.indices.npy"
+
+    def get(self, key: Tuple) -> sparse.csr_matrix | None:
+        """
+        Get tile by key
+
+        Parameters
+        ----------
+        key: tuple
+            Key of tile
+
+        Returns
+        -------
+        tile: sparse.csr_matrix | None
+            Tile or None if it is empty
+        """
+
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key][0]
+        if key not in self._shapes:
+            return None
+
+        # index arrays of tile are read-only views of mapped files
+        indptr_path, indices_path = self._paths(key)
+        indices = np.load(indices_path, mmap_mode="r")
+        tile = sparse.csr_matrix(
+            (
+                np.ones(len(indices), dtype=bool),
+                np.asarray(indices),
+                np.asarray(np.load(indptr_path, mmap_mode="r")),
+            ),
+            shape=self._shapes[key],
+        )
+        self.stats["loaded"] += 1
+        self._insert(key, tile, False)
+        return tile
+
+    def put(self, key: Tuple, tile: sparse.csr_matrix | None) -> None:
+        """
+        Put tile, tile is deleted if it is None or empty
+
+        Parameters
+        ----------
+        key: tuple
+            Key of tile
+        tile: sparse.csr_matrix | None
+            Tile
+        """
+
+        self.delete(key)
+        if tile is not None and tile.nnz > 0:
+            self._insert(key, sparse.csr_matrix(tile, dtype=bool), True)
+
+    def delete(self, key: Tuple) -> None:
+        """
+        Delete tile from memory and disk
+
+        Parameters
+        ----------
+        key: tuple
+            Key of tile
+        """
+
+        if key in self._cache:
+            self._bytes -= _nbytes(self._cache.pop(key)[0])
+        if self._shapes.pop(key, None) is not None:
+            for path in self._paths(key):
+                os.remove(path)
+
+    def _insert(self, key: Tuple, tile: sparse.csr_matrix, changed: bool) -> None:
+        self._cache[key] = (tile, changed)
+        self._bytes += _nbytes(tile)
+        if self.memory_budget is None:
+            return
+        # the last used tile is kept even if it alone exceeds budget
+        while self._bytes > self.memory_budget and len(self._cache) > 1:
+            old_key, (old_tile, old_changed) = self._cache.popitem(last=False)
+            self._bytes -= _nbytes(old_tile)
+            if old_changed or old_key not in self._shapes:
+                # canonical tiles are not sorted in place after loading
+                old_tile.sum_duplicates()
+                indptr_path, indices_path = self._paths(old_key)
+                np.save(indptr_path, old_tile.indptr)
+                np.save(indices_path, old_tile.indices)
+                self._shapes[old_key] = old_tile.shape
+                self.stats["spilled"] += 1
+
+
+def tiled_closure(
+    pairs: Dict,
+    size: int,
+    productions: List[Tuple],
+    store: TileStore,
+    tile_size: int = TILE_SIZE,
+    stats: Dict = None,
+) -> Dict:
+    """
+    Compute fixpoint of A |= B @ C for productions A -> B C over tiles in store.
+    Round is semi-naive: new elements are delta B @ C + B @ delta C,
+    products of round are applied after all productions are evaluated
+
+    Parameters
+    ----------
+    pairs: dict
+        Rows and columns of initial elements of each non-terminal,
+        they are put to store tile by tile
+    size: int
+        Number of rows and columns in non-terminal matrices
+    productions: list
+        Triples (A, B, C) of productions A -> B C
+    store: TileStore
+        Storage of tiles
+    tile_size: int
+        Number of rows and columns in tile
+    stats: dict
+        If passed, filled with "rounds" --- list of per-round statistics
+        with number of non-terminals, matrix multiplications and new elements,
+        and "tiles" --- numbers of spilled and loaded tiles
+
+    Returns
+    -------
+    tiles: dict
+        Triples (row tile, column tile, key in store) of non-empty tiles
+        of each non-terminal after fixpoint, see gather_tiles
+    """
+
+    variables = list(pairs)
+    index = {var: i for i, var in enumerate(variables)}
+    n = size
+    tile_size = max(tile_size, 1)
+    tiles = range(0, (n + tile_size - 1) // tile_size)
+
+    def key(kind, var, i, j):
+        return kind, index[var], i, j
+
+    # elements are grouped by tiles, only one tile is built at once
+    for var, (rows, cols) in pairs.items():
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        tile_ids = rows // tile_size * len(tiles) + cols // tile_size
+        order = np.argsort(tile_ids, kind="stable")
+        ids, starts = np.unique(tile_ids[order], return_index=True)
+        for tile_id, part in zip(ids.tolist(), np.split(order, starts[1:])):
+            i, j = divmod(tile_id, len(tiles))
+            tile = sparse.csr_matrix(
+                (
+                    np.ones(len(part), dtype=bool),
+                    (rows[part] - i * tile_size, cols[part] - j * tile_size),
+                ),
+                shape=(
+                    min(tile_size, n - i * tile_size),
+                    min(tile_size, n - j * tile_size),
+                ),
+            )
+            store.put(key(_MATRIX, var, i, j), tile)
+            store.put(key(_DELTA, var, i, j), tile)
+
+    if stats is not None:
+        stats["rounds"] = []
+    new = 1 if productions else 0
+    while new > 0:
+        multiplications = 0
+        for head, body_b, body_c in productions:
+            for i in tiles:
+                for j in tiles:
+                    product = None
+                    for k in tiles:
+                        for kind_b, kind_c in ((_DELTA, _MATRIX), (_MATRIX, _DELTA)):
+                            left = store.get(key(kind_b, body_b, i, k))
+                            right = store.get(key(kind_c, body_c, k, j))
+                            if left is None or right is None:
+                                continue
+                            multiplications += 1
+                            term = left @ right
+                            product = term if product is None else product + term
+                    if product is not None:
+                        previous = store.get(key(_NEXT, head, i, j))
+                        if previous is not None:
+                            product = product + previous
+                        store.put(key(_NEXT, head, i, j), product)
+
+        # global fixpoint test
+        new = 0
+        for var in variables:
+            for i in tiles:
+                for j in tiles:
+                    product = store.get(key(_NEXT, var, i, j))
+                    matrix = store.get(key(_MATRIX, var, i, j))
+                    store.delete(key(_NEXT, var, i, j))
+                    delta = product
+                    if product is not None and matrix is not None:
+                        delta = product > matrix
+                    if delta is None or delta.nnz == 0:
+                        store.delete(key(_DELTA, var, i, j))
+                        continue
+                    new += delta.nnz
+                    store.put(key(_DELTA, var, i, j), delta)
+                    store.put(
+                        key(_MATRIX, var, i, j),
+                        delta if matrix is None else matrix + delta,
+                    )
+        if stats is not None:
+            stats["rounds"].append(
+                {
+                    "component": len(variables),
+                    "multiplications": multiplications,
+                    "new": new,
+                }
+            )
+
+    # deltas of the last round are empty, only matrix tiles are left in store
+    result = {var: [] for var in variables}
+    for var in variables:
+        for i in tiles:
+            for j in tiles:
+                if store.get(key(_MATRIX, var, i, j)) is not None:
+                    result[var].append((i, j, key(_MATRIX, var, i, j)))
+    if stats is not None:
+        stats["tiles"] = dict(store.stats)
+    return result
+
+
+def gather_tiles(
+    store: TileStore,
+    tiles: List[Tuple],
+    shape: Tuple[int, int],
+    tile_size: int = TILE_SIZE,
+) -> sparse.csr_matrix:
+    """
+    Assemble matrix of tiles in store
+
+    Parameters
+    ----------
+    store: TileStore
+        Storage of tiles
+    tiles: list
+        Triples (row tile, column tile, key in store), see tiled_closure
+    shape: tuple
+        Shape of matrix
+    tile_size: int
+        Number of rows and columns in tile
+
+    Returns
+    -------
+    matrix: sparse.csr_matrix
+        Boolean matrix
+    """
+
+    tile_size = max(tile_size, 1)
+    rows, cols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for i, j, tile_key in tiles:
+        tile_rows, tile_cols = store.get(tile_key).nonzero()
+        rows.append(tile_rows + i * tile_size)
+        cols.append(tile_cols + j * tile_size)
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    return sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=shape
+    )
@@ -0,0 +1,230 @@
+"""
+Derivation witnesses of matrix CFPQ facts.
+
+Every fact A(u, v) is annotated when it is derived for the first time
+by the length of the shortest known path and by its split point:
+production A -> B C and middle vertex w of facts B(u, w), C(w, v)
+derived in earlier rounds. Annotations are kept in sparse matrices parallel
+to non-terminal matrices, values are stored shifted by one, so that empty
+path of epsilon facts and absent split of base facts are not dropped as zeros.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from pyformlang.cfg import Epsilon, Terminal, Variable
+from pyformlang.cfg.parse_tree import ParseTree
+from scipy import sparse
+
+from project.label_matrix import to_format
+
+__all__ = ["Witnesses"]
+
+
+def _entries(rows, cols, values, n: int) -> sparse.csr_matrix:
+    """
+    Csr matrix of entries, the least value is kept for duplicate positions
+    """
+
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    values = np.asarray(values, dtype=np.int64)
+    order = np.lexsort((values, cols, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    return sparse.csr_matrix(
+        (values[first], (rows[first], cols[first])), shape=(n, n), dtype=np.int64
+    )
+
+
+def _entry(matrix: sparse.csr_matrix, i: int, j: int) -> int:
+    row = matrix.indices[matrix.indptr[i] : matrix.indptr[i + 1]]
+    position = np.searchsorted(row, j)
+    if position < len(row) and row[position] == j:
+        return int(matrix.data[matrix.indptr[i] + position])
+    return 0
+
+
+class Witnesses:
+    """
+    Path lengths and split points of facts of grammar in WCNF
+
+    Attributes
+    ----------
+    lengths: dict
+        Csr matrix of path length + 1 of each fact for each non-terminal
+    splits: dict
+        Csr matrix of production index * |V| + middle vertex + 1
+        of each derived fact for each non-terminal
+    productions: list
+        Triples (A, B, C) of productions A -> B C indexed by splits
+    vertices: list
+        Vertex of each index
+    start_symbol: Variable
+        Non-terminal of witness by default
+    """
+
+    def __init__(
+        self,
+        vertices: List,
+        start_symbol: Variable,
+        var_prods: Dict,
+        term_prods: Dict,
+        eps_prods: Iterable,
+        edges: Iterable[Tuple[int, int, str]],
+    ):
+        self.vertices = vertices
+        self.start_symbol = start_symbol
+        self.productions = [
+            (head, body_b, body_c)
+            for head, bodies in var_prods.items()
+            for body_b, body_c in bodies
+        ]
+        self._by_head = {}
+        for index, (head, body_b, body_c) in enumerate(self.productions):
+            self._by_head.setdefault(head, []).append((index, body_b, body_c))
+        self._term_prods = term_prods
+        self._labels = {}  # (u, v) -> labels of edges
+
+        n = len(vertices)
+        base = {var: ([], [], []) for var in set(term_prods) | set(eps_prods)}
+        for u, v, label in edges:
+            self._labels.setdefault((u, v), set()).add(label)
+            for var, terminals in term_prods.items():
+                if Terminal(label) in terminals:
+                    base[var][0].append(u)
+                    base[var][1].append(v)
+                    base[var][2].append(2)
+        for var in eps_prods:
+            base[var][0].extend(range(n))
+            base[var][1].extend(range(n))
+            base[var][2].extend([1] * n)
+
+        variables = set(base) | {var for p in self.productions for var in p}
+        self.lengths = {
+            var: _entries(*base.get(var, ([], [], [])), n) for var in variables
+        }
+        self.splits = {var: _entries([], [], [], n) for var in variables}
+
+    def snapshot(self) -> Dict:
+        """
+        Get length matrices of facts derived so far,
+        facts of round are annotated by facts of snapshot taken before it
+
+        Returns
+        -------
+        lengths: dict
+            Csr matrix of path length + 1 for each non-terminal
+        """
+
+        return dict(self.lengths)
+
+    def record(self, var: Variable, delta, before: Dict) -> None:
+        """
+        Annotate new facts of non-terminal by split with the least path length
+
+        Parameters
+        ----------
+        var: Variable
+            Non-terminal
+        delta
+            Boolean matrix of new facts in one of label_matrix.FORMATS
+        before: dict
+            Snapshot of lengths taken before round
+        """
+
+        rows, cols = to_format(delta, "csr").nonzero()
+        if len(rows) == 0:
+            return
+        n = len(self.vertices)
+        columns = {}
+        lengths, splits = [], []
+        for u, v in zip(rows, cols):
+            best = None
+            for index, body_b, body_c in self._by_head.get(var, ()):
+                left = before[body_b]
+                if body_c not in columns:
+                    columns[body_c] = before[body_c].tocsc()
+                right = columns[body_c]
+                middles, left_at, right_at = np.intersect1d(
+                    left.indices[left.indptr[u] : left.indptr[u + 1]],
+                    right.indices[right.indptr[v] : right.indptr[v + 1]],
+                    assume_unique=True,
+                    return_indices=True,
+                )
+                if len(middles) == 0:
+                    continue
+                # both stored lengths are shifted by one
+                total = (
+                    left.data[left.indptr[u] + left_at]
+                    + right.data[right.indptr[v] + right_at]
+                    - 1
+                )
+                k = int(np.argmin(total))
+                if best is None or total[k] < best[0]:
+                    best = (int(total[k]), index * n + int(middles[k]) + 1)
+            if best is None:
+                raise Exception(f"No split of derived fact {var}({u}, {v})")
+            lengths.append(best[0])
+            splits.append(best[1])
+
+        self.lengths[var] = self.lengths[var] + _entries(rows, cols, lengths, n)
+        self.splits[var] = self.splits[var] + _entries(rows, cols, splits, n)
+
+    def witness(self, u, v, var: Variable = None) -> Tuple[List[Tuple], ParseTree]:
+        """
+        Rebuild path and its derivation for fact var(u, v)
+
+        Parameters
+        ----------
+        u
+            Start vertex
+        v
+            Final vertex
+        var: Variable
+            Non-terminal, start symbol if None
+
+        Returns
+        -------
+        path: list[tuple]
+            Edges (from, label, to) of path from u to v
+        tree: ParseTree
+            Derivation of path labels from non-terminal in WCNF grammar
+        """
+
+        var = self.start_symbol if var is None else var
+        indices = {vertex: i for i, vertex in enumerate(self.vertices)}
+        if u not in indices or v not in indices or var not in self.lengths:
+            raise Exception(f"No path of {var} from {u} to {v}")
+        if _entry(self.lengths[var], indices[u], indices[v]) == 0:
+            raise Exception(f"No path of {var} from {u} to {v}")
+
+        n = len(self.vertices)
+        path = []
+        root = ParseTree(var)
+        # depth-first left to right, facts are unfolded iteratively
+        stack = [(var, indices[u], indices[v], root)]
+        while stack:
+            var, i, j, node = stack.pop()
+            split = _entry(self.splits[var], i, j) - 1
+            if split >= 0:
+                _, body_b, body_c = self.productions[split // n]
+                middle = split % n
+                left, right = ParseTree(body_b), ParseTree(body_c)
+                node.sons.extend([left, right])
+                stack.append((body_c, middle, j, right))
+                stack.append((body_b, i, middle, left))
+            elif _entry(self.lengths[var], i, j) == 1:
+                node.sons.append(ParseTree(Epsilon()))
+            else:
+                label = min(
+                    label
+                    for label in self._labels[(i, j)]
+                    if Terminal(label) in self._term_prods.get(var, ())
+                )
+                node.sons.append(ParseTree(Terminal(label)))
+                path.append((self.vertices[i], label, self.vertices[j]))
+        return path, root
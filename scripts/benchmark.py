@@ -0,0 +1,249 @@
+import argparse
+import sys
+import timeit
+
+import shared
+
+sys.path.insert(0, str(shared.ROOT))
+
+import cfpq_data  # noqa: E402
+import numpy as np  # noqa: E402
+from pyformlang.cfg import CFG  # noqa: E402
+
+from project.automaton_matrix import AutomatonSetOfMatrix  # noqa: E402
+from project.cost_model import CostModel, query_features  # noqa: E402
+from project.cfpq import (  # noqa: E402
+    cfpq,
+    gll,
+    hellings,
+    matrix_based,
+    multiple_source,
+    rsm_bfs,
+    tensor_based,
+)
+from project.graph_utils import REORDERINGS  # noqa: E402
+from project.parallel import EXECUTORS  # noqa: E402
+from project.rpq import bfs_rpq  # noqa: E402
+
+
+def _bandwidth(matrix: AutomatonSetOfMatrix) -> float:
+    distances = [
+        np.abs(rows - cols).mean()
+        for rows, cols in (bm.nonzero() for bm in matrix.bool_matrices.values())
+        if len(rows) > 0
+    ]
+    return float(np.mean(distances)) if distances else 0.0
+
+
+def reordering(args):
+    graph = cfpq_data.labeled_barabasi_albert_graph(
+        args.nodes, args.edges, labels=("a", "b"), seed=args.seed
+    )
+    sources = set(list(graph.nodes)[: args.sources])
+
+    print(f"{'reordering':>10} {'bandwidth':>10} {'closure, s':>12} {'bfs, s':>10}")
+    for strategy in (None,) + REORDERINGS:
+        matrix = AutomatonSetOfMatrix.from_graph(graph, reordering=strategy)
+        closure_time = min(
+            timeit.repeat(matrix.get_transitive_closure, number=1, repeat=args.repeat)
+        )
+        bfs_time = min(
+            timeit.repeat(
+                lambda: bfs_rpq(graph, "a* b", sources, reordering=strategy),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        print(
+            f"{str(strategy):>10} {_bandwidth(matrix):>10.1f} "
+            f"{closure_time:>12.4f} {bfs_time:>10.4f}"
+        )
+
+
+def cfpq_algorithms(args):
+    graph = cfpq_data.labeled_barabasi_albert_graph(
+        args.nodes, args.edges, labels=("a", "b"), seed=args.seed
+    )
+    cfg = CFG.from_text(args.grammar.replace(";", "\n"))
+    sources = set(list(graph.nodes)[: args.sources]) if args.sources else None
+
+    print(f"{'algorithm':>16} {'time, s':>10} {'pairs':>8}")
+    for algorithm in (
+        hellings,
+        matrix_based,
+        tensor_based,
+        multiple_source,
+        rsm_bfs,
+        gll,
+    ):
+        result = set()
+
+        def run():
+            result.clear()
+            result.update(
+                cfpq(
+                    cfg,
+                    graph,
+                    start_nodes=sources,
+                    algorithm=algorithm,
+                    multiple_source=False,
+                    regular=False,
+                )
+            )
+
+        run_time = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        print(f"{algorithm.__name__:>16} {run_time:>10.4f} {len(result):>8}")
+
+
+def calibrate(args):
+    grammars = [g.replace(";", "\n") for g in args.grammars]
+    runs = []
+    for nodes in args.nodes:
+        graph = cfpq_data.labeled_barabasi_albert_graph(
+            nodes, args.edges, labels=("a", "b"), seed=args.seed
+        )
+        for grammar in grammars:
+            cfg = CFG.from_text(grammar)
+            for sources_num in (args.sources, 0):
+                sources = set(list(graph.nodes)[:sources_num]) if sources_num else None
+                features = query_features(cfg, graph, sources)
+                for algorithm in (
+                    hellings,
+                    matrix_based,
+                    tensor_based,
+                    multiple_source,
+                    rsm_bfs,
+                    gll,
+                ):
+                    run_time = min(
+                        timeit.repeat(
+                            lambda: cfpq(
+                                cfg,
+                                graph,
+                                start_nodes=sources,
+                                algorithm=algorithm,
+                                multiple_source=False,
+                                regular=False,
+                            ),
+                            number=1,
+                            repeat=args.repeat,
+                        )
+                    )
+                    runs.append((algorithm.__name__, features, run_time))
+                    print(
+                        f"{nodes:>6} {sources_num:>4} {algorithm.__name__:>16} "
+                        f"{run_time:>10.4f}  {grammar!r}"
+                    )
+
+    model = CostModel()
+    model.calibrate(runs)
+    for algorithm, (intercept, slope) in model.coefficients.items():
+        print(f"{algorithm:>16}: intercept={intercept:.3g} slope={slope:.3g}")
+    if args.output is not None:
+        model.save(args.output)
+
+
+def parallel(args):
+    graph = cfpq_data.labeled_barabasi_albert_graph(
+        args.nodes, args.edges, labels=("a", "b"), seed=args.seed
+    )
+    cfg = CFG.from_text(args.grammar.replace(";", "\n"))
+
+    print(f"{'executor':>8} {'workers':>8} {'time, s':>10} {'speedup':>8}")
+    for executor in args.executors:
+        base_time = None
+        for workers in args.workers:
+            run_time = min(
+                timeit.repeat(
+                    lambda: matrix_based(
+                        graph, cfg, workers=workers, executor=executor
+                    ),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            base_time = run_time if base_time is None else base_time
+            print(
+                f"{executor:>8} {workers:>8} {run_time:>10.4f} "
+                f"{base_time / run_time:>8.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of project algorithms")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    parser_reordering = subparsers.add_parser(
+        "reordering", help="Vertex reordering strategies"
+    )
+    parser_reordering.add_argument("--nodes", type=int, default=1000)
+    parser_reordering.add_argument("--edges", type=int, default=3)
+    parser_reordering.add_argument("--sources", type=int, default=10)
+    parser_reordering.add_argument("--repeat", type=int, default=3)
+    parser_reordering.add_argument("--seed", type=int, default=42)
+    parser_reordering.set_defaults(func=reordering)
+
+    parser_cfpq = subparsers.add_parser("cfpq", help="CFPQ algorithms")
+    parser_cfpq.add_argument("--nodes", type=int, default=300)
+    parser_cfpq.add_argument("--edges", type=int, default=2)
+    parser_cfpq.add_argument(
+        "--sources", type=int, default=5, help="Number of sources, 0 for all pairs"
+    )
+    parser_cfpq.add_argument(
+        "--grammar",
+        default="S -> a S b | a b",
+        help="Grammar with productions separated by ';'",
+    )
+    parser_cfpq.add_argument("--repeat", type=int, default=3)
+    parser_cfpq.add_argument("--seed", type=int, default=42)
+    parser_cfpq.set_defaults(func=cfpq_algorithms)
+
+    parser_calibrate = subparsers.add_parser(
+        "calibrate", help="Fit cost model of CFPQ algorithms"
+    )
+    parser_calibrate.add_argument(
+        "--nodes", type=int, nargs="+", default=[50, 150, 300]
+    )
+    parser_calibrate.add_argument("--edges", type=int, default=2)
+    parser_calibrate.add_argument("--sources", type=int, default=3)
+    parser_calibrate.add_argument(
+        "--grammars",
+        nargs="+",
+        default=[
+            "S -> a S b | a b",
+            "S -> S S | a | b S",
+            "S -> A B;A -> a A | b;B -> b",
+        ],
+        help="Grammars with productions separated by ';'",
+    )
+    parser_calibrate.add_argument("--repeat", type=int, default=1)
+    parser_calibrate.add_argument("--seed", type=int, default=42)
+    parser_calibrate.add_argument("--output", help="Json file to save coefficients")
+    parser_calibrate.set_defaults(func=calibrate)
+
+    parser_parallel = subparsers.add_parser(
+        "parallel", help="Parallel products of matrix CFPQ"
+    )
+    parser_parallel.add_argument("--nodes", type=int, default=2000)
+    parser_parallel.add_argument("--edges", type=int, default=3)
+    parser_parallel.add_argument(
+        "--grammar",
+        default="S -> a S b | a b | A B;A -> a A | S;B -> S b | b",
+        help="Grammar with productions separated by ';'",
+    )
+    parser_parallel.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16]
+    )
+    parser_parallel.add_argument(
+        "--executors", nargs="+", choices=EXECUTORS, default=list(EXECUTORS)
+    )
+    parser_parallel.add_argument("--repeat", type=int, default=3)
+    parser_parallel.add_argument("--seed", type=int, default=42)
+    parser_parallel.set_defaults(func=parallel)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
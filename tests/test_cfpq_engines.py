@@ -0,0 +1,28 @@
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG
+
+from project.cfpq import ENGINES, cfpq, cfpq_by_hellings
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(60, 2, labels=("a", "b"), seed=1)
+
+
+@pytest.mark.parametrize(
+    "cfg_text",
+    [
+        "S -> a S b | a b",
+        "S -> S S | a | b S",
+        "S -> a S | $",
+        "S -> A B | $\nA -> a A | b\nB -> S b",
+    ],
+)
+@pytest.mark.parametrize("start_nodes", [{0}, {5, 17, 33}, None])
+@pytest.mark.parametrize("engine", sorted(set(ENGINES) - {"hellings"}))
+def test_agrees_with_hellings(engine, cfg_text, start_nodes):
+    cfg = CFG.from_text(cfg_text)
+    expected = cfpq_by_hellings(cfg, _graph, start_nodes=start_nodes)
+
+    assert (
+        cfpq(cfg, _graph, start_nodes=start_nodes, algorithm=ENGINES[engine])
+        == expected
+    )
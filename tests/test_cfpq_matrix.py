@@ -1,7 +1,8 @@
 import networkx as nx
 import pytest
-from pyformlang.cfg import CFG
+from pyformlang.cfg import CFG, Variable
 
+from project.cfg_utils import cfg_to_wcnf, production_schedule
 from project.cfpq import cfpq_by_matrix
 
 
@@ -96,3 +97,35 @@ def _create_graph(nodes, edges) -> nx.MultiDiGraph:
 )
 def test_context_free_path_query(actual: set[tuple], expected: set[tuple]):
     assert actual == expected
+
+
+def test_round_stats():
+    graph = _create_graph(
+        nodes=[0, 1, 2, 3], edges=[(0, "a", 1), (1, "a", 2), (2, "a", 3)]
+    )
+    stats = {}
+    cfpq_by_matrix(CFG.from_text("S -> S S | a"), graph, stats=stats)
+
+    assert [r["new"] for r in stats["rounds"]] == [2, 1, 0]
+    assert stats["rounds"][-1]["multiplications"] == 2
+
+
+def test_production_schedule():
+    cfg = cfg_to_wcnf(CFG.from_text("S -> A B\nA -> a A | a\nB -> b"))
+    var_prods = {}
+    for p in cfg.productions:
+        if len(p.body) == 2:
+            var_prods.setdefault(p.head, set()).add(tuple(p.body))
+    schedule = production_schedule(var_prods)
+
+    heads = [{head for head, _, _ in productions} for _, productions in schedule]
+    assert heads[-1] == {Variable("S")}
+    assert Variable("A") in heads[0]
+
+
+def test_non_recursive_productions_evaluated_once():
+    graph = _create_graph(nodes=[0, 1, 2], edges=[(0, "a", 1), (1, "b", 2)])
+    stats = {}
+    cfpq_by_matrix(CFG.from_text("S -> A B\nA -> a\nB -> b"), graph, stats=stats)
+
+    assert [r["multiplications"] for r in stats["rounds"]] == [1]
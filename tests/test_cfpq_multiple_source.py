@@ -0,0 +1,101 @@
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG
+
+import project.cfpq as cfpq_module
+from project.cfpq import cfpq, cfpq_by_matrix, matrix_based, multiple_source
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(200, 2, labels=("a", "b"), seed=1)
+
+
+@pytest.mark.parametrize(
+    "cfg_text",
+    [
+        "S -> a S b | a b",
+        "S -> S S | a | b S",
+        "S -> a S | $",
+        "S -> A B | $\nA -> a A | b\nB -> S b",
+    ],
+)
+@pytest.mark.parametrize("start_nodes", [{0}, {5, 17, 33}, set(range(0, 200, 3))])
+def test_multiple_source(cfg_text, start_nodes):
+    cfg = CFG.from_text(cfg_text)
+    expected = cfpq_by_matrix(
+        cfg, _graph, start_nodes=start_nodes, multiple_source=False
+    )
+
+    assert (
+        cfpq(cfg, _graph, start_nodes=start_nodes, algorithm=multiple_source)
+        == expected
+    )
+
+
+def test_derives_only_needed_sources():
+    cfg = CFG.from_text("S -> a S b | a b")
+    result = multiple_source(_graph, cfg, start_nodes={0})
+    full = matrix_based(_graph, cfg)
+
+    assert {u for u, _, _ in result} < {u for u, _, _ in full}
+    assert result <= full
+
+
+@pytest.mark.parametrize(
+    "start_nodes,expected", [({0, 1}, True), (set(range(100)), False), (None, False)]
+)
+def test_used_for_few_sources(monkeypatch, start_nodes, expected):
+    used = []
+
+    def spy(graph, cfg, **kwargs):
+        used.append(True)
+        return multiple_source(graph, cfg, **kwargs)
+
+    monkeypatch.setattr(cfpq_module, "multiple_source", spy)
+    cfg = CFG.from_text("S -> a S b | a b")
+    cfpq(cfg, _graph, start_nodes=start_nodes, algorithm=matrix_based)
+
+    assert bool(used) == expected
+
+
+def test_semi_naive_rounds():
+    cfg = CFG.from_text("S -> A B | $\nA -> a A | b\nB -> S b")
+    stats = {}
+    multiple_source(_graph, cfg, start_nodes={0}, stats=stats)
+    rounds = stats["rounds"]
+
+    # the first round evaluates every production, then only changed ones
+    assert rounds[0]["productions"] == 3
+    assert min(r["productions"] for r in rounds[1:]) < 3
+
+
+@pytest.mark.parametrize(
+    "options,key",
+    [
+        ({"memory_budget": 0, "tile_size": 50}, "tiles"),
+        ({"partitions": 2}, "rounds"),
+        ({"storage": "bitpacked"}, "rounds"),
+    ],
+)
+def test_engine_options_keep_engine(options, key):
+    cfg = CFG.from_text("S -> a S b | a b")
+    stats = {}
+    expected = cfpq_by_matrix(cfg, _graph, start_nodes={0}, multiple_source=False)
+
+    assert (
+        cfpq_by_matrix(cfg, _graph, start_nodes={0}, stats=stats, **options) == expected
+    )
+    assert key in stats
+    # multiple-source rounds count productions instead of multiplications
+    assert all("productions" not in r for r in stats.get("rounds", []))
+
+
+def test_checkpoint_keeps_engine(tmp_path):
+    cfg = CFG.from_text("S -> a S b | a b")
+    path = tmp_path / "state.npz"
+
+    cfpq_by_matrix(cfg, _graph, start_nodes={0}, checkpoint=str(path))
+
+    assert path.exists()
+    with pytest.raises(Exception):
+        cfpq_by_matrix(
+            cfg, _graph, start_nodes={0}, checkpoint=str(path), multiple_source=True
+        )
@@ -0,0 +1,79 @@
+import itertools
+
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG
+
+import project.cfpq as cfpq_module
+from project.cfg_utils import regular_cfg_to_nfa
+from project.cfpq import cfpq, matrix_based, regular_rpq, tensor_based
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(100, 2, labels=("a", "b"), seed=1)
+
+_regular = [
+    "S -> a S | b",
+    "S -> S a | $",
+    "S -> A B\nA -> a A | a\nB -> b B | b",
+    "S -> a T | $\nT -> b S",
+    "S -> A b\nA -> A a | B\nB -> b B | $",
+    "S -> A\nA -> B | a\nB -> A | b",
+]
+
+
+@pytest.mark.parametrize("cfg_text", _regular)
+def test_same_language(cfg_text):
+    cfg = CFG.from_text(cfg_text)
+    nfa = regular_cfg_to_nfa(cfg)
+
+    for length in range(7):
+        for word in itertools.product("ab", repeat=length):
+            assert nfa.accepts(list(word)) == cfg.contains(list(word))
+
+
+@pytest.mark.parametrize(
+    "cfg_text", ["S -> a S b | a b", "S -> S S | a", "S -> a S | S b | c"]
+)
+def test_not_strongly_regular(cfg_text):
+    assert regular_cfg_to_nfa(CFG.from_text(cfg_text)) is None
+
+
+def test_too_large():
+    cfg = CFG.from_text("S -> A A\nA -> B B\nB -> C C\nC -> a")
+
+    assert regular_cfg_to_nfa(cfg, max_states=5) is None
+    assert regular_cfg_to_nfa(cfg) is not None
+
+
+@pytest.mark.parametrize("cfg_text", _regular)
+@pytest.mark.parametrize("start_nodes", [None, {0, 5, 17}])
+def test_agrees_with_cfpq(cfg_text, start_nodes):
+    cfg = CFG.from_text(cfg_text)
+    expected = cfpq(cfg, _graph, start_nodes=start_nodes, algorithm=tensor_based)
+
+    assert cfpq(cfg, _graph, start_nodes=start_nodes, algorithm=regular_rpq) == expected
+
+
+@pytest.mark.parametrize(
+    "cfg_text,expected", [("S -> a S | b", True), ("S -> a S b | a b", False)]
+)
+def test_used_for_regular_grammars(monkeypatch, cfg_text, expected):
+    used = []
+
+    def spy(graph, cfg, **kwargs):
+        used.append(True)
+        return regular_rpq(graph, cfg, **kwargs)
+
+    monkeypatch.setattr(cfpq_module, "regular_rpq", spy)
+    cfpq(CFG.from_text(cfg_text), _graph, algorithm=matrix_based, regular=True)
+    cfpq(CFG.from_text(cfg_text), _graph, algorithm=matrix_based)
+
+    assert used == [True] * expected
+
+
+def test_unit_chains_are_bounded():
+    # A_i -> A_i+1 | B_i, B_i -> A_i+1 expands A_40 2^40 times without limit
+    n = 40
+    text = "\n".join(f"A{i} -> A{i + 1} | B{i}\nB{i} -> A{i + 1}" for i in range(n))
+    cfg = CFG.from_text(f"{text}\nA{n} -> a", start_symbol="A0")
+
+    assert regular_cfg_to_nfa(cfg) is None
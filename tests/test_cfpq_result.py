@@ -0,0 +1,94 @@
+import networkx as nx
+import numpy as np
+import pytest
+from pyformlang.cfg import CFG, Variable
+
+from project.cfpq import (
+    cfpq,
+    gll,
+    hellings,
+    matrix_based,
+    multiple_source,
+    rsm_bfs,
+    tensor_based,
+)
+from project.cfpq_result import CfpqPairs, CfpqResult
+
+
+def _create_graph(nodes, edges) -> nx.MultiDiGraph:
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(
+        list(map(lambda edge: (edge[0], edge[2], {"label": edge[1]}), edges))
+    )
+    return graph
+
+
+_graph = _create_graph(
+    nodes=["x", "y", "z", "w"],
+    edges=[("x", "a", "y"), ("y", "a", "z"), ("z", "b", "w"), ("w", "b", "x")],
+)
+_cfg = CFG.from_text("S -> a S b | a b")
+
+
+@pytest.mark.parametrize(
+    "algorithm",
+    [hellings, matrix_based, tensor_based, multiple_source, rsm_bfs, gll],
+)
+def test_engines_return_result(algorithm):
+    result = algorithm(_graph, _cfg)
+
+    assert isinstance(result, CfpqResult)
+    assert ("x", Variable("S"), "x") in result
+    assert ("y", Variable("S"), "w") in result
+    assert ("x", Variable("S"), "y") not in result
+    assert result.count(Variable("S")) == 2
+
+
+def test_pairs():
+    pairs = cfpq(_cfg, _graph, algorithm=matrix_based)
+
+    assert isinstance(pairs, CfpqPairs)
+    assert pairs == {("x", "x"), ("y", "w")}
+    assert {("x", "x"), ("y", "w")} == pairs
+    assert pairs.count() == len(pairs) == 2
+    assert list(pairs.row("y")) == ["w"]
+    assert len(pairs.row("z")) == 0
+    assert sorted(map(tuple, pairs.to_numpy())) == [("x", "x"), ("y", "w")]
+    assert pairs.to_set() == {("x", "x"), ("y", "w")}
+    assert pairs - {("x", "x")} == {("y", "w")}
+
+
+def test_restrict():
+    pairs = cfpq(_cfg, _graph, start_nodes={"y"}, algorithm=tensor_based)
+
+    assert pairs == {("y", "w")}
+    assert cfpq(_cfg, _graph, final_nodes={"q"}, algorithm=tensor_based) == set()
+
+
+def test_integer_vertices():
+    result = CfpqResult.from_pairs(
+        {Variable("S"): (np.array([0, 2, 2]), np.array([1, 0, 1]))}, [10, 11, 12]
+    )
+
+    assert result.to_numpy(Variable("S")).dtype == np.int64
+    assert result.to_set() == {
+        (10, Variable("S"), 11),
+        (12, Variable("S"), 10),
+        (12, Variable("S"), 11),
+    }
+    assert list(result.row(12, Variable("S"))) == [10, 11]
+    assert result.count(Variable("A")) == 0
+
+
+@pytest.mark.parametrize(
+    "algorithm",
+    [hellings, matrix_based, tensor_based, multiple_source, rsm_bfs, gll],
+)
+def test_grammar_trimmed_by_graph_labels(algorithm):
+    cfg = CFG.from_text("S -> a S b | a b | c S\nA -> a A | a")
+    result = algorithm(_graph, cfg)
+
+    assert result.count(Variable("A")) == 0
+    assert cfpq(cfg, _graph, algorithm=algorithm) == {("x", "x"), ("y", "w")}
+    assert cfpq(CFG.from_text("S -> c | c S"), _graph, algorithm=algorithm) == set()
@@ -0,0 +1,39 @@
+import networkx as nx
+import pytest
+from pyformlang.cfg import CFG
+
+from project.cfpq import cfpq_by_rsm, rsm_bfs
+
+
+def _create_graph(nodes, edges) -> nx.MultiDiGraph:
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(
+        list(map(lambda edge: (edge[0], edge[2], {"label": edge[1]}), edges))
+    )
+    return graph
+
+
+@pytest.mark.parametrize(
+    "cfg_text,expected",
+    [
+        ("S -> a S b | $", {(0, 0), (1, 1), (2, 2), (0, 2)}),
+        ("S -> A b\nA -> a", {(0, 2)}),
+        ("S -> c", set()),
+    ],
+)
+def test_small_graph(cfg_text, expected):
+    graph = _create_graph(nodes=[0, 1, 2], edges=[(0, "a", 1), (1, "b", 2)])
+
+    assert cfpq_by_rsm(CFG.from_text(cfg_text), graph) == expected
+
+
+def test_summaries_only_from_reachable_calls():
+    graph = _create_graph(
+        nodes=[0, 1, 2, 3, 4],
+        edges=[(0, "a", 1), (1, "b", 2), (3, "a", 4), (4, "b", 3)],
+    )
+    result = rsm_bfs(graph, CFG.from_text("S -> a S b | a b"), start_nodes={0})
+
+    assert {u for u, _, _ in result} <= {0, 1}
+    assert {(u, v) for u, _, v in result} == {(0, 2)}
@@ -1,3 +1,4 @@
+import cfpq_data
 import networkx as nx
 import pytest
 from pyformlang.cfg import CFG
@@ -96,3 +97,21 @@ def _create_graph(nodes, edges) -> nx.MultiDiGraph:
 )
 def test_context_free_path_query(actual: set[tuple], expected: set[tuple]):
     assert actual == expected
+
+
+@pytest.mark.parametrize(
+    "cfg_text",
+    [
+        "S -> a S b | a b",
+        "S -> S S | a | b S",
+        "S -> a S | $",
+        "S -> A B | $\nA -> a A | b\nB -> S b",
+    ],
+)
+def test_round_stats(cfg_text):
+    graph = cfpq_data.labeled_barabasi_albert_graph(60, 2, labels=("a", "b"), seed=1)
+    stats = {}
+    cfpq_by_tensor(CFG.from_text(cfg_text), graph, stats=stats)
+
+    assert stats["rounds"][-1]["new"] == 0
+    assert all(r["new"] > 0 for r in stats["rounds"][:-1])
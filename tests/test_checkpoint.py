@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG
+
+import project.cfpq as cfpq_module
+from project.checkpoint import load_checkpoint, save_checkpoint
+from project.cfpq import cfpq_by_matrix, cfpq_by_tensor
+from project.compiled_grammar import compile_grammar
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(100, 2, labels=("a", "b"), seed=1)
+
+
+class _Preempted(Exception):
+    pass
+
+
+def _preempt_after(monkeypatch, saves):
+    calls = []
+
+    def save(*args, **kwargs):
+        save_checkpoint(*args, **kwargs)
+        calls.append(True)
+        if len(calls) == saves:
+            raise _Preempted()
+
+    monkeypatch.setattr(cfpq_module, "save_checkpoint", save)
+
+
+@pytest.mark.parametrize("cfpq_function", [cfpq_by_matrix, cfpq_by_tensor])
+@pytest.mark.parametrize(
+    "cfg_text",
+    ["S -> a S b | a b", "S -> S S | a | b S", "S -> A B | $\nA -> a A | b\nB -> S b"],
+)
+def test_resume(monkeypatch, tmp_path, cfpq_function, cfg_text):
+    cfg = CFG.from_text(cfg_text)
+    path = str(tmp_path / "state.npz")
+    full_stats = {}
+    expected = cfpq_function(cfg, _graph, stats=full_stats)
+
+    _preempt_after(monkeypatch, 2)
+    with pytest.raises(_Preempted):
+        cfpq_function(cfg, _graph, checkpoint=path)
+    monkeypatch.undo()
+    stats = {}
+
+    assert cfpq_function(cfg, _graph, resume_from=path, stats=stats) == expected
+    assert len(stats["rounds"]) < len(full_stats["rounds"])
+    assert os.listdir(tmp_path) == ["state.npz"]
+
+
+def test_checkpoint_every(tmp_path):
+    path = str(tmp_path / "state.npz")
+    cfg = CFG.from_text("S -> a S b | a b")
+    stats = {}
+    cfpq_by_matrix(cfg, _graph, checkpoint=path, checkpoint_every=3, stats=stats)
+    key = compile_grammar(cfg, {"a", "b"}).key
+    _, state = load_checkpoint(path, "matrix_based", list(_graph.nodes), key)
+
+    assert state["iteration"] == len(stats["rounds"]) // 3 * 3
+
+
+def test_wrong_checkpoint(tmp_path):
+    path = str(tmp_path / "state.npz")
+    cfg = CFG.from_text("S -> a S b | a b")
+    cfpq_by_tensor(cfg, _graph, checkpoint=path)
+
+    with pytest.raises(Exception):
+        cfpq_by_matrix(cfg, _graph, resume_from=path)
+    with pytest.raises(Exception):
+        load_checkpoint(path, "tensor_based", list(_graph.nodes)[1:])
+    with pytest.raises(Exception):
+        cfpq_by_tensor(CFG.from_text("S -> a S b | b"), _graph, resume_from=path)
+
+
+_RUN = """
+import sys
+import cfpq_data
+import project.cfpq as cfpq_module
+from pyformlang.cfg import CFG
+
+graph = cfpq_data.labeled_barabasi_albert_graph(200, 1, labels=("a", "b", "c"), seed=1)
+cfg = CFG.from_text("S -> a S b | a c b | b c a a | c a A | A S A\\nA -> c b | a A b")
+path = sys.argv[1]
+if sys.argv[2] == "save":
+    save = cfpq_module.save_checkpoint
+    calls = []
+
+    def preempt(*args, **kwargs):
+        save(*args, **kwargs)
+        calls.append(True)
+        if len(calls) == 3:
+            sys.exit(0)
+
+    cfpq_module.save_checkpoint = preempt
+    cfpq_module.cfpq_by_matrix(cfg, graph, checkpoint=path)
+else:
+    resumed = cfpq_module.cfpq_by_matrix(cfg, graph, resume_from=path)
+    print(resumed == cfpq_module.cfpq_by_matrix(cfg, graph))
+"""
+
+
+def test_resume_with_other_hash_seed(tmp_path):
+    path = str(tmp_path / "state.npz")
+
+    def run(seed, mode):
+        return subprocess.run(
+            [sys.executable, "-c", _RUN, path, mode],
+            env=dict(os.environ, PYTHONHASHSEED=str(seed)),
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    # names of variables added by normal form are saved in checkpoint
+    run(1, "save")
+
+    assert run(2, "resume").splitlines()[-1] == "True"
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+
+import pytest
+from scipy import sparse
+
+import project.closure_cache as closure_cache
+from project.closure_cache import ClosureCache, get_closure_cache
+from project.fa_utils import canonical_dfa_key, regex_to_dfa
+from project.graph_utils import create_two_cycle_graph
+from project.rpq import rpq
+
+
+@pytest.fixture
+def graph():
+    return create_two_cycle_graph(3, 2, ("x", "y"))
+
+
+def _matrix(n, pairs):
+    rows, cols = zip(*pairs) if pairs else ((), ())
+    return sparse.csr_matrix(([True] * len(pairs), (rows, cols)), shape=(n, n))
+
+
+@pytest.mark.parametrize(
+    "first,second,equal",
+    [
+        ("a*", "(a | a)*", True),
+        ("(a b)*", "$ | a (b a)* b", True),
+        ("a* b", "b | a a* b", True),
+        ("a*", "b*", False),
+        ("a b", "b a", False),
+    ],
+)
+def test_canonical_dfa_key(first, second, equal):
+    first_key = canonical_dfa_key(regex_to_dfa(first))
+    second_key = canonical_dfa_key(regex_to_dfa(second))
+
+    assert (first_key == second_key) == equal
+
+
+def test_lru_eviction():
+    matrix = _matrix(4, [(0, 1), (1, 2)])
+    size = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    cache = ClosureCache(memory_budget=2 * size)
+
+    cache.put("a", matrix)
+    cache.put("b", matrix)
+    assert cache.get("a") is matrix
+    cache.put("c", matrix)
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.memory_used == 2 * size
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_too_large_matrix_is_not_cached():
+    cache = ClosureCache(memory_budget=1)
+    cache.put("a", _matrix(2, [(0, 1)]))
+
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize(
+    "regex,start_vertices,final_vertices",
+    [
+        ("x* y", {0}, None),
+        ("x x*", None, None),
+        ("(x x)* | y", {1, 2}, {0, 4, 5}),
+        ("(x y*)* y", None, None),
+        ("x* y x* y*", {3}, None),
+        ("y* (x x)*", None, {0}),
+    ],
+)
+def test_rpq_with_cache(graph, regex, start_vertices, final_vertices):
+    expected = rpq(
+        graph, regex, start_vertices, final_vertices, use_closure_cache=False
+    )
+
+    assert rpq(graph, regex, start_vertices, final_vertices) == expected
+    assert rpq(graph, regex, start_vertices, final_vertices) == expected
+
+
+def test_closures_are_reused(graph):
+    cache = get_closure_cache(graph)
+    rpq(graph, "y (x x)*")
+    hits = cache.hits
+    rpq(graph, "(x x)* y")
+
+    assert cache.hits > hits
+
+
+def test_bounded_cache_pool(monkeypatch):
+    monkeypatch.setattr(closure_cache, "MAX_CACHES", 2)
+    monkeypatch.setattr(closure_cache, "_cache_pool", OrderedDict())
+    graphs = [create_two_cycle_graph(n, 2, ("x", "y")) for n in (1, 2, 3)]
+    first = get_closure_cache(graphs[0])
+    for graph in graphs[1:]:
+        get_closure_cache(graph)
+
+    assert len(closure_cache._cache_pool) == 2
+    assert get_closure_cache(graphs[0]) is not first
+
+
+def test_shared_memory_budget(monkeypatch):
+    monkeypatch.setattr(closure_cache, "_cache_pool", OrderedDict())
+    matrix = _matrix(4, [(0, 1), (1, 2)])
+    size = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    graphs = [create_two_cycle_graph(n, 2, ("x", "y")) for n in (1, 2)]
+    first = get_closure_cache(graphs[0], memory_budget=size)
+    first.put("a", matrix)
+    second = get_closure_cache(graphs[1], memory_budget=size)
+    second.put("a", matrix)
+
+    assert get_closure_cache(graphs[1], memory_budget=size) is second
+    assert list(closure_cache._cache_pool.values()) == [second]
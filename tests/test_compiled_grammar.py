@@ -0,0 +1,115 @@
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG
+
+import project.compiled_grammar as compiled_grammar
+from project.cfg_utils import cfg_to_wcnf, trim_cfg
+from project.cfpq import cfpq_by_matrix, matrix_based, tensor_based
+from project.compiled_grammar import (
+    clear_compiled_grammars,
+    compile_grammar,
+    grammar_key,
+)
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(50, 2, labels=("a", "b"), seed=1)
+
+
+@pytest.fixture(autouse=True)
+def _clear():
+    clear_compiled_grammars()
+    yield
+    clear_compiled_grammars()
+
+
+@pytest.mark.parametrize(
+    "first,second,equal",
+    [
+        ("S -> a S b | $", "S -> $ | a S b", True),
+        ("S -> A B\nA -> a\nB -> b", "B -> b\nS -> A B\nA -> a", True),
+        ("S -> a S b | $", "S -> a S b | a b", False),
+        ("S -> a", "S -> b", False),
+    ],
+)
+def test_grammar_key(first, second, equal):
+    key = grammar_key(CFG.from_text(first))
+
+    assert (key == grammar_key(CFG.from_text(second))) == equal
+
+
+def test_forms_are_built_once():
+    grammar = compile_grammar("S -> a S b | $")
+
+    assert compile_grammar("S -> a S b | $") is grammar
+    assert compile_grammar(CFG.from_text("S -> $ | a S b")) is grammar
+    assert grammar.wcnf is grammar.wcnf
+    assert grammar.rsm_matrix is grammar.rsm_matrix
+    # wcnf_table, wcnf, ecfg, rsm and rsm_matrix
+    assert grammar.stats == {"built": 5, "loaded": 0}
+    assert compiled_grammar.cache_info == {"hits": 2, "misses": 1}
+
+
+@pytest.mark.parametrize("labels", [{"a"}, {"a", "c"}, {"a", "b", "c"}])
+def test_restrict(labels):
+    cfg = CFG.from_text("S -> a S b | S S | a | c")
+    grammar = compile_grammar(cfg, labels)
+
+    assert set(grammar.cfg.productions) == set(trim_cfg(cfg, labels).productions)
+    assert compile_grammar(cfg, labels | {"d"}) is grammar
+
+
+def test_cache_dir(tmp_path):
+    text = "S -> a S b S | $"
+    grammar = compile_grammar(text, cache_dir=str(tmp_path))
+    wcnf, nfa = grammar.wcnf, grammar.regular_nfa
+    clear_compiled_grammars()
+
+    loaded = compile_grammar(text, cache_dir=str(tmp_path))
+
+    assert loaded is not grammar
+    assert loaded.wcnf.productions == wcnf.productions
+    assert loaded.regular_nfa is None and nfa is None
+    assert loaded.stats == {"built": 0, "loaded": 2}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_bounded_cache(monkeypatch):
+    monkeypatch.setattr(compiled_grammar, "MAX_COMPILED", 2)
+    grammars = [compile_grammar(f"S -> a S | {label}") for label in "bcd"]
+
+    assert compile_grammar("S -> a S | d") is grammars[2]
+    assert compile_grammar("S -> a S | b") is not grammars[0]
+    assert compiled_grammar.cache_info["misses"] == 4
+
+
+@pytest.mark.parametrize("engine", [matrix_based, tensor_based])
+def test_engines_reuse_grammar(engine, tmp_path):
+    text = "S -> a S b | a b"
+    results = [engine(_graph, text, grammar_cache_dir=str(tmp_path)) for _ in range(3)]
+    grammar = compile_grammar(text, {"a", "b"})
+
+    # every form is built once and saved to cache directory
+    assert grammar.stats["built"] == len(list(tmp_path.glob("*.pickle"))) > 0
+    for result in results:
+        assert result.pairs(grammar.cfg.start_symbol) == cfpq_by_matrix(
+            CFG.from_text(text), _graph
+        )
+
+
+def test_cache_dir_is_per_call(tmp_path):
+    text = "S -> a S b | a b"
+    compile_grammar(text, {"a", "b"}, cache_dir=str(tmp_path)).wcnf
+    saved = sorted(tmp_path.iterdir())
+    grammar = compile_grammar(text, {"a", "b"})
+
+    assert grammar.cache_dir is None
+    grammar.rsm
+    assert sorted(tmp_path.iterdir()) == saved
+
+
+def test_bounded_restricted(monkeypatch):
+    monkeypatch.setattr(compiled_grammar, "MAX_RESTRICTED", 2)
+    grammar = compile_grammar("S -> a S | b S | c S | $")
+    for labels in ({"a"}, {"b"}, {"c"}):
+        grammar.restrict(labels)
+
+    assert list(grammar._restricted) == [frozenset({"b"}), frozenset({"c"})]
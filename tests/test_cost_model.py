@@ -0,0 +1,78 @@
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG
+
+from project.cfpq import ENGINES, cfpq, hellings
+from project.cost_model import ALGORITHMS, CostModel, choose_algorithm, query_features
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(100, 2, labels=("a", "b"), seed=1)
+_cfg = CFG.from_text("S -> a S b | a b")
+
+
+def test_query_features():
+    features = query_features(_cfg, _graph, {0, 1})
+
+    assert features["vertices"] == 100
+    assert features["edges"] == _graph.number_of_edges()
+    assert features["source_fraction"] == 0.02
+    assert features["nonterminals"] >= 1 and features["rsm_states"] >= 1
+
+
+def test_engines_for_all_algorithms():
+    assert set(ENGINES) == set(ALGORITHMS)
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_choose_cheapest(algorithm):
+    model = CostModel({name: (1.0, 0.0) for name in ALGORITHMS})
+    model.coefficients[algorithm] = (0.5, 0.0)
+
+    assert choose_algorithm(_cfg, _graph, model=model) == algorithm
+
+
+def test_calibrate(tmp_path):
+    features = [query_features(_cfg, _graph, s) for s in ({0}, None)]
+    model = CostModel()
+    model.calibrate(
+        [
+            ("gll", features[0], 0.1),
+            ("gll", features[1], 1.0),
+            ("hellings", features[0], 5),
+        ]
+    )
+    costs = model.estimate(features[0]), model.estimate(features[1])
+
+    assert costs[0]["gll"] == pytest.approx(0.1)
+    assert costs[1]["gll"] == pytest.approx(1.0)
+    assert model.coefficients["hellings"] == CostModel().coefficients["hellings"]
+
+    model.save(tmp_path / "model.json")
+    assert CostModel.load(tmp_path / "model.json").coefficients == model.coefficients
+
+
+@pytest.mark.parametrize("start_nodes", [{0, 1}, None])
+def test_auto(start_nodes):
+    expected = cfpq(_cfg, _graph, start_nodes=start_nodes, algorithm=hellings)
+    stats = {}
+    actual = cfpq(
+        _cfg,
+        _graph,
+        start_nodes=start_nodes,
+        algorithm="auto",
+        explain=True,
+        stats=stats,
+    )
+
+    assert actual == expected
+    chosen = choose_algorithm(_cfg, _graph, start_nodes)
+    assert stats["auto"]["chosen"] == chosen
+    assert stats["auto"]["report"].splitlines()[-1] == f"Chosen algorithm: {chosen}"
+
+
+def test_explain():
+    model = CostModel()
+    features = query_features(_cfg, _graph)
+    report = model.explain(features)
+
+    assert report.splitlines()[-1] == f"Chosen algorithm: {model.choose(features)}"
+    assert len(report.splitlines()) == len(ALGORITHMS) + 2
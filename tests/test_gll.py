@@ -0,0 +1,58 @@
+import itertools
+
+import cfpq_data
+import networkx as nx
+import pytest
+from pyformlang.cfg import CFG
+
+from project.cfpq import cfpq
+from project.gll import gll, gll_stream
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(80, 2, labels=("a", "b"), seed=1)
+
+
+def _create_graph(nodes, edges) -> nx.MultiDiGraph:
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(
+        list(map(lambda edge: (edge[0], edge[2], {"label": edge[1]}), edges))
+    )
+    return graph
+
+
+@pytest.mark.parametrize(
+    "cfg_text",
+    [
+        "S -> a S b | a b",
+        "S -> S S | a | b S",
+        "S -> a S | $",
+        "S -> A B | $\nA -> a A | b\nB -> S b",
+    ],
+)
+@pytest.mark.parametrize(
+    "start_nodes,final_nodes", [({0}, None), ({5, 17, 33}, {1, 2, 3, 17}), (None, {4})]
+)
+def test_stream_agrees_with_gll(cfg_text, start_nodes, final_nodes):
+    cfg = CFG.from_text(cfg_text)
+    expected = cfpq(
+        cfg, _graph, start_nodes=start_nodes, final_nodes=final_nodes, algorithm=gll
+    )
+    pairs = gll_stream(_graph, cfg, start_nodes=start_nodes, final_nodes=final_nodes)
+
+    assert set(pairs) == expected
+
+
+def test_stream_is_lazy():
+    graph = _create_graph(
+        nodes=list(range(1000)), edges=[(i, "a", i + 1) for i in range(999)]
+    )
+    pairs = gll_stream(graph, CFG.from_text("S -> a | a S"), start_nodes={0})
+
+    assert list(itertools.islice(pairs, 3)) == [(0, 1), (0, 2), (0, 3)]
+
+
+def test_ambiguous_left_recursion():
+    graph = _create_graph(nodes=[0, 1], edges=[(0, "a", 0), (0, "b", 1)])
+    cfg = CFG.from_text("S -> S S | S a | a | b")
+
+    assert cfpq(cfg, graph, algorithm=gll) == {(0, 0), (0, 1)}
@@ -0,0 +1,68 @@
+import random
+
+import cfpq_data
+import networkx as nx
+import pytest
+from pyformlang.cfg import CFG
+
+from project.cfpq import cfpq_by_matrix
+from project.incremental import MaintainedCfpq
+
+_cfgs = [
+    "S -> a S b | a b",
+    "S -> S S | a | b S",
+    "S -> A B | $\nA -> a A | b\nB -> S b",
+]
+
+
+def _random_edges(graph, count, seed):
+    rng = random.Random(seed)
+    nodes = list(graph.nodes) + ["new"]
+    return [
+        (rng.choice(nodes), rng.choice(nodes), rng.choice("ab")) for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("cfg_text", _cfgs)
+def test_add_edges(cfg_text):
+    graph = cfpq_data.labeled_barabasi_albert_graph(60, 2, labels=("a", "b"), seed=1)
+    cfg = CFG.from_text(cfg_text)
+    maintained = MaintainedCfpq(graph, cfg)
+
+    assert maintained.pairs() == cfpq_by_matrix(cfg, graph)
+    for seed in range(3):
+        edges = _random_edges(graph, 3, seed)
+        maintained.add_edges(edges)
+        graph.add_edges_from((u, v, {"label": label}) for u, v, label in edges)
+
+        assert maintained.pairs() == cfpq_by_matrix(cfg, graph)
+        assert maintained.pairs({0, 1}, {2, 3}) == cfpq_by_matrix(
+            cfg, graph, start_nodes={0, 1}, final_nodes={2, 3}
+        )
+
+
+@pytest.mark.parametrize("cfg_text", _cfgs)
+def test_remove_edges(cfg_text):
+    graph = cfpq_data.labeled_barabasi_albert_graph(60, 2, labels=("a", "b"), seed=1)
+    cfg = CFG.from_text(cfg_text)
+    maintained = MaintainedCfpq(graph, cfg)
+
+    rng = random.Random(0)
+    for _ in range(3):
+        edges = rng.sample(list(graph.edges(keys=True, data="label")), 2)
+        maintained.remove_edges((u, v, label) for u, v, _, label in edges)
+        graph.remove_edges_from((u, v, key) for u, v, key, _ in edges)
+
+        assert maintained.pairs() == cfpq_by_matrix(cfg, graph)
+        tails = {u for u, _, _, _ in edges}
+        assert maintained.stats["recomputed_rows"] == len(
+            set().union(*(nx.ancestors(graph, u) | {u} for u in tails))
+        )
+
+
+def test_remove_missing_edge():
+    graph = cfpq_data.labeled_barabasi_albert_graph(10, 2, labels=("a", "b"), seed=1)
+    maintained = MaintainedCfpq(graph, CFG.from_text("S -> a S b | a b"))
+
+    with pytest.raises(Exception):
+        maintained.remove_edges([(0, 0, "c")])
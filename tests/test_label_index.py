@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+import networkx as nx
+import pytest
+
+import project.label_index as label_index
+
+from project.fa_utils import regex_to_dfa
+from project.label_index import (
+    LabelReachabilityIndex,
+    get_label_index,
+    graph_fingerprint,
+    label_closure_labels,
+)
+from project.rpq import rpq
+
+
+def _create_graph(nodes, edges) -> nx.MultiDiGraph:
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(
+        list(map(lambda edge: (edge[0], edge[2], {"label": edge[1]}), edges))
+    )
+    return graph
+
+
+@pytest.fixture
+def graph():
+    return _create_graph(
+        nodes=[0, 1, 2, 3, 4],
+        edges=[
+            (0, "a", 1),
+            (1, "b", 2),
+            (2, "a", 0),
+            (2, "c", 3),
+            (3, "a", 4),
+            (4, "a", 4),
+        ],
+    )
+
+
+@pytest.mark.parametrize(
+    "regex,expected",
+    [
+        ("a*", {"a"}),
+        ("(a | b | c)*", {"a", "b", "c"}),
+        ("(a* b*)*", {"a", "b"}),
+        ("a b", None),
+        ("a* | b", None),
+        ("a a*", None),
+    ],
+)
+def test_label_closure_labels(regex, expected):
+    assert label_closure_labels(regex_to_dfa(regex)) == expected
+
+
+@pytest.mark.parametrize(
+    "labels,start_vertices,final_vertices,expected",
+    [
+        ({"a"}, {0}, None, {(0, 1)}),
+        ({"a"}, {3, 4}, None, {(3, 4), (4, 4)}),
+        ({"a", "b"}, {0}, None, {(0, 0), (0, 1), (0, 2)}),
+        ({"a", "b", "c"}, {1}, {3, 4}, {(1, 3), (1, 4)}),
+        ({"c"}, None, None, {(2, 3)}),
+        ({"d"}, None, None, set()),
+    ],
+)
+def test_query(graph, labels, start_vertices, final_vertices, expected):
+    index = LabelReachabilityIndex.build(graph, labels)
+
+    assert index.query(start_vertices, final_vertices) == expected
+
+
+def test_save_load(graph, tmp_path):
+    index = get_label_index(graph, {"a", "b"}, tmp_path)
+    loaded = LabelReachabilityIndex.load(next(tmp_path.iterdir()))
+
+    assert loaded.labels == index.labels
+    assert loaded.query() == index.query()
+
+
+@pytest.mark.parametrize(
+    "regex,start_vertices,final_vertices,expected",
+    [
+        (
+            "(a | b)*",
+            {0, 2},
+            None,
+            {(0, 0), (0, 1), (0, 2), (2, 0), (2, 1), (2, 2)},
+        ),
+        ("a*", None, {4}, {(3, 4), (4, 4)}),
+        ("(a | c)*", {2}, None, {(2, 0), (2, 1), (2, 3), (2, 4)}),
+    ],
+)
+def test_rpq_by_index(graph, regex, start_vertices, final_vertices, expected):
+    assert rpq(graph, regex, start_vertices, final_vertices) == expected
+
+
+def test_fingerprint_follows_edits(graph):
+    fingerprint = graph_fingerprint(graph)
+
+    assert graph_fingerprint(graph) == fingerprint
+    assert rpq(graph, "a*", {2}) == {(2, 0), (2, 1)}
+
+    # relabeling keeps numbers of vertices and edges
+    graph.edges[2, 3, 0]["label"] = "a"
+
+    assert graph_fingerprint(graph) != fingerprint
+    assert rpq(graph, "a*", {2}) == {(2, 0), (2, 1), (2, 3), (2, 4)}
+
+
+def test_bounded_index_pool(graph, monkeypatch):
+    monkeypatch.setattr(label_index, "MAX_INDICES", 2)
+    monkeypatch.setattr(label_index, "_index_pool", OrderedDict())
+    first = get_label_index(graph, {"a"})
+    get_label_index(graph, {"b"})
+    get_label_index(graph, {"c"})
+
+    assert len(label_index._index_pool) == 2
+    assert get_label_index(graph, {"a"}) is not first
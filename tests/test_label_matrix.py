@@ -0,0 +1,136 @@
+import cfpq_data
+import numpy as np
+import pytest
+from pyformlang.cfg import CFG
+from scipy import sparse
+
+from project.automaton_matrix import AutomatonSetOfMatrix
+from project.cfpq import cfpq_by_tensor
+from project.label_matrix import (
+    FORMATS,
+    BitMatrix,
+    bool_kron,
+    choose_format,
+    matrix_format,
+    to_format,
+)
+from project.rpq import bfs_rpq, rpq
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(120, 2, labels=("a", "b"), seed=7)
+_graph.add_edges_from([(0, 1, {"label": "c"}), (5, 3, {"label": "c"})])
+_graph.add_edges_from([(u, v, {"label": "d"}) for u in range(40) for v in range(40)])
+
+
+def _random_matrix(shape, density, seed):
+    return sparse.random(
+        *shape, density=density, format="csr", random_state=seed, dtype=float
+    ).astype(bool)
+
+
+@pytest.mark.parametrize(
+    "nnz,shape,backward,expected",
+    [
+        (2, (100, 100), False, "pairs"),
+        (200, (100, 100), False, "csr"),
+        (200, (100, 100), True, "csc"),
+        (5000, (100, 100), False, "bitpacked"),
+    ],
+)
+def test_choose_format(nnz, shape, backward, expected):
+    assert choose_format(nnz, shape, backward) == expected
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_to_format(fmt):
+    matrix = _random_matrix((20, 30), 0.2, 0)
+    converted = to_format(matrix, fmt)
+
+    assert matrix_format(converted) == fmt
+    assert (converted.toarray() == matrix.toarray()).all()
+
+
+@pytest.mark.parametrize("left_format", FORMATS)
+@pytest.mark.parametrize("right_format", FORMATS)
+def test_mixed_operations(left_format, right_format):
+    left = _random_matrix((15, 15), 0.2, 1)
+    right = _random_matrix((15, 15), 0.1, 2)
+    left_converted = to_format(left, left_format)
+    right_converted = to_format(right, right_format)
+
+    product = left_converted @ right_converted
+    assert (product.toarray() == (left @ right).toarray()).all()
+
+    total = left_converted + right_converted
+    assert (total.toarray() == (left + right).toarray()).all()
+
+    kron = bool_kron(left_converted, right_converted)
+    assert (kron.toarray() == sparse.kron(left, right).toarray()).all()
+
+
+def test_bit_matrix():
+    matrix = BitMatrix.from_pairs([0, 2, 2], [1, 0, 9], (3, 10))
+    matrix[1, 8] = True
+    matrix[2, 0] = False
+
+    assert matrix.nnz == 3
+    assert matrix[1, 8] and not matrix[2, 0]
+    assert {tuple(p) for p in np.transpose(matrix.nonzero())} == {
+        (0, 1),
+        (1, 8),
+        (2, 9),
+    }
+
+
+def test_adaptive_storage_formats():
+    matrix = AutomatonSetOfMatrix.from_graph(_graph, storage="adaptive")
+    formats = {
+        label.value: matrix_format(bm) for label, bm in matrix.bool_matrices.items()
+    }
+
+    assert formats["c"] == "pairs"
+    assert formats["d"] == "bitpacked"
+    assert formats["a"] == "csr"
+
+
+@pytest.mark.parametrize("storage", ("adaptive",) + FORMATS)
+def test_transitive_closure(storage):
+    expected = AutomatonSetOfMatrix.from_graph(_graph).get_transitive_closure()
+    actual = AutomatonSetOfMatrix.from_graph(
+        _graph, storage=storage
+    ).get_transitive_closure()
+
+    assert (actual.toarray() == expected.toarray()).all()
+
+
+@pytest.mark.parametrize("storage", ("adaptive",) + FORMATS)
+@pytest.mark.parametrize("regex", ["a b*", "d* c", "(a | d) b"])
+def test_rpq(storage, regex):
+    expected = rpq(_graph, regex, use_closure_cache=False)
+
+    assert rpq(_graph, regex, use_closure_cache=False, storage=storage) == expected
+    assert bfs_rpq(_graph, regex, {0, 5}, storage=storage) == bfs_rpq(
+        _graph, regex, {0, 5}
+    )
+
+
+@pytest.mark.parametrize("storage", ("adaptive",) + FORMATS)
+def test_cfpq_by_tensor(storage):
+    cfg = CFG.from_text("S -> d S c | a b")
+    expected = cfpq_by_tensor(cfg, _graph)
+
+    assert cfpq_by_tensor(cfg, _graph, storage=storage) == expected
+
+
+@pytest.mark.parametrize("shape,density", [((37, 45), 0.1), ((64, 64), 0.6)])
+def test_bit_matrix_packed_operations(shape, density):
+    left = _random_matrix(shape, density, 1)
+    right = _random_matrix(shape[::-1], density, 2)
+    bits = BitMatrix.from_sparse(left)
+    rows, cols = bits.nonzero()
+
+    assert bits.nnz == left.nnz
+    assert set(zip(rows.tolist(), cols.tolist())) == set(zip(*left.nonzero()))
+    assert (bits.tocsr() != left).nnz == 0
+    assert (
+        (bits @ BitMatrix.from_sparse(right)).toarray() == (left @ right).toarray()
+    ).all()
@@ -0,0 +1,73 @@
+import itertools
+
+import pytest
+from pyformlang.cfg import CFG, Variable
+
+from project.cyk import cyk
+from project.normal_form import cnf_table, wcnf_table
+
+_grammars = [
+    "S -> S S | $",
+    "S -> A\nA -> B\nB -> b",
+    "S -> a S b N c | $\nN -> $ | N N | d e f g h",
+    "S -> A a | S a\nA -> $\nB -> $",
+    "S -> a S b S | b S a S | $",
+    "S -> A B C\nA -> a | $\nB -> A | b B\nC -> c | A A",
+    "S -> a A\nA -> A b",
+]
+
+_words = ["".join(w) for n in range(6) for w in itertools.product("abc", repeat=n)]
+
+
+@pytest.mark.parametrize("cfg_text", _grammars)
+def test_wcnf_table(cfg_text):
+    cfg = CFG.from_text(cfg_text)
+    table = wcnf_table(cfg)
+    wcnf = table.to_cfg()
+
+    assert table.variables[table.start] == cfg.start_symbol
+    assert table.binary.shape[1] == 3 and table.unary.shape[1] == 2
+    assert len(wcnf.productions) == len(table)
+    assert all(
+        len(p.body) != 1 or p.body[0] in wcnf.terminals for p in wcnf.productions
+    )
+    assert all(cfg.contains(w) == wcnf.contains(w) for w in _words)
+
+
+@pytest.mark.parametrize("cfg_text", _grammars)
+def test_cnf_table(cfg_text):
+    cfg = CFG.from_text(cfg_text)
+    table = cnf_table(cfg)
+    cnf = table.to_cfg()
+
+    assert len(table.epsilon) == 0
+    assert all(cfg.contains(w) == cnf.contains(w) for w in _words if w)
+    assert all(cfg.contains(w) == cyk(w, cfg) for w in _words)
+
+
+@pytest.mark.parametrize("cfg_text", _grammars)
+def test_split(cfg_text):
+    table = wcnf_table(CFG.from_text(cfg_text))
+    eps_prods, term_prods, var_prods = table.split()
+
+    productions = {(p.head, tuple(p.body)) for p in table.to_cfg().productions}
+
+    assert productions == (
+        {(head, ()) for head in eps_prods}
+        | {(head, (t,)) for head, ts in term_prods.items() for t in ts}
+        | {(head, body) for head, bodies in var_prods.items() for body in bodies}
+    )
+
+
+def test_large_grammar():
+    # V0 -> a V1 b | c, ..., every body of length 3 needs one new variable
+    n = 3000
+    cfg = CFG.from_text(
+        "\n".join(f"V{i} -> a V{i + 1} b | c" for i in range(n)) + f"\nV{n} -> c",
+        Variable("V0"),
+    )
+    table = wcnf_table(cfg)
+
+    assert len(table.variables) == (n + 1) + n + 2
+    assert len(table.binary) == 2 * n
+    assert len(table.unary) == (n + 1) + 2
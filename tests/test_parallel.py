@@ -0,0 +1,50 @@
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG
+from scipy import sparse
+
+from project.cfpq import cfpq_by_matrix
+from project.parallel import EXECUTORS, product_pool
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(100, 2, labels=("a", "b"), seed=1)
+
+
+def _random_matrix(shape, density, seed):
+    return sparse.random(
+        *shape, density=density, format="csr", random_state=seed, dtype=float
+    ).astype(bool)
+
+
+@pytest.mark.parametrize("executor", EXECUTORS)
+@pytest.mark.parametrize("workers", [1, 3])
+def test_product_pool(executor, workers):
+    left = _random_matrix((50, 40), 0.1, 1)
+    right = _random_matrix((40, 30), 0.1, 2)
+    operands = [(left, right), (left, right), (right.T, left.T)]
+
+    with product_pool(workers, executor) as multiply:
+        products = multiply(operands)
+        empty = multiply([])
+
+    assert empty == []
+    for (first, second), product in zip(operands, products):
+        assert (product != first @ second).nnz == 0
+
+
+def test_unknown_executor():
+    with pytest.raises(Exception):
+        with product_pool(2, "gpu"):
+            pass
+
+
+@pytest.mark.parametrize(
+    "cfg_text",
+    ["S -> a S b | a b", "S -> S S | a | b S", "S -> A B | $\nA -> a A | b\nB -> S b"],
+)
+@pytest.mark.parametrize("executor", EXECUTORS)
+def test_cfpq_by_matrix(cfg_text, executor):
+    cfg = CFG.from_text(cfg_text)
+
+    assert cfpq_by_matrix(cfg, _graph, workers=2, executor=executor) == cfpq_by_matrix(
+        cfg, _graph
+    )
@@ -0,0 +1,85 @@
+import queue
+import threading
+
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG, Variable
+from scipy import sparse
+
+from project.cfpq import cfpq_by_matrix
+from project.partitioned import (
+    LocalWorkers,
+    Transport,
+    partitioned_closure,
+    serve,
+)
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(100, 2, labels=("a", "b"), seed=1)
+
+
+class _QueueTransport(Transport):
+    def __init__(self, inbox, outbox):
+        self.inbox, self.outbox = inbox, outbox
+
+    def send(self, message):
+        self.outbox.put(message)
+
+    def recv(self):
+        return self.inbox.get()
+
+    def close(self):
+        pass
+
+
+def _thread_workers(count):
+    transports = []
+    for _ in range(count):
+        requests, replies = queue.Queue(), queue.Queue()
+        threading.Thread(
+            target=serve, args=(_QueueTransport(requests, replies),), daemon=True
+        ).start()
+        transports.append(_QueueTransport(replies, requests))
+    return transports
+
+
+@pytest.mark.parametrize(
+    "cfg_text",
+    ["S -> a S b | a b", "S -> S S | a | b S", "S -> A B | $\nA -> a A | b\nB -> S b"],
+)
+@pytest.mark.parametrize("partitions,column_block", [(2, 4096), (3, 17)])
+def test_cfpq_by_matrix(cfg_text, partitions, column_block):
+    cfg = CFG.from_text(cfg_text)
+    stats = {}
+
+    assert cfpq_by_matrix(
+        cfg, _graph, partitions=partitions, column_block=column_block, stats=stats
+    ) == cfpq_by_matrix(cfg, _graph)
+    assert stats["rounds"][-1]["new"] == 0
+
+
+@pytest.mark.parametrize("workers", [1, 4, 7])
+def test_custom_transport(workers):
+    # S -> S S over path 0 -> 1 -> 2 -> 3 -> 4 -> 5
+    path = sparse.csr_matrix(sparse.eye(6, k=1, dtype=bool))
+    s = Variable("S")
+    closure = partitioned_closure({s: path}, [(s, s, s)], _thread_workers(workers), 2)
+
+    expected = {(u, v) for u in range(6) for v in range(u + 1, 6)}
+
+    assert set(zip(*closure[s].nonzero())) == expected
+
+
+def test_worker_error():
+    with LocalWorkers(2) as workers:
+        transport = workers.transports[0]
+        transport.send(("shuffle",))
+        assert isinstance(transport.recv(), Exception)
+
+
+def test_transport_is_abstract():
+    class _SendOnly(Transport):
+        def send(self, message):
+            pass
+
+    with pytest.raises(TypeError):
+        _SendOnly()
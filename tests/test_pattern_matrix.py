@@ -0,0 +1,68 @@
+import cfpq_data
+import numpy as np
+import pytest
+from pyformlang.cfg import CFG
+from scipy import sparse
+
+from project.cfpq import cfpq_by_matrix
+from project.pattern_matrix import PatternMatrix, index_dtype
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(80, 2, labels=("a", "b"), seed=3)
+
+
+def _random_matrix(shape, density, seed):
+    return sparse.random(
+        *shape, density=density, format="csr", random_state=seed, dtype=float
+    ).astype(bool)
+
+
+@pytest.mark.parametrize(
+    "max_value,expected",
+    [
+        (0, np.uint16),
+        (2**16 - 1, np.uint16),
+        (2**16, np.uint32),
+        (2**32, np.uint64),
+    ],
+)
+def test_index_dtype(max_value, expected):
+    assert index_dtype(max_value) == expected
+
+
+def test_compact_indices():
+    matrix = PatternMatrix.from_sparse(_random_matrix((300, 70000), 0.0001, 0))
+
+    assert matrix.indptr.dtype == np.uint16
+    assert matrix.indices.dtype == np.uint32
+    assert not hasattr(matrix, "data")
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (40, 25), (100, 100)])
+def test_operations(shape):
+    left = _random_matrix(shape, 0.1, 1)
+    right = _random_matrix((shape[1], shape[0]), 0.2, 2)
+    other = _random_matrix(shape, 0.3, 3)
+    pattern = PatternMatrix.from_sparse(left)
+
+    assert (pattern.toarray() == left.toarray()).all()
+    assert (pattern.tocsr() != left).nnz == 0
+    assert ((pattern @ right).toarray() == (left @ right).toarray()).all()
+    assert ((right @ pattern).toarray() == (right @ left).toarray()).all()
+    assert ((pattern + other).toarray() == (left + other).toarray()).all()
+    assert (pattern.kron(right).toarray() == sparse.kron(left, right).toarray()).all()
+
+
+def test_duplicate_pairs():
+    matrix = PatternMatrix.from_pairs([2, 0, 2, 2], [1, 3, 1, 0], (3, 4))
+
+    assert matrix.nnz == 3
+    assert list(matrix.getrow(2)) == [0, 1]
+
+
+@pytest.mark.parametrize(
+    "cfg_text", ["S -> a S b | a b", "S -> S S | a | b", "S -> a S | epsilon"]
+)
+def test_cfpq_by_matrix(cfg_text):
+    cfg = CFG.from_text(cfg_text)
+
+    assert cfpq_by_matrix(cfg, _graph, storage="pattern") == cfpq_by_matrix(cfg, _graph)
@@ -0,0 +1,62 @@
+import cfpq_data
+import networkx as nx
+import pytest
+from pyformlang.cfg import CFG
+
+from project.cfpq import cfpq, hellings, matrix_based, rsm_bfs, tensor_based
+from project.prefilter import prefilter_graph, regular_approximation
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(300, 1, labels=("a", "b", "c"), seed=1)
+
+
+def _create_graph(nodes, edges) -> nx.MultiDiGraph:
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(
+        list(map(lambda edge: (edge[0], edge[2], {"label": edge[1]}), edges))
+    )
+    return graph
+
+
+def test_regular_approximation_is_superset():
+    approximation = regular_approximation(CFG.from_text("S -> a S b | a b"))
+    nfa = approximation.to_automaton()
+
+    for word in ["ab", "aabb", "aaabbb"]:
+        assert nfa.accepts(list(word))
+    assert not nfa.accepts(list("ba"))
+
+
+def test_prefilter_graph():
+    graph = _create_graph(
+        nodes=[0, 1, 2, 3, 4, 5],
+        edges=[(0, "a", 1), (1, "b", 2), (3, "a", 4), (4, "c", 5)],
+    )
+    subgraph, report = prefilter_graph(graph, CFG.from_text("S -> a S b | a b"))
+
+    assert set(subgraph.nodes) == {0, 1, 2}
+    assert report["kept_vertices"] == 3 and report["kept_edges"] == 2
+    assert report["pruned"] == 0.5
+
+
+@pytest.mark.parametrize("algorithm", [hellings, matrix_based, tensor_based, rsm_bfs])
+@pytest.mark.parametrize(
+    "cfg_text",
+    ["S -> a S b | a b", "S -> S S | a | b S", "S -> A B | $\nA -> a A | b\nB -> S b"],
+)
+@pytest.mark.parametrize("start_nodes", [{0}, None])
+def test_same_answer(algorithm, cfg_text, start_nodes):
+    cfg = CFG.from_text(cfg_text)
+    stats = {}
+    expected = cfpq(cfg, _graph, start_nodes=start_nodes, algorithm=algorithm)
+    actual = cfpq(
+        cfg,
+        _graph,
+        start_nodes=start_nodes,
+        algorithm=algorithm,
+        prefilter=True,
+        stats=stats,
+    )
+
+    assert actual == expected
+    assert stats["prefilter"]["vertices"] == 300
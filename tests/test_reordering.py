@@ -0,0 +1,63 @@
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG
+
+from project.automaton_matrix import AutomatonSetOfMatrix
+from project.cfpq import cfpq_by_matrix, cfpq_by_tensor
+from project.graph_utils import REORDERINGS, reorder_vertices
+from project.rpq import bfs_rpq, rpq
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(30, 2, labels=("a", "b"), seed=42)
+_named_graph = cfpq_data.labeled_two_cycles_graph(3, 2, labels=("a", "b"))
+_named_graph = cfpq_data.nodes_to_integers(_named_graph)
+
+
+@pytest.mark.parametrize("reordering", (None,) + REORDERINGS)
+def test_reorder_is_permutation(reordering):
+    vertices = reorder_vertices(_graph, reordering)
+
+    assert sorted(vertices) == sorted(_graph.nodes)
+
+
+def test_unknown_reordering():
+    with pytest.raises(Exception):
+        reorder_vertices(_graph, "random")
+
+
+@pytest.mark.parametrize("reordering", REORDERINGS)
+def test_from_graph_keeps_permutation(reordering):
+    matrix = AutomatonSetOfMatrix.from_graph(_graph, reordering=reordering)
+    vertices = [state.value for state in matrix.get_indexed_states()]
+
+    assert vertices == reorder_vertices(_graph, reordering)
+    for label, bm in matrix.bool_matrices.items():
+        edges = {(u, v) for u, v, data in _graph.edges(data="label") if data == label}
+        assert {(vertices[i], vertices[j]) for i, j in zip(*bm.nonzero())} == edges
+
+
+@pytest.mark.parametrize("reordering", REORDERINGS)
+@pytest.mark.parametrize("regex", ["a b*", "(a | b) a", "a* b a"])
+def test_rpq(reordering, regex):
+    expected = rpq(_graph, regex, use_closure_cache=False)
+
+    assert rpq(_graph, regex, reordering=reordering) == expected
+
+
+@pytest.mark.parametrize("reordering", REORDERINGS)
+@pytest.mark.parametrize("separated", [True, False])
+def test_bfs_rpq(reordering, separated):
+    expected = bfs_rpq(_graph, "a b*", {3, 5, 7}, separated=separated)
+
+    assert (
+        bfs_rpq(_graph, "a b*", {3, 5, 7}, separated=separated, reordering=reordering)
+        == expected
+    )
+
+
+@pytest.mark.parametrize("reordering", REORDERINGS)
+@pytest.mark.parametrize("cfpq_function", [cfpq_by_matrix, cfpq_by_tensor])
+def test_cfpq(reordering, cfpq_function):
+    cfg = CFG.from_text("S -> a S b | a b")
+    expected = cfpq_function(cfg, _named_graph)
+
+    assert cfpq_function(cfg, _named_graph, reordering=reordering) == expected
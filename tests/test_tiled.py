@@ -0,0 +1,103 @@
+import os
+
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG
+from scipy import sparse
+
+import project.cfpq as cfpq_module
+from project.cfpq import cfpq_by_matrix, matrix_based
+from project.tiled import TileStore, gather_tiles, tiled_closure
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(100, 2, labels=("a", "b"), seed=1)
+
+
+def _random_matrix(shape, density, seed):
+    return sparse.random(
+        *shape, density=density, format="csr", random_state=seed, dtype=float
+    ).astype(bool)
+
+
+def test_tile_store(tmp_path):
+    tiles = [_random_matrix((30, 30), 0.2, seed) for seed in range(5)]
+    store = TileStore(str(tmp_path), memory_budget=0)
+    for i, tile in enumerate(tiles):
+        store.put((0, i), tile)
+    store.put((1, 0), sparse.csr_matrix((30, 30), dtype=bool))
+
+    assert store.stats["spilled"] == 4
+    assert store.get((1, 0)) is None
+    for i, tile in enumerate(tiles):
+        loaded = store.get((0, i))
+        assert (loaded != tile).nnz == 0
+        # loaded tile is not copied from mapped file
+        assert not loaded.indices.flags.writeable
+    # the last put tile is spilled by the first load
+    assert store.stats["loaded"] == 5
+
+    for i in range(len(tiles)):
+        store.delete((0, i))
+    assert os.listdir(tmp_path) == []
+
+
+def test_no_spill_without_budget(tmp_path):
+    store = TileStore(str(tmp_path))
+    for i in range(5):
+        store.put((0, i), _random_matrix((30, 30), 0.2, i))
+
+    assert store.stats["spilled"] == 0
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize(
+    "cfg_text",
+    ["S -> a S b | a b", "S -> S S | a | b S", "S -> A B | $\nA -> a A | b\nB -> S b"],
+)
+@pytest.mark.parametrize("memory_budget,tile_size", [(0, 50), (10**9, 4096)])
+def test_cfpq_by_matrix(tmp_path, cfg_text, memory_budget, tile_size):
+    cfg = CFG.from_text(cfg_text)
+    stats = {}
+
+    assert cfpq_by_matrix(
+        cfg,
+        _graph,
+        memory_budget=memory_budget,
+        tile_size=tile_size,
+        work_dir=str(tmp_path),
+        stats=stats,
+    ) == cfpq_by_matrix(cfg, _graph)
+    assert stats["rounds"][-1]["new"] == 0
+    assert (stats["tiles"]["spilled"] > 0) == (memory_budget == 0)
+    assert os.listdir(tmp_path) == []
+
+
+def test_result_tiles_stay_in_store(tmp_path):
+    matrix = _random_matrix((70, 70), 0.05, 0)
+    store = TileStore(str(tmp_path), memory_budget=0)
+    tiles = tiled_closure(
+        {"S": matrix.nonzero()}, 70, [("S", "S", "S")], store, tile_size=30
+    )
+
+    expected = matrix
+    while (expected @ expected > expected).nnz > 0:
+        expected = expected + expected @ expected
+    assert len(tiles["S"]) <= 9
+    assert (gather_tiles(store, tiles["S"], (70, 70), 30) != expected).nnz == 0
+
+
+def test_only_start_is_gathered(monkeypatch, tmp_path):
+    gathered = []
+
+    def gather(store, tiles, shape, tile_size):
+        # keys of tiles are (kind, non-terminal index, row tile, column tile)
+        gathered.append({key[1] for _, _, key in tiles})
+        return gather_tiles(store, tiles, shape, tile_size)
+
+    monkeypatch.setattr(cfpq_module, "gather_tiles", gather)
+    cfg = CFG.from_text("S -> A B | $\nA -> a A | b\nB -> S b")
+    result = matrix_based(
+        _graph, cfg, memory_budget=0, tile_size=30, work_dir=str(tmp_path)
+    )
+
+    assert len(gathered) == 1 and len(gathered[0]) <= 1
+    assert set(result.matrices) == {cfg.start_symbol}
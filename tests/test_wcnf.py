@@ -1,7 +1,7 @@
 import pytest
-from pyformlang.cfg import CFG
+from pyformlang.cfg import CFG, Variable
 
-from project.cfg_utils import cfg_to_wcnf
+from project.cfg_utils import cfg_to_wcnf, trim_cfg
 
 
 @pytest.mark.parametrize(
@@ -169,3 +169,24 @@ def test_generated_words(cfg, contained_words):
     ) and all(
         not wcnf.contains(w) and not cfg.contains(w) for w in contained_words[False]
     )
+
+
+@pytest.mark.parametrize(
+    "cfg, labels, expected",
+    [
+        ("S -> a S b | c\nA -> a", {"a", "b", "c"}, {"S"}),
+        ("S -> a S b | c | A\nA -> a A | b", {"a", "b"}, {"S", "A"}),
+        ("S -> A B\nA -> a\nB -> d", {"a", "b"}, set()),
+        ("S -> $ | A\nA -> d", set(), {"S"}),
+    ],
+)
+def test_trim_cfg(cfg, labels, expected):
+    trimmed = trim_cfg(CFG.from_text(cfg), labels)
+
+    assert trimmed.start_symbol == Variable("S")
+    assert {p.head.value for p in trimmed.productions} == expected
+    assert all(
+        symbol.value in labels or isinstance(symbol, Variable)
+        for p in trimmed.productions
+        for symbol in p.body
+    )
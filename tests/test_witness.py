@@ -0,0 +1,76 @@
+import random
+
+import cfpq_data
+import pytest
+from pyformlang.cfg import CFG, Epsilon, Variable
+from networkx import MultiDiGraph
+
+from project.cfpq import cfpq_by_matrix, matrix_based
+
+_graph = cfpq_data.labeled_barabasi_albert_graph(60, 2, labels=("a", "b"), seed=1)
+
+
+def _leaves(tree):
+    if not tree.sons:
+        return [] if isinstance(tree.value, Epsilon) else [tree.value.value]
+    return [leaf for son in tree.sons for leaf in _leaves(son)]
+
+
+@pytest.mark.parametrize(
+    "cfg_text",
+    ["S -> a S b | a b", "S -> S S | a | b S", "S -> A B | $\nA -> a A | b\nB -> S b"],
+)
+@pytest.mark.parametrize("workers", [None, 2])
+def test_witness(cfg_text, workers):
+    cfg = CFG.from_text(cfg_text)
+    pairs = cfpq_by_matrix(cfg, _graph, witnesses=True, workers=workers)
+
+    assert pairs == cfpq_by_matrix(cfg, _graph)
+    for u, v in random.Random(7).sample(sorted(pairs), min(len(pairs), 30)):
+        path, tree = pairs.witness(u, v)
+        labels = [label for _, label, _ in path]
+
+        assert [edge[0] for edge in path[:1]] in ([u], [])
+        assert [edge[2] for edge in path[-1:]] in ([v], [])
+        assert all(path[i][2] == path[i + 1][0] for i in range(len(path) - 1))
+        assert all(
+            label in {d["label"] for d in _graph.get_edge_data(x, y).values()}
+            for x, label, y in path
+        )
+        assert path or u == v
+        assert cfg.contains(labels)
+        assert _leaves(tree) == labels
+
+
+def test_shortest_split():
+    # two paths of S -> a S | a from 0 to 3: direct edge and chain
+    graph = MultiDiGraph()
+    graph.add_edges_from(
+        [(0, 1, {"label": "a"}), (1, 2, {"label": "a"}), (2, 3, {"label": "a"})]
+    )
+    graph.add_edge(0, 3, label="a")
+    result = matrix_based(graph, CFG.from_text("S -> a S | a"), witnesses=True)
+
+    path, _ = result.witness(0, 3, Variable("S"))
+
+    assert path == [(0, "a", 3)]
+
+
+def test_epsilon_witness():
+    pairs = cfpq_by_matrix(CFG.from_text("S -> a S b | $"), _graph, witnesses=True)
+    path, tree = pairs.witness(0, 0)
+
+    assert path == []
+    assert _leaves(tree) == []
+
+
+def test_missing_witness():
+    cfg = CFG.from_text("S -> a S b | a b")
+    pairs = cfpq_by_matrix(cfg, _graph, witnesses=True)
+
+    with pytest.raises(Exception):
+        pairs.witness(-1, 0)
+    with pytest.raises(Exception):
+        cfpq_by_matrix(cfg, _graph).witness(*next(iter(pairs)))
+    with pytest.raises(Exception):
+        cfpq_by_matrix(cfg, _graph, witnesses=True, memory_budget=1024)